@@ -0,0 +1,256 @@
+"""
+Anomaly Detector - Streaming EWMA z-scores per machine and metric
+Keeps an exponentially weighted mean and variance for every machine/metric
+pair (O(1) memory each) and flags readings that sit far outside that
+machine's own recent behaviour, instead of comparing every machine to one
+fixed limit
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from fleet_delta import machine_id, machine_readings
+from lstm_memory_agent import METRICS
+
+# Smallest standard deviation assumed per metric (about sensor resolution), so a
+# perfectly flat signal does not turn the first tiny wobble into a huge z-score
+NOISE_FLOOR = np.array([
+    {'temperature': 0.5, 'motorSpeed': 10.0, 'pressure': 0.05, 'vibration': 0.2,
+     'load': 1.0, 'humidity': 1.0, 'oilLevel': 0.5, 'noiseLevel': 0.5}[metric]
+    for metric in METRICS
+])
+
+
+class EWMADetector:
+    """Per machine and metric EWMA mean/variance with z-score flags.
+
+    Each reading is scored against the baseline from the readings before it,
+    z = (x - mean) / std, then folded in with weight ``alpha``. Readings more
+    than ``threshold`` standard deviations out are anomalous once a series has
+    ``warmup`` readings. Past warm-up, a reading's pull on the baseline is
+    clipped at ``threshold`` standard deviations, so one spike does not blow up
+    the variance while a lasting shift still becomes the new normal.
+
+    State lives in (machines x metrics) arrays. A batch is applied in rounds,
+    round k updating every machine's k-th reading at once, so one step
+    updates the whole fleet and repeated readings of a machine stay in order.
+    When ``max_machines`` is reached the least recently updated machine's row
+    is reused.
+
+    Only readings newer than a machine's last absorbed one are folded in, so
+    a snapshot sent again (a re-posted /api/analyze fleet, a retried ingest
+    batch) does not pull the baseline towards itself. A reading is newer
+    when its timestamp is later, or, without a timestamp, when it differs
+    from the last one.
+    """
+
+    def __init__(self, alpha=0.05, threshold=3.0, warmup=20, max_machines=100_000, initial_machines=64):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.max_machines = max_machines
+        self._lock = threading.Lock()
+        self._rows = {}  # machine id -> row
+        self._ids = []
+        rows = min(initial_machines, max_machines)
+        self._mean = np.zeros((rows, len(METRICS)))
+        self._var = np.zeros((rows, len(METRICS)))
+        self._count = np.zeros((rows, len(METRICS)), dtype=np.int64)
+        self._last = np.full((rows, len(METRICS)), np.nan)    # Latest reading
+        self._last_z = np.full((rows, len(METRICS)), np.nan)  # Its z-score against the baseline before it
+        self._last_baseline = np.full((rows, len(METRICS)), np.nan)  # That baseline
+        self._last_update = np.zeros(rows)
+        self._last_time = np.full(rows, np.nan)  # Timestamp of the latest absorbed reading
+        self._updates = 0
+        self._repeats = 0
+        self._flagged = 0
+
+    def update(self, machine_ids, values, timestamps=None):
+        """Score and absorb readings; ``values`` is (n, len(METRICS)) in METRICS order, NaN where missing.
+
+        ``timestamps`` (epoch seconds, NaN where unknown) lets older or
+        repeated readings be recognised. Returns the (n, len(METRICS))
+        z-scores, NaN where a reading was missing, not newer than the
+        machine's last one, or its series was still warming up.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        scores = np.full(values.shape, np.nan)
+        if not len(machine_ids):
+            return scores
+        timestamps = np.full(len(machine_ids), np.nan) if timestamps is None else np.asarray(timestamps, dtype=np.float64)
+
+        with self._lock:
+            rows = list(map(self._rows.get, machine_ids))
+            if None in rows:
+                rows = [self._row_for(machine_id) if row is None else row for machine_id, row in zip(machine_ids, rows)]
+            rows = np.array(rows, dtype=np.int64)
+            absorbed = 0
+            for batch in _rounds(rows):
+                batch = batch[self._newer(rows[batch], values[batch], timestamps[batch])]
+                scores[batch] = self._step(rows[batch], values[batch])
+                self._last_time[rows[batch]] = np.where(np.isnan(timestamps[batch]), self._last_time[rows[batch]], timestamps[batch])
+                absorbed += len(batch)
+            self._last_update[rows] = time.time()
+            self._updates += absorbed
+            self._repeats += len(rows) - absorbed
+            self._flagged += int((np.abs(np.nan_to_num(scores)) > self.threshold).sum())
+        return scores
+
+    def update_records(self, machine_data):
+        """update() for machine records shaped like /api/analyze machines, in list order"""
+        values = np.array([machine_readings(machine) for machine in machine_data], dtype=np.float64).reshape(-1, len(METRICS))
+        timestamps = [record_time(machine) for machine in machine_data]
+        return self.update([machine_id(machine) for machine in machine_data], values, timestamps)
+
+    def anomalies(self, machine_ids=None, limit=None):
+        """Series whose latest reading is anomalous, largest |z| first"""
+        with self._lock:
+            if machine_ids is None:
+                rows = np.arange(len(self._ids), dtype=np.int64)
+            else:
+                rows = np.array([self._rows[m] for m in dict.fromkeys(machine_ids) if m in self._rows], dtype=np.int64)
+            z = self._last_z[rows]
+            hits = np.argwhere(np.abs(np.nan_to_num(z)) > self.threshold)
+            order = np.argsort(-np.abs(z[hits[:, 0], hits[:, 1]]), kind='stable')
+            hits = hits[order[:limit] if limit else order]
+            results = []
+            for index, column in hits:
+                row = rows[index]
+                value, baseline, score = self._last[row, column], self._last_baseline[row, column], z[index, column]
+                results.append({
+                    'machine_id': self._ids[row],
+                    'metric': METRICS[column],
+                    'value': round(float(value), 3),
+                    'baseline': round(float(baseline), 3),
+                    'std': round(float((value - baseline) / score), 3),
+                    'z': round(float(score), 2)
+                })
+            return results
+
+    def stats(self):
+        """Machines tracked and reading counters"""
+        with self._lock:
+            return {
+                'machines': len(self._ids),
+                'max_machines': self.max_machines,
+                'alpha': self.alpha,
+                'threshold': self.threshold,
+                'warmup': self.warmup,
+                'updates': self._updates,
+                'repeats': self._repeats,
+                'flagged': self._flagged
+            }
+
+    def _newer(self, rows, values, timestamps):
+        """Mask of readings newer than their machine's last absorbed one (caller holds the lock)"""
+        last_time = self._last_time[rows]
+        later = np.isnan(last_time) | (timestamps > last_time)
+        # Without a timestamp, a reading identical to the last one is the same snapshot again
+        repeated = (np.isnan(values) | (values == self._last[rows])).all(axis=1)
+        return np.where(np.isnan(timestamps), ~repeated, later)
+
+    def _step(self, rows, values):
+        """Score and absorb at most one reading per machine; returns their z-scores (caller holds the lock)"""
+        mean, var, count = self._mean[rows], self._var[rows], self._count[rows]
+        present = ~np.isnan(values)
+        warm = present & (count >= self.warmup)
+        std = np.maximum(np.sqrt(var), NOISE_FLOOR)
+
+        diff = values - mean
+        z = np.where(warm, diff / std, np.nan)
+        # Past warm-up, clip the pull on the baseline; the first reading of a series is its baseline
+        limit = self.threshold * std
+        diff = np.where(warm, np.clip(diff, -limit, limit), diff)
+        step = self.alpha * diff
+        new_mean = np.where(count == 0, values, mean + step)
+        new_var = np.where(count == 0, 0.0, (1 - self.alpha) * (var + diff * step))
+
+        self._mean[rows] = np.where(present, new_mean, mean)
+        self._var[rows] = np.where(present, new_var, var)
+        self._count[rows] = count + present
+        self._last[rows] = np.where(present, values, self._last[rows])
+        self._last_z[rows] = np.where(present, z, self._last_z[rows])
+        self._last_baseline[rows] = np.where(present, mean, self._last_baseline[rows])
+        return z
+
+    def _row_for(self, machine_id):
+        """State row for a machine, allocating or recycling one if needed (caller holds the lock)"""
+        row = self._rows.get(machine_id)
+        if row is not None:
+            return row
+
+        if len(self._ids) < self.max_machines:
+            row = len(self._ids)
+            if row >= len(self._last_update):
+                self._grow(min(len(self._last_update) * 2, self.max_machines))
+            self._ids.append(machine_id)
+        else:
+            # Full: recycle the least recently updated machine's row
+            row = int(np.argmin(self._last_update[:len(self._ids)]))
+            del self._rows[self._ids[row]]
+            self._ids[row] = machine_id
+            self._mean[row] = 0.0
+            self._var[row] = 0.0
+            self._count[row] = 0
+            self._last[row] = np.nan
+            self._last_z[row] = np.nan
+            self._last_baseline[row] = np.nan
+            self._last_time[row] = np.nan
+
+        # Counts as just updated, so the next new machine in this batch recycles another row
+        self._last_update[row] = time.time()
+        self._rows[machine_id] = row
+        return row
+
+    def _grow(self, rows):
+        """Enlarge the machine dimension (amortized O(1) per new machine)"""
+        extra = rows - len(self._last_update)
+        self._mean = np.concatenate([self._mean, np.zeros((extra, len(METRICS)))])
+        self._var = np.concatenate([self._var, np.zeros((extra, len(METRICS)))])
+        self._count = np.concatenate([self._count, np.zeros((extra, len(METRICS)), dtype=np.int64)])
+        self._last = np.concatenate([self._last, np.full((extra, len(METRICS)), np.nan)])
+        self._last_z = np.concatenate([self._last_z, np.full((extra, len(METRICS)), np.nan)])
+        self._last_baseline = np.concatenate([self._last_baseline, np.full((extra, len(METRICS)), np.nan)])
+        self._last_update = np.concatenate([self._last_update, np.zeros(extra)])
+        self._last_time = np.concatenate([self._last_time, np.full(extra, np.nan)])
+
+
+def _rounds(rows):
+    """Index arrays splitting ``rows`` into rounds where each row occurs at most once, in arrival order"""
+    if len(np.unique(rows)) == len(rows):
+        return [np.arange(len(rows))]
+    order = np.argsort(rows, kind='stable')
+    sorted_rows = rows[order]
+    starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+    sizes = np.diff(np.r_[starts, len(rows)])
+    rank = np.empty(len(rows), dtype=np.int64)
+    rank[order] = np.arange(len(rows)) - np.repeat(starts, sizes)  # k for a machine's k-th reading
+    by_rank = np.argsort(rank, kind='stable')
+    bounds = np.searchsorted(rank[by_rank], np.arange(1, sizes.max()))
+    return np.split(by_rank, bounds)
+
+
+def record_time(machine):
+    """A machine record's ``timestamp`` (epoch seconds or ISO 8601) as epoch seconds, NaN when absent"""
+    value = machine.get('timestamp', machine.get('telemetry', {}).get('timestamp'))
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            pass
+    return np.nan
+
+
+def format_anomalies(anomalies, names=None):
+    """One line per anomaly for prompts and offline reports"""
+    names = names or {}
+    return '\n'.join(
+        f"- {names.get(a['machine_id'], a['machine_id'])} {a['metric']} {a['value']:g} "
+        f"(z={a['z']:+.1f}, usual {a['baseline']:.4g} ± {a['std']:.3g})"
+        for a in anomalies
+    )
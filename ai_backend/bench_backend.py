@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Backend Benchmark - Load test the hybrid backend against a fake provider
+Starts fake_llm_server.py and the backend (Flask or ASGI) as subprocesses, drives
+/api/query, /api/analyze and /api/health at each concurrency level and writes
+throughput, latency percentiles and error rates to JSON so runs can be compared
+
+Run with:  python bench_backend.py --server asgi --concurrency 1,16,64 --requests 300
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS = ['query', 'analyze', 'health']
+CONCURRENCY_LEVELS = [1, 8, 32]
+REQUESTS_PER_LEVEL = 200
+WARMUP_REQUESTS = 5
+STARTUP_TIMEOUT = 60.0
+
+# Same entry point as hybrid_backend.py's __main__, on a free port and without the debugger
+FLASK_LAUNCHER = (
+    "import sys, hybrid_backend as h; h.health_monitor.start(); "
+    "h.app.run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True)"
+)
+
+
+def free_port():
+    """An unused localhost port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, timeout=STARTUP_TIMEOUT, ready=lambda response: response.status_code < 500):
+    """Poll ``url`` until ``ready(response)``; raises RuntimeError on timeout"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if ready(httpx.get(url, timeout=2.0)):
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+def start_fake_provider(args, port):
+    """fake_llm_server.py subprocess with the run's latency, token and 429 settings"""
+    command = [
+        sys.executable, os.path.join(HERE, 'fake_llm_server.py'), '--port', str(port),
+        '--latency', str(args.latency), '--jitter', str(args.jitter), '--tokens', str(args.tokens),
+        '--tokens-per-second', str(args.tokens_per_second), '--rate-limit-rate', str(args.rate_limit_rate),
+        '--retry-after', str(args.retry_after), '--seed', str(args.seed)
+    ]
+    process = subprocess.Popen(command, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for(f'http://127.0.0.1:{port}/stats')
+    return process
+
+
+def start_backend(server, port, provider_url, show_output=False):
+    """Backend subprocess whose OpenRouter and Ollama clients point at the fake provider"""
+    env = dict(os.environ)
+    env['OPENROUTER_BASE_URL'] = f'{provider_url}/v1'
+    env['OLLAMA_HOST'] = provider_url
+    env['GROQ_API_KEY'] = ''  # Never send benchmark traffic to a real provider
+    env['RESPONSE_STORE_PATH'] = ''  # Answers persisted by earlier runs would show up as cache hits
+    if server == 'asgi':
+        command = [sys.executable, '-m', 'uvicorn', 'hybrid_asgi:app', '--host', '127.0.0.1',
+                   '--port', str(port), '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-c', FLASK_LAUNCHER, str(port)]
+    output = None if show_output else subprocess.DEVNULL
+    process = subprocess.Popen(command, cwd=HERE, env=env, stdout=output, stderr=output)
+    wait_for(f'http://127.0.0.1:{port}/api/health')
+    return process
+
+
+def set_mode(base_url, mode):
+    """Switch the backend's mode and wait until the health monitor has a provider for it"""
+    response = httpx.post(f'{base_url}/api/toggle-mode', json={'mode': mode}, timeout=30.0)
+    response.raise_for_status()
+    wait_for(f'{base_url}/api/model-status', ready=lambda r: bool(r.json().get('routing_order')))
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class RequestFactory:
+    """Request bodies per endpoint. Bodies differ per request (unless ``query_pool``
+    limits them) so the response cache and single-flight don't hide provider calls.
+    """
+
+    def __init__(self, seed=42, fleet_size=20, query_pool=0):
+        self.seed = seed
+        self.fleet_size = fleet_size
+        self.query_pool = query_pool
+
+    def build(self, endpoint, i):
+        """(method, path, json body) for request number ``i``"""
+        if endpoint == 'query':
+            n = i % self.query_pool if self.query_pool else i
+            return 'POST', '/api/query', {'query': f'Why is pump P-{n} vibrating above 4.5 mm/s?'}
+        if endpoint == 'analyze':
+            return 'POST', '/api/analyze', {'machines': self.fleet(i)}
+        return 'GET', '/api/health', None
+
+    def fleet(self, i):
+        """Telemetry snapshot shaped like the dashboard's, different for every ``i``"""
+        rng = random.Random(self.seed * 1_000_003 + i)
+        return [{
+            'id': f'M-{m:03d}',
+            'name': f'Machine {m}',
+            'status': rng.choice(['normal', 'normal', 'normal', 'warning', 'critical']),
+            'telemetry': {
+                'temperature': round(rng.gauss(70, 12), 1),
+                'vibration': round(rng.gauss(3.0, 1.2), 2),
+                'pressure': round(rng.gauss(8, 1.5), 1),
+                'load': round(rng.uniform(40, 100), 1),
+                'motorSpeed': round(rng.gauss(1500, 120)),
+                'humidity': round(rng.uniform(30, 70), 1),
+                'oilLevel': round(rng.uniform(50, 100), 1),
+                'noiseLevel': round(rng.gauss(75, 6), 1)
+            }
+        } for m in range(self.fleet_size)]
+
+
+def run_level(base_url, factory, endpoint, concurrency, total, timeout, first_index=0):
+    """Send ``total`` requests from ``concurrency`` closed-loop workers; returns the raw samples.
+
+    Requests are numbered from ``first_index`` so every level sends bodies no earlier level has sent.
+    """
+    samples = []  # (latency seconds, status or None, fallback)
+    lock = threading.Lock()
+    next_index = [first_index]
+    end = first_index + total
+
+    def worker():
+        with httpx.Client(base_url=base_url, timeout=timeout) as client:
+            while True:
+                with lock:
+                    i = next_index[0]
+                    if i >= end:
+                        return
+                    next_index[0] += 1
+                method, path, body = factory.build(endpoint, i)
+                started = time.perf_counter()
+                try:
+                    response = client.request(method, path, json=body)
+                    latency = time.perf_counter() - started
+                    fallback = response.status_code == 200 and bool(_json(response).get('offline_mode'))
+                    sample = (latency, response.status_code, fallback)
+                except httpx.HTTPError:
+                    sample = (time.perf_counter() - started, None, False)
+                with lock:
+                    samples.append(sample)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def _json(response):
+    try:
+        data = response.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def summarize(endpoint, concurrency, samples, elapsed, upstream):
+    """Throughput, latency percentiles (ms) and error/fallback rates for one level"""
+    latencies = sorted(latency for latency, status, _ in samples if status is not None and status < 400)
+    errors = sum(1 for _, status, _ in samples if status is None or status >= 400)
+    fallbacks = sum(1 for _, _, fallback in samples if fallback)
+    count = len(samples)
+    to_ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': count,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(count / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'p50': to_ms(percentile(latencies, 50)),
+            'p95': to_ms(percentile(latencies, 95)),
+            'p99': to_ms(percentile(latencies, 99)),
+            'mean': to_ms(sum(latencies) / len(latencies)) if latencies else None,
+            'max': to_ms(latencies[-1]) if latencies else None
+        },
+        'errors': errors,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'fallbacks': fallbacks,  # 200s answered by the offline fallback (e.g. after a 429)
+        'fallback_rate': round(fallbacks / count, 4) if count else 0.0,
+        'upstream': upstream
+    }
+
+
+def upstream_stats(provider_url):
+    """Completions and injected 429s served by the fake provider so far"""
+    return httpx.get(f'{provider_url}/stats', timeout=5.0).json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the hybrid backend against fake_llm_server.py')
+    parser.add_argument('--server', choices=['flask', 'asgi'], default='flask')
+    parser.add_argument('--mode', choices=['online', 'offline', 'auto'], default='online')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='comma-separated: query,analyze,health')
+    parser.add_argument('--concurrency', default=','.join(map(str, CONCURRENCY_LEVELS)), help='comma-separated levels')
+    parser.add_argument('--requests', type=int, default=REQUESTS_PER_LEVEL, help='requests per endpoint and level')
+    parser.add_argument('--latency', type=float, default=0.5, help='fake provider seconds to first token')
+    parser.add_argument('--jitter', type=float, default=0.2)
+    parser.add_argument('--tokens', type=int, default=64)
+    parser.add_argument('--tokens-per-second', type=float, default=200.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='share of provider calls answered with 429')
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--fleet-size', type=int, default=20, help='machines per /api/analyze request')
+    parser.add_argument('--query-pool', type=int, default=0, help='distinct queries to cycle through (0 = all unique)')
+    parser.add_argument('--timeout', type=float, default=120.0, help='client timeout per request')
+    parser.add_argument('--output', default=None, help='JSON results path')
+    parser.add_argument('--show-server-output', action='store_true')
+    args = parser.parse_args()
+
+    endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(',')]
+    started_at = datetime.now()
+    output = args.output or f"bench_backend_{args.server}_{started_at.strftime('%Y%m%d-%H%M%S')}.json"
+
+    print("╔══════════════════════════════════════╗")
+    print("║         BACKEND LOAD BENCHMARK       ║")
+    print("╚══════════════════════════════════════╝\n")
+
+    provider_url = f'http://127.0.0.1:{free_port()}'
+    backend_port = free_port()
+    base_url = f'http://127.0.0.1:{backend_port}'
+    factory = RequestFactory(seed=args.seed, fleet_size=args.fleet_size, query_pool=args.query_pool)
+    issued = 0  # Requests numbered so far, across warmups and levels
+    processes = []
+    results = []
+    try:
+        processes.append(start_fake_provider(args, int(provider_url.rsplit(':', 1)[1])))
+        print(f"🧪 Fake provider on {provider_url}")
+        processes.append(start_backend(args.server, backend_port, provider_url, args.show_server_output))
+        print(f"🚀 {args.server} backend on {base_url}")
+        set_mode(base_url, args.mode)
+        print(f"🔄 Mode: {args.mode}\n")
+
+        for endpoint in endpoints:
+            # Warm connection pools and lazy imports before anything is measured
+            run_level(base_url, factory, endpoint, 1, WARMUP_REQUESTS, args.timeout, issued)
+            issued += WARMUP_REQUESTS
+            for concurrency in levels:
+                before = upstream_stats(provider_url)
+                samples, elapsed = run_level(base_url, factory, endpoint, concurrency, args.requests, args.timeout, issued)
+                issued += args.requests
+                after = upstream_stats(provider_url)
+                upstream = {name: after[name] - before[name] for name in after}
+                result = summarize(endpoint, concurrency, samples, elapsed, upstream)
+                results.append(result)
+
+                latency = result['latency_ms']
+                print(f"📊 {endpoint:<8} x{concurrency:<3} {result['throughput_rps']:8.1f} req/s   "
+                      f"p50 {latency['p50'] or 0:8.1f} ms   p95 {latency['p95'] or 0:8.1f} ms   "
+                      f"p99 {latency['p99'] or 0:8.1f} ms   errors {result['error_rate']:.1%}   "
+                      f"fallbacks {result['fallback_rate']:.1%}")
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    report = {
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'server': args.server,
+        'mode': args.mode,
+        'requests_per_level': args.requests,
+        'seed': args.seed,
+        'fleet_size': args.fleet_size,
+        'query_pool': args.query_pool,
+        'provider': {
+            'latency': args.latency, 'jitter': args.jitter, 'tokens': args.tokens,
+            'tokens_per_second': args.tokens_per_second, 'rate_limit_rate': args.rate_limit_rate,
+            'retry_after': args.retry_after
+        },
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'results': results
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Fleet Rules Benchmark - Per-machine loop vs vectorized NumPy rule engine
+Checks both produce identical analyses, then times them at 10k and 100k machines
+"""
+
+import random
+import time
+
+from fleet_rules import FleetSnapshot, evaluate_fleet
+
+FLEET_SIZES = [10_000, 100_000]
+REPEATS = 5
+SCENARIOS = [
+    ("mock telemetry", 1.0, False),   # generate_factory_data: most machines raise something
+    ("healthy fleet", 0.2, False),    # steady plant: only a small share of assets out of range
+    ("integer sensors", 1.0, True)    # some readings arrive as ints, mixed with floats
+]
+
+
+def analyze_scalar(factory_data):
+    """Reference implementation: the original per-machine LocalAIAgent loop"""
+    analysis = {
+        "overall_health": "Good",
+        "critical_issues": [],
+        "warnings": [],
+        "recommendations": []
+    }
+
+    for machine in factory_data:
+        name = machine['name']
+        temp = machine['temperature']
+        vib = machine['vibration']
+        pressure = machine['pressure']
+        status = machine['status']
+
+        if temp > 90:
+            analysis["critical_issues"].append(f"{name}: Critical temperature ({temp}°C)")
+        elif temp > 80:
+            analysis["warnings"].append(f"{name}: High temperature ({temp}°C)")
+
+        if vib > 40:
+            analysis["critical_issues"].append(f"{name}: Excessive vibration ({vib} mm/s)")
+        elif vib > 30:
+            analysis["warnings"].append(f"{name}: Elevated vibration ({vib} mm/s)")
+
+        if pressure > 10:
+            analysis["critical_issues"].append(f"{name}: Over-pressure ({pressure} bar)")
+        elif pressure > 8.5:
+            analysis["warnings"].append(f"{name}: High pressure ({pressure} bar)")
+
+        if status == 'critical':
+            analysis["critical_issues"].append(f"{name}: System reports critical status")
+        elif status == 'warning':
+            analysis["warnings"].append(f"{name}: System reports warning status")
+
+    if analysis["critical_issues"]:
+        analysis["recommendations"].extend([
+            "Immediate shutdown of critical machines recommended",
+            "Perform emergency maintenance on flagged equipment",
+            "Check cooling systems and fluid levels"
+        ])
+
+    if analysis["warnings"]:
+        analysis["recommendations"].extend([
+            "Schedule preventive maintenance within 24-48 hours",
+            "Monitor trending parameters closely",
+            "Verify sensor calibration"
+        ])
+
+    if analysis["critical_issues"]:
+        analysis["overall_health"] = "Critical"
+    elif len(analysis["warnings"]) > 2:
+        analysis["overall_health"] = "Poor"
+    elif analysis["warnings"]:
+        analysis["overall_health"] = "Fair"
+
+    return analysis
+
+
+def generate_fleet(size, spread=1.0, seed=42, integers=False):
+    """Mock fleet; spread=1.0 matches LocalAIAgent.generate_factory_data's distributions.
+
+    With ``integers`` every other machine reports whole-number readings as ints.
+    """
+    rng = random.Random(seed)
+    statuses = ['normal', 'normal', 'normal', 'warning', 'critical'] if spread >= 1.0 else ['normal'] * 98 + ['warning', 'critical']
+    reading = lambda i, value: round(value) if integers and i % 2 else round(value, 1)
+    return [{
+        'name': f"MACHINE-{i:06d}",
+        'temperature': reading(i, 70 + rng.gauss(0, 15 * spread)),
+        'vibration': reading(i, 25 + rng.gauss(0, 10 * spread)),
+        'pressure': reading(i, 8 + rng.gauss(0, 2 * spread)),
+        'status': rng.choice(statuses)
+    } for i in range(size)]
+
+
+def best_time(func, *args):
+    """Best wall time over REPEATS runs, in seconds"""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print("╔══════════════════════════════════════╗")
+    print("║       FLEET RULE ENGINE BENCHMARK    ║")
+    print("╚══════════════════════════════════════╝\n")
+
+    for scenario, spread, integers in SCENARIOS:
+        for size in FLEET_SIZES:
+            records = generate_fleet(size, spread, integers=integers)
+            snapshot = FleetSnapshot.from_records(records)
+
+            reference = analyze_scalar(records)
+            assert evaluate_fleet(snapshot) == reference, "vectorized analysis differs from reference"
+            flagged = len({issue.split(':')[0] for issue in reference['critical_issues'] + reference['warnings']})
+
+            # Rule evaluation is compared on its own: ingestion is expected to deliver columns
+            scalar = best_time(analyze_scalar, records)
+            vectorized = best_time(evaluate_fleet, snapshot)
+            conversion = best_time(FleetSnapshot.from_records, records)
+
+            print(f"📊 {size:>7,} machines - {scenario} ({flagged / size:.0%} flagged)")
+            print(f"   Per-machine loop:   {scalar * 1000:8.2f} ms")
+            print(f"   Vectorized engine:  {vectorized * 1000:8.2f} ms  ({scalar / vectorized:5.1f}x faster)")
+            print(f"   Records → columns:  {conversion * 1000:8.2f} ms  (only when input arrives as row dicts)")
+            print()
+
+if __name__ == "__main__":
+    main()
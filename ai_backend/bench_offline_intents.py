@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Offline Intents Benchmark - Per-topic ``in`` scan vs the precompiled IntentMatcher
+Checks both pick the same topic, then times them against a few thousand topics
+"""
+
+import random
+import time
+
+from offline_intents import IntentMatcher, maintenance_intents
+
+TOPIC_COUNTS = [6, 1_000, 5_000]
+QUERIES = 2_000
+REPEATS = 5
+SEED = 42
+
+# Topic words and filler words are kept apart so each query names exactly one topic
+TOPIC_SYLLABLES = ['hy', 'dra', 'lic', 'mo', 'tor', 'pu', 'mp', 'va', 'lve', 'gear', 'belt', 'seal', 'ro', 'tor', 'shaft']
+FILLER_WORDS = ['why', 'is', 'the', 'my', 'on', 'line', 'three', 'acting', 'up', 'again', 'today', 'what', 'should', 'we',
+                'check', 'before', 'next', 'shift', 'after', 'restart', 'and', 'how', 'often']
+
+
+def linear_match(topics, query):
+    """Reference implementation: the original lowercase + ``in`` scan per topic"""
+    query_lower = query.lower()
+    for topic in topics:
+        if topic in query_lower:
+            return topic
+    return None
+
+
+def generate_topics(count, rng):
+    """``count`` one- to three-word topic phrases; every word is numbered and used once,
+    so no topic occurs inside another and the substring scan stays a valid reference
+    """
+    topics = []
+    word_id = 0
+    for _ in range(count):
+        words = []
+        for _ in range(rng.randint(1, 3)):
+            words.append(''.join(rng.choice(TOPIC_SYLLABLES) for _ in range(rng.randint(1, 3))) + f'{word_id:05d}')
+            word_id += 1
+        topics.append(' '.join(words))
+    return topics
+
+
+def generate_queries(topics, count, rng):
+    """Queries of filler words with one topic phrase (or none, one in five) at a random position"""
+    queries = []
+    for _ in range(count):
+        words = [rng.choice(FILLER_WORDS) for _ in range(rng.randint(6, 16))]
+        if rng.random() < 0.8:
+            words.insert(rng.randint(0, len(words)), rng.choice(topics).upper() if rng.random() < 0.2 else rng.choice(topics))
+        queries.append(' '.join(words) + '?')
+    return queries
+
+
+def best_time(func, queries):
+    """Best wall time over REPEATS runs through all queries, in seconds"""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for query in queries:
+            func(query)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print("╔══════════════════════════════════════╗")
+    print("║      OFFLINE INTENT MATCH BENCHMARK  ║")
+    print("╚══════════════════════════════════════╝\n")
+
+    rng = random.Random(SEED)
+    for count in TOPIC_COUNTS:
+        if count == len(maintenance_intents.topics):
+            topics, matcher, label = maintenance_intents.topics, maintenance_intents, "backend fallback topics (matcher also checks synonyms)"
+            queries = [f"what should we check on the {topic} today?" for topic in topics] * (QUERIES // len(topics))
+        else:
+            topics = generate_topics(count, rng)
+            start = time.perf_counter()
+            matcher = IntentMatcher(topics)
+            build = time.perf_counter() - start
+            label = f"synthetic topics, compiled in {build * 1000:.0f} ms"
+            queries = generate_queries(topics, QUERIES, rng)
+
+            # Topics are whole words here, so the substring scan is a valid reference
+            mismatches = sum(1 for query in queries if matcher.match(query) != linear_match(topics, query))
+            assert not mismatches, f"{mismatches} queries matched a different topic"
+
+        linear = best_time(lambda query: linear_match(topics, query), queries)
+        compiled = best_time(matcher.match, queries)
+
+        print(f"📊 {count:>6,} topics - {label}")
+        print(f"   Per-topic `in` scan:  {linear / len(queries) * 1e6:9.2f} µs/query")
+        print(f"   IntentMatcher:        {compiled / len(queries) * 1e6:9.2f} µs/query  ({linear / compiled:6.1f}x speedup)")
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Circuit Breaker - Closed / open / half-open state per provider
+Trips on the recent error or timeout rate so requests fail fast to another
+provider or the offline fallback while a provider is down, then lets a single
+trial request through to find out whether it has recovered
+"""
+
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def is_timeout_error(error_str):
+    """Check whether an error message describes a timed-out call"""
+    error_str = (error_str or '').lower()
+    return 'timed out' in error_str or 'timeout' in error_str
+
+
+class CircuitBreaker:
+    """Breaker over a provider's last ``window`` call outcomes.
+
+    Closed: every call goes through. Once at least ``min_calls`` outcomes are
+    recorded, a failure rate of ``failure_rate`` or a timeout rate of
+    ``timeout_rate`` trips it open. Open: calls are refused for
+    ``open_seconds``. Half-open: one trial call is let through; success
+    closes the breaker, failure opens it again. A trial that never reports
+    back frees the slot after ``trial_timeout`` seconds.
+
+    Not locked on its own - ProviderHealthMonitor calls it under its lock.
+    """
+
+    def __init__(self, failure_rate=0.5, timeout_rate=0.25, window=20, min_calls=4,
+                 open_seconds=15.0, trial_timeout=120.0):
+        self.failure_rate = failure_rate
+        self.timeout_rate = timeout_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.trial_timeout = trial_timeout
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # 'ok', 'error' or 'timeout'
+        self._opened_at = None
+        self._open_for = open_seconds
+        self._trial_started = None
+        self.trips = 0
+        self.rejected = 0
+
+    def available(self, now=None):
+        """Whether a call would be let through right now (nothing is reserved)"""
+        now = self._tick(now)
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN:
+            return not self._trial_active(now)
+        return False
+
+    def allow(self, now=None):
+        """Admit a call; in half-open state only the first caller becomes the trial"""
+        now = self._tick(now)
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._trial_active(now):
+            self._trial_started = now
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        """A call succeeded - closes the breaker from any state"""
+        if self.state != CLOSED:
+            self.state = CLOSED
+            self._outcomes.clear()  # Start the new closed period with a clean window
+            self._trial_started = None
+        self._outcomes.append('ok')
+
+    def record_failure(self, timeout=False, now=None):
+        """A call failed; trips the breaker if the failure or timeout rate is too high"""
+        now = self._tick(now)
+        self._outcomes.append('timeout' if timeout else 'error')
+        if self.state == HALF_OPEN:
+            self.trip(now=now)  # The trial failed
+        elif self.state == CLOSED and self._over_threshold():
+            self.trip(now=now)
+
+    def trip(self, seconds=None, now=None):
+        """Open the breaker for ``seconds`` (default ``open_seconds``)"""
+        self.state = OPEN
+        self._opened_at = time.monotonic() if now is None else now
+        self._open_for = seconds if seconds is not None else self.open_seconds
+        self._trial_started = None
+        self.trips += 1
+
+    def release(self):
+        """The half-open trial ended without an outcome; let the next caller try"""
+        self._trial_started = None
+
+    def rates(self):
+        """(failure rate, timeout rate) over the current window"""
+        if not self._outcomes:
+            return 0.0, 0.0
+        calls = len(self._outcomes)
+        failures = sum(1 for outcome in self._outcomes if outcome != 'ok')
+        timeouts = sum(1 for outcome in self._outcomes if outcome == 'timeout')
+        return failures / calls, timeouts / calls
+
+    def stats(self, now=None):
+        """State, recent rates and how often the breaker has tripped or refused calls"""
+        now = self._tick(now)
+        failure_rate, timeout_rate = self.rates()
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = round(max(0.0, self._opened_at + self._open_for - now), 3)
+        return {
+            'state': self.state,
+            'failure_rate': round(failure_rate, 3),
+            'timeout_rate': round(timeout_rate, 3),
+            'calls': len(self._outcomes),
+            'trips': self.trips,
+            'rejected': self.rejected,
+            'retry_in_seconds': retry_in
+        }
+
+    def _tick(self, now):
+        """Move from open to half-open once the open period is over; returns ``now``"""
+        now = time.monotonic() if now is None else now
+        if self.state == OPEN and now >= self._opened_at + self._open_for:
+            self.state = HALF_OPEN
+            self._trial_started = None
+        return now
+
+    def _trial_active(self, now):
+        return self._trial_started is not None and now - self._trial_started < self.trial_timeout
+
+    def _over_threshold(self):
+        if len(self._outcomes) < self.min_calls:
+            return False
+        failure_rate, timeout_rate = self.rates()
+        return failure_rate >= self.failure_rate or timeout_rate >= self.timeout_rate
@@ -0,0 +1,59 @@
+"""
+Downsample - Largest-Triangle-Three-Buckets for trend charts
+Reduces a long series to about one point per pixel while keeping its visual
+shape (peaks, dips and steps), so a week of 1 Hz history fits in a chart payload
+"""
+
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """Indices of the ``threshold`` points LTTB keeps from ``(x, y)``, first and last included.
+
+    The series is split into ``threshold - 2`` equal-count buckets; from each,
+    the point forming the largest triangle with the previously kept point and
+    the next bucket's average is kept. Bucket bounds, averages and the padded
+    candidate matrix are computed in bulk; only the per-bucket pick, which
+    depends on the previous pick, runs bucket by bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64) - x[0]  # Keep precision with epoch timestamps
+    y = np.asarray(y, dtype=np.float64)
+    buckets = threshold - 2
+    # Bucket b covers points edges[b]:edges[b + 1] of the interior (first and last point excluded)
+    edges = (1 + np.arange(buckets + 1) * (n - 2) / buckets).astype(np.int64)
+    edges[-1] = n - 1
+    sizes = np.diff(edges)
+
+    # Next-bucket averages; the last bucket looks ahead to the final point
+    x_sums, y_sums = np.add.reduceat(x[:-1], edges[:-1]), np.add.reduceat(y[:-1], edges[:-1])
+    next_x = np.append(x_sums[1:] / sizes[1:], x[-1])
+    next_y = np.append(y_sums[1:] / sizes[1:], y[-1])
+
+    # Candidates per bucket as rows, padded with the bucket's first point (never beats a real one)
+    width = int(sizes.max())
+    rows = edges[:-1, None] + np.minimum(np.arange(width)[None, :], sizes[:, None] - 1)
+    row_x, row_y = x[rows], y[rows]
+
+    # Twice the triangle area against kept point (ax, ay) is |y*(ax - cx) + x*(cy - ay) + (cx*ay - ax*cy)|
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    ax, ay = x[0], y[0]
+    for b in range(buckets):
+        cx, cy = next_x[b], next_y[b]
+        areas = np.abs(row_y[b] * (ax - cx) + row_x[b] * (cy - ay) + (cx * ay - ax * cy))
+        choice = rows[b, areas.argmax()]
+        kept[b + 1] = choice
+        ax, ay = x[choice], y[choice]
+    return kept
+
+
+def downsample_points(x, y, width, decimals=3):
+    """``[[x, y], ...]`` of the LTTB-kept points, rounded for a JSON payload"""
+    kept = lttb(x, y, width)
+    x = np.asarray(x, dtype=np.float64)[kept].round(decimals)
+    y = np.asarray(y, dtype=np.float64)[kept].round(decimals)
+    return np.column_stack([x, y]).tolist()
@@ -0,0 +1,148 @@
+"""
+Event Bus - In-process fan-out of backend events to dashboard subscribers
+Mode changes, provider health transitions, alerts and finished analyses are
+published once and delivered to every open /api/events stream, so dashboards
+stop polling and backend load follows events instead of open tabs
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+class TooManySubscribers(Exception):
+    """Raised by subscribe() when ``max_subscribers`` streams are already open"""
+
+
+class EventBus:
+    """Delivers published events to every subscriber.
+
+    Events get increasing integer IDs and the last ``history`` are kept, so a
+    client reconnecting with the last ID it saw (SSE ``Last-Event-ID``) gets
+    what it missed. Each subscriber buffers at most ``max_pending`` events; a
+    subscriber that falls further behind loses the oldest ones and gets a
+    ``lagged`` event telling it to refetch state. publish() never blocks on a
+    slow reader.
+    """
+
+    def __init__(self, history=256, max_pending=256, max_subscribers=256):
+        self.max_pending = max_pending
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._next_id = 1
+        self._published = {}  # event name -> count
+        self._dropped = 0
+        self._rejected = 0
+
+    def publish(self, event, data):
+        """Send ``data`` as ``event`` to every subscriber; returns the event ID"""
+        with self._lock:
+            item = (self._next_id, event, data, time.time())
+            self._next_id += 1
+            self._history.append(item)
+            self._published[event] = self._published.get(event, 0) + 1
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber._deliver(item)
+        return item[0]
+
+    def subscribe(self, last_event_id=None, events=None, loop=None):
+        """Open a subscription.
+
+        ``events`` limits it to those event names. With ``last_event_id``, retained
+        events after that ID are queued first. Pass the running asyncio ``loop``
+        to wait with Subscription.next_async() instead of next().
+        """
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self._rejected += 1
+                raise TooManySubscribers(f"{len(self._subscribers)} event streams already open")
+            subscriber = Subscription(self, events, loop)
+            if last_event_id is not None:
+                for item in self._history:
+                    if item[0] > last_event_id:
+                        subscriber._deliver(item)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def stats(self):
+        """Subscriber count and events published per name"""
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'max_subscribers': self.max_subscribers,
+                'last_event_id': self._next_id - 1,
+                'published': dict(self._published),
+                'dropped': self._dropped,
+                'rejected': self._rejected
+            }
+
+    def _remove(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            self._dropped += subscriber.dropped
+
+
+class Subscription:
+    """One subscriber's queue of ``(id, event, data, published_at)`` tuples"""
+
+    def __init__(self, bus, events, loop):
+        self.bus = bus
+        self.events = frozenset(events) if events else None
+        self.dropped = 0
+        self._pending = deque()
+        self._lagged = 0  # Events dropped since the last read
+        self._ready = threading.Condition(threading.Lock())
+        self._loop = loop
+        self._async_ready = asyncio.Event() if loop is not None else None
+
+    def next(self, timeout):
+        """Events waiting for this subscriber, blocking up to ``timeout`` seconds; [] on timeout"""
+        with self._ready:
+            if not self._pending and not self._lagged:
+                self._ready.wait(timeout)
+            return self._drain()
+
+    async def next_async(self, timeout):
+        """next() for subscriptions opened with an event loop"""
+        with self._ready:
+            if self._pending or self._lagged:
+                return self._drain()
+            self._async_ready.clear()
+        try:
+            await asyncio.wait_for(self._async_ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self._ready:
+            return self._drain()
+
+    def close(self):
+        """Stop receiving events"""
+        self.bus._remove(self)
+
+    def _drain(self):
+        items = list(self._pending)
+        self._pending.clear()
+        if self._lagged:
+            items.insert(0, (None, 'lagged', {'dropped': self._lagged}, time.time()))
+            self._lagged = 0
+        return items
+
+    def _deliver(self, item):
+        if self.events is not None and item[1] not in self.events:
+            return
+        with self._ready:
+            if len(self._pending) >= self.bus.max_pending:
+                self._pending.popleft()
+                self._lagged += 1
+                self.dropped += 1
+            self._pending.append(item)
+            self._ready.notify()
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._async_ready.set)
+            except RuntimeError:
+                pass  # Loop already closed - the stream is going away
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Fake LLM Server - Local stand-in for the OpenAI-compatible and Ollama APIs
+Answers chat completions after a configurable latency and token rate, streams
+them like the real providers and can inject 429s, so the backends can be
+benchmarked without spending provider quota.
+
+Run with:  python fake_llm_server.py --port 8089 --latency 0.5 --tokens-per-second 50
+Then point a backend at it with OPENROUTER_BASE_URL=http://127.0.0.1:8089/v1
+and OLLAMA_HOST=http://127.0.0.1:8089
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+OLLAMA_MODELS = ['gpt-oss:20b']
+
+
+class FakeProviderConfig:
+    """Simulated provider behaviour.
+
+    ``latency`` is the time to the first token (± ``jitter`` as a fraction),
+    after which ``tokens`` tokens arrive at ``tokens_per_second``. A share
+    ``rate_limit_rate`` of completions is answered with a 429. The advertised
+    rate-limit headers let the backends' client-side limiters run unthrottled.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.2, tokens=64, tokens_per_second=50.0,
+                 rate_limit_rate=0.0, retry_after=1.0, advertised_rpm=100000, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens = tokens
+        self.tokens_per_second = tokens_per_second
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.advertised_rpm = advertised_rpm
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.completions = 0
+        self.rate_limited = 0
+
+    def next_call(self):
+        """(first-token delay, rate limited?) for the next completion"""
+        with self._lock:
+            self.completions += 1
+            limited = self._rng.random() < self.rate_limit_rate
+            if limited:
+                self.rate_limited += 1
+            spread = self._rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, self.latency * (1 + spread)), limited
+
+    def token_gap(self):
+        """Seconds between streamed tokens"""
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def stats(self):
+        """Completions served and how many were rate limited"""
+        with self._lock:
+            return {'completions': self.completions, 'rate_limited': self.rate_limited}
+
+
+def fake_tokens(count):
+    """Deterministic response text split into ``count`` tokens"""
+    words = ['Check', ' bearing', ' temperature', ',', ' vibration', ' and', ' lubrication', '.']
+    return [words[i % len(words)] for i in range(count)]
+
+
+def rate_limit_message(config):
+    """429 body worded like Groq/OpenRouter so the backends' parsers recognise it"""
+    return (f"Rate limit reached for model on requests per minute (RPM): Limit {config.advertised_rpm}, "
+            f"Used {config.advertised_rpm}, Requested 1. Please try again in {config.retry_after:g}s.")
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    """OpenAI ``/v1`` and Ollama ``/api`` routes backed by the server's FakeProviderConfig"""
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real APIs
+
+    def log_message(self, format, *args):
+        pass  # Per-request logging would dominate a benchmark
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def do_GET(self):
+        if self.path.rstrip('/') in ('/v1/models', '/models'):
+            self._send_json(200, {'object': 'list', 'data': [{'id': 'openai/gpt-oss-120b', 'object': 'model'}]})
+        elif self.path == '/api/tags':
+            self._send_json(200, {'models': [{'name': name, 'model': name, 'size': 0} for name in OLLAMA_MODELS]})
+        elif self.path == '/stats':
+            self._send_json(200, self.config.stats())
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        body = self._read_json()
+        if self.path.endswith('/chat/completions'):
+            self._openai_completion(body)
+        elif self.path == '/api/chat':
+            self._ollama_chat(body)
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def _openai_completion(self, body):
+        delay, limited = self.config.next_call()
+        time.sleep(delay)
+        if limited:
+            self._send_json(429, {'error': {
+                'message': rate_limit_message(self.config), 'type': 'requests', 'code': 'rate_limit_exceeded'
+            }}, {'retry-after': f'{self.config.retry_after:g}'})
+            return
+
+        model = body.get('model', 'openai/gpt-oss-120b')
+        completion_id = f'chatcmpl-{uuid.uuid4().hex[:12]}'
+        tokens = fake_tokens(self.config.tokens)
+        prompt_tokens = sum(len(str(message.get('content', ''))) for message in body.get('messages', [])) // 4
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(tokens),
+                 'total_tokens': prompt_tokens + len(tokens)}
+        headers = self._rate_limit_headers()
+
+        if not body.get('stream'):
+            time.sleep(len(tokens) * self.config.token_gap())
+            self._send_json(200, {
+                'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ''.join(tokens)},
+                             'finish_reason': 'stop'}],
+                'usage': usage
+            }, headers)
+            return
+
+        def chunk(delta, finish_reason=None):
+            return {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+
+        self._start_chunked(200, 'text/event-stream', headers)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.config.token_gap())
+            self._send_chunk(f'data: {json.dumps(chunk({"content": token}))}\n\n')
+        self._send_chunk(f'data: {json.dumps(chunk({}, "stop"))}\n\n')
+        self._send_chunk('data: [DONE]\n\n')
+        self._end_chunked()
+
+    def _ollama_chat(self, body):
+        delay, limited = self.config.next_call()
+        time.sleep(delay)
+        if limited:
+            self._send_json(429, {'error': rate_limit_message(self.config)})
+            return
+
+        model = body.get('model', OLLAMA_MODELS[0])
+        tokens = fake_tokens(self.config.tokens)
+        prompt_tokens = sum(len(str(message.get('content', ''))) for message in body.get('messages', [])) // 4
+
+        def message(content, done):
+            payload = {'model': model, 'created_at': datetime.now(timezone.utc).isoformat(),
+                       'message': {'role': 'assistant', 'content': content}, 'done': done}
+            if done:
+                payload.update(done_reason='stop', prompt_eval_count=prompt_tokens, eval_count=len(tokens))
+            return payload
+
+        if body.get('stream') is False:
+            time.sleep(len(tokens) * self.config.token_gap())
+            self._send_json(200, message(''.join(tokens), True))
+            return
+
+        self._start_chunked(200, 'application/x-ndjson')
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.config.token_gap())
+            self._send_chunk(json.dumps(message(token, False)) + '\n')
+        self._send_chunk(json.dumps(message('', True)) + '\n')
+        self._end_chunked()
+
+    def _rate_limit_headers(self):
+        rpm = self.config.advertised_rpm
+        return {
+            'x-ratelimit-limit-requests': str(rpm),
+            'x-ratelimit-remaining-requests': str(rpm - 1),
+            'x-ratelimit-reset-requests': '1s'
+        }
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_chunked(self, status, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _send_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+
+class FakeProviderServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the shared FakeProviderConfig"""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, config):
+        self.config = config
+        super().__init__(address, FakeProviderHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the OpenAI-compatible and Ollama APIs')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds to the first token')
+    parser.add_argument('--jitter', type=float, default=0.2, help='latency spread as a fraction (0.2 = ±20%%)')
+    parser.add_argument('--tokens', type=int, default=64, help='tokens per completion')
+    parser.add_argument('--tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='share of completions answered with a 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='wait hint sent with each 429, in seconds')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeProviderConfig(
+        latency=args.latency, jitter=args.jitter, tokens=args.tokens, tokens_per_second=args.tokens_per_second,
+        rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, seed=args.seed
+    )
+    server = FakeProviderServer((args.host, args.port), config)
+    print(f"🧪 Fake LLM server on http://{args.host}:{args.port}")
+    print(f"⏱️  {args.latency}s to first token, {args.tokens} tokens at {args.tokens_per_second}/s, "
+          f"{args.rate_limit_rate:.0%} rate limited")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
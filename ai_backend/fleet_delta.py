@@ -0,0 +1,232 @@
+"""
+Fleet Delta - Incremental fleet analysis
+Remembers the last analyzed snapshot per fleet and works out which machines
+crossed a threshold or drifted enough to be worth sending to the model again
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from fleet_rules import (
+    TEMPERATURE_WARNING, TEMPERATURE_CRITICAL, VIBRATION_WARNING, VIBRATION_CRITICAL,
+    PRESSURE_WARNING, PRESSURE_CRITICAL
+)
+from lstm_memory_agent import METRICS
+
+# Smallest change per metric that counts as material drift
+DRIFT_TOLERANCES = {
+    'temperature': 2.0,
+    'motorSpeed': 100.0,
+    'pressure': 0.3,
+    'vibration': 2.0,
+    'load': 5.0,
+    'humidity': 5.0,
+    'oilLevel': 5.0,
+    'noiseLevel': 3.0
+}
+
+# Metrics summarized as ranges for the machines that did not change
+SUMMARY_METRICS = ('temperature', 'vibration', 'pressure', 'load')
+
+
+def machine_id(machine):
+    """Stable identifier for a machine record"""
+    return str(machine.get('id') or machine.get('name'))
+
+
+def machine_readings(machine):
+    """Metric readings in METRICS order, None where missing"""
+    telemetry = machine.get('telemetry', machine)
+    readings = []
+    for metric in METRICS:
+        value = telemetry.get(metric)
+        readings.append(float(value) if isinstance(value, (int, float)) else None)
+    return tuple(readings)
+
+
+def machine_severity(machine):
+    """'critical', 'warning' or 'normal' using the fleet rule thresholds and reported status"""
+    telemetry = machine.get('telemetry', machine)
+    status = machine.get('status')
+    limits = (
+        ('temperature', TEMPERATURE_WARNING, TEMPERATURE_CRITICAL),
+        ('vibration', VIBRATION_WARNING, VIBRATION_CRITICAL),
+        ('pressure', PRESSURE_WARNING, PRESSURE_CRITICAL)
+    )
+    values = [(telemetry.get(metric), warning, critical) for metric, warning, critical in limits]
+    numeric = [(v, w, c) for v, w, c in values if isinstance(v, (int, float))]
+
+    if status == 'critical' or any(v > c for v, w, c in numeric):
+        return 'critical'
+    if status == 'warning' or any(v > w for v, w, c in numeric):
+        return 'warning'
+    return 'normal'
+
+
+def format_readings(readings):
+    """Compact ``metric=value`` list for a machine's readings"""
+    return ' '.join(f"{metric}={value:.1f}" for metric, value in zip(METRICS, readings) if value is not None)
+
+
+class FleetDeltaTracker:
+    """Last analyzed snapshot and payload per fleet, bounded to ``max_fleets`` (LRU)"""
+
+    def __init__(self, max_fleets=64):
+        self.max_fleets = max_fleets
+        self._lock = threading.Lock()
+        self._fleets = OrderedDict()  # fleet id -> {'mode', 'machines', 'payload'}
+
+    def diff(self, fleet_id, machine_data, mode):
+        """Compare a snapshot against the fleet's last analyzed one"""
+        with self._lock:
+            baseline = self._fleets.get(fleet_id)
+            if baseline is not None:
+                self._fleets.move_to_end(fleet_id)
+
+        if baseline is None or baseline['mode'] != mode:
+            changed = [{'machine': machine, 'reasons': ["no baseline"]} for machine in machine_data]
+            return {'full': True, 'changed': changed, 'removed': [], 'unchanged': [], 'previous': None}
+
+        previous = baseline['machines']
+        changed, unchanged, seen = [], [], set()
+        for machine in machine_data:
+            key = machine_id(machine)
+            seen.add(key)
+            reasons = self._changes(previous.get(key), machine)
+            if reasons:
+                changed.append({'machine': machine, 'reasons': reasons})
+            else:
+                unchanged.append(machine)
+
+        removed = [state['name'] for key, state in previous.items() if key not in seen]
+        return {'full': False, 'changed': changed, 'removed': removed, 'unchanged': unchanged, 'previous': baseline['payload']}
+
+    def commit(self, fleet_id, machine_data, mode, payload, delta=None):
+        """Make this analysis the fleet's new baseline.
+
+        After a partial ``delta`` only the changed and removed machines are
+        re-baselined; unchanged machines keep the readings they were last
+        analyzed with, so slow drift still adds up to a change.
+        """
+        if delta is None or delta['full']:
+            machines = {machine_id(machine): self._state(machine) for machine in machine_data}
+        else:
+            with self._lock:
+                baseline = self._fleets.get(fleet_id)
+                machines = dict(baseline['machines']) if baseline is not None else {}
+            current = {machine_id(machine) for machine in machine_data}
+            machines = {key: state for key, state in machines.items() if key in current}
+            for change in delta['changed']:
+                machines[machine_id(change['machine'])] = self._state(change['machine'])
+
+        with self._lock:
+            self._fleets[fleet_id] = {'mode': mode, 'machines': machines, 'payload': payload}
+            self._fleets.move_to_end(fleet_id)
+            while len(self._fleets) > self.max_fleets:
+                self._fleets.popitem(last=False)
+
+    def forget(self, fleet_id):
+        """Drop a fleet's baseline so its next analysis is a full one"""
+        with self._lock:
+            self._fleets.pop(fleet_id, None)
+
+    def _state(self, machine):
+        """Baseline entry for a machine"""
+        return {
+            'name': machine.get('name', machine_id(machine)),
+            'status': machine.get('status'),
+            'severity': machine_severity(machine),
+            'readings': machine_readings(machine)
+        }
+
+    def _changes(self, state, machine):
+        """Reasons a machine is worth re-analyzing, empty when it has not materially changed"""
+        if state is None:
+            return ["new machine"]
+
+        reasons = []
+        status = machine.get('status')
+        if status != state['status']:
+            reasons.append(f"status {state['status']} → {status}")
+
+        severity = machine_severity(machine)
+        if severity != state['severity']:
+            reasons.append(f"severity {state['severity']} → {severity}")
+
+        for metric, old, new in zip(METRICS, state['readings'], machine_readings(machine)):
+            if old is None or new is None:
+                if old != new:
+                    reasons.append(f"{metric} {'reading lost' if new is None else 'reading restored'}")
+                continue
+            if abs(new - old) >= DRIFT_TOLERANCES[metric]:
+                reasons.append(f"{metric} {old:.1f} → {new:.1f}")
+        return reasons
+
+
+class AlertTracker:
+    """Last severity per machine (LRU, ``max_machines``), turning telemetry into alert transitions"""
+
+    def __init__(self, max_machines=4096):
+        self.max_machines = max_machines
+        self._lock = threading.Lock()
+        self._severities = OrderedDict()  # machine id -> severity
+
+    def update(self, machine_data):
+        """Alerts for machines whose severity changed; a machine first seen as normal raises none"""
+        alerts = []
+        now = datetime.now().isoformat()
+        with self._lock:
+            for machine in machine_data:
+                key = machine_id(machine)
+                severity = machine_severity(machine)
+                previous = self._severities.get(key, 'normal')
+                self._severities[key] = severity
+                self._severities.move_to_end(key)
+                if severity == previous:
+                    continue
+                name = machine.get('name', key)
+                readings = format_readings(machine_readings(machine))
+                alerts.append({
+                    'id': f"{key}-{now}",
+                    'machine': name,
+                    'machine_id': key,
+                    'severity': severity,
+                    'previous': previous,
+                    'cleared': severity == 'normal',
+                    'message': f"{name} back to normal" if severity == 'normal' else f"{name} is {severity}: {readings}",
+                    'timestamp': now
+                })
+            while len(self._severities) > self.max_machines:
+                self._severities.popitem(last=False)
+        return alerts
+
+
+def summarize_machines(machines):
+    """One-line status counts and metric ranges for a group of machines"""
+    if not machines:
+        return "none"
+
+    statuses = {}
+    for machine in machines:
+        status = machine.get('status', 'unknown')
+        statuses[status] = statuses.get(status, 0) + 1
+    parts = [', '.join(f"{status}={count}" for status, count in sorted(statuses.items()))]
+
+    readings = [machine_readings(machine) for machine in machines]
+    for metric in SUMMARY_METRICS:
+        index = METRICS.index(metric)
+        values = [r[index] for r in readings if r[index] is not None]
+        if values:
+            parts.append(f"{metric} {min(values):.1f}-{max(values):.1f}")
+    return '; '.join(parts)
+
+
+def delta_summary(delta, reused=False):
+    """Counters describing how an incremental analysis was produced"""
+    return {
+        'baseline': 'full' if delta['full'] else 'reused' if reused else 'delta',
+        'changed_machines': len(delta['changed']),
+        'removed_machines': len(delta['removed']),
+        'unchanged_machines': len(delta['unchanged'])
+    }
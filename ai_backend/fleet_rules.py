@@ -0,0 +1,178 @@
+"""
+Fleet Rules - Vectorized threshold analysis for large machine fleets
+Evaluates every temperature, vibration, pressure and status rule for the
+whole fleet in a handful of NumPy array operations
+"""
+
+import numpy as np
+
+# Threshold rules (same limits as LocalAIAgent's original per-machine loop)
+TEMPERATURE_CRITICAL = 90
+TEMPERATURE_WARNING = 80
+VIBRATION_CRITICAL = 40
+VIBRATION_WARNING = 30
+PRESSURE_CRITICAL = 10
+PRESSURE_WARNING = 8.5
+
+STATUS_CODES = {'normal': 0, 'warning': 1, 'critical': 2, 'offline': 3}
+UNKNOWN_STATUS = -1
+
+# Message parts per rule column (temperature, vibration, pressure, status):
+# "<name><prefix><value><suffix>"
+CRITICAL_PREFIXES = np.array([
+    ": Critical temperature (",
+    ": Excessive vibration (",
+    ": Over-pressure (",
+    ": System reports critical status"
+], dtype=object)
+WARNING_PREFIXES = np.array([
+    ": High temperature (",
+    ": Elevated vibration (",
+    ": High pressure (",
+    ": System reports warning status"
+], dtype=object)
+SUFFIXES = np.array(["°C)", " mm/s)", " bar)", ""], dtype=object)
+
+CRITICAL_RECOMMENDATIONS = [
+    "Immediate shutdown of critical machines recommended",
+    "Perform emergency maintenance on flagged equipment",
+    "Check cooling systems and fluid levels"
+]
+WARNING_RECOMMENDATIONS = [
+    "Schedule preventive maintenance within 24-48 hours",
+    "Monitor trending parameters closely",
+    "Verify sensor calibration"
+]
+
+
+def _column(values):
+    """Build a numeric column, keeping integer dtype when every value is an int.
+
+    Returns ``(column, display)``; ``display`` holds the original values when
+    ints and floats were mixed, so an int reading is still reported as ``95``
+    rather than ``95.0``, and is None otherwise.
+    """
+    column = np.asarray(values)
+    if column.dtype.kind not in 'iuf':
+        column = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    display = None
+    if column.dtype.kind == 'f' and not isinstance(values, np.ndarray) and any(type(v) is int for v in values):
+        display = np.array(values, dtype=object)
+    return column, display
+
+
+class FleetSnapshot:
+    """Struct-of-arrays view of a fleet: one array per metric, one row per machine"""
+
+    def __init__(self, names, temperature, vibration, pressure, status):
+        self.names = np.asarray(names, dtype=object)
+        self.temperature, temperature_display = _column(temperature)
+        self.vibration, vibration_display = _column(vibration)
+        self.pressure, pressure_display = _column(pressure)
+        self.displays = (temperature_display, vibration_display, pressure_display)
+        # Status may be given as codes already or as strings
+        status = np.asarray(status)
+        if status.dtype.kind in 'iu':
+            self.status = status.astype(np.int8)
+        else:
+            self.status = np.array([STATUS_CODES.get(s, UNKNOWN_STATUS) for s in status], dtype=np.int8)
+
+        lengths = {len(self.names), len(self.temperature), len(self.vibration), len(self.pressure), len(self.status)}
+        if len(lengths) != 1:
+            raise ValueError("All fleet snapshot columns must have the same length")
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_records(cls, machines):
+        """Build a snapshot from machine dicts (flat, or with a nested 'telemetry' dict)"""
+        names, temperature, vibration, pressure, status = [], [], [], [], []
+        for machine in machines:
+            telemetry = machine.get('telemetry', machine)
+            names.append(machine.get('name', machine.get('id')))
+            temperature.append(telemetry.get('temperature'))
+            vibration.append(telemetry.get('vibration'))
+            pressure.append(telemetry.get('pressure'))
+            status.append(machine.get('status'))
+        return cls(names, temperature, vibration, pressure, status)
+
+
+def _rule_matrices(snapshot):
+    """Boolean (machines x rules) matrices for the critical and warning rules"""
+    # NaN compares False, so missing readings never raise an alert
+    with np.errstate(invalid='ignore'):
+        critical = np.column_stack((
+            snapshot.temperature > TEMPERATURE_CRITICAL,
+            snapshot.vibration > VIBRATION_CRITICAL,
+            snapshot.pressure > PRESSURE_CRITICAL,
+            snapshot.status == STATUS_CODES['critical']
+        ))
+        warning = np.column_stack((
+            snapshot.temperature > TEMPERATURE_WARNING,
+            snapshot.vibration > VIBRATION_WARNING,
+            snapshot.pressure > PRESSURE_WARNING,
+            snapshot.status == STATUS_CODES['warning']
+        ))
+    # A metric past its critical limit is reported once, as critical
+    warning[:, :3] &= ~critical[:, :3]
+    return critical, warning
+
+
+def _format_values(values):
+    """Format readings as strings, converting each distinct reading only once"""
+    if len(values) == 0:
+        return []
+    unique, inverse = np.unique(values, return_inverse=True)
+    formatted = np.array([str(v) for v in unique.tolist()], dtype=object)
+    return formatted[inverse]
+
+
+def _messages(snapshot, mask, prefixes):
+    """Format alert messages for flagged cells, ordered by machine then rule"""
+    rows, cols = np.nonzero(mask)
+    if len(rows) == 0:
+        return []
+
+    values = np.full(len(rows), "", dtype=object)
+    columns = (snapshot.temperature, snapshot.vibration, snapshot.pressure)
+    for rule, (column, display) in enumerate(zip(columns, snapshot.displays)):
+        selected = cols == rule
+        if display is not None:
+            # Mixed int/float input: 95 and 95.0 compare equal, so no dedupe here
+            values[selected] = [str(v) for v in display[rows[selected]].tolist()]
+        else:
+            values[selected] = _format_values(column[rows[selected]])
+
+    return [
+        f"{name}{prefix}{value}{suffix}"
+        for name, prefix, value, suffix in zip(
+            snapshot.names[rows].tolist(), prefixes[cols].tolist(), values.tolist(), SUFFIXES[cols].tolist()
+        )
+    ]
+
+
+def evaluate_fleet(snapshot):
+    """Analyze a fleet snapshot, returning the same structure as LocalAIAgent's analysis"""
+    critical, warning = _rule_matrices(snapshot)
+
+    analysis = {
+        "overall_health": "Good",
+        "critical_issues": _messages(snapshot, critical, CRITICAL_PREFIXES),
+        "warnings": _messages(snapshot, warning, WARNING_PREFIXES),
+        "recommendations": []
+    }
+
+    if analysis["critical_issues"]:
+        analysis["recommendations"].extend(CRITICAL_RECOMMENDATIONS)
+    if analysis["warnings"]:
+        analysis["recommendations"].extend(WARNING_RECOMMENDATIONS)
+
+    if analysis["critical_issues"]:
+        analysis["overall_health"] = "Critical"
+    elif len(analysis["warnings"]) > 2:
+        analysis["overall_health"] = "Poor"
+    elif analysis["warnings"]:
+        analysis["overall_health"] = "Fair"
+
+    return analysis
@@ -4,39 +4,66 @@ from groq import Groq
 import json
 import random
 import re
+import metrics
+from offline_intents import MAINTENANCE_TOPICS, maintenance_intents
+from knowledge_index import search_knowledge, format_passages
+from provider_health import ProviderHealthMonitor, is_rate_limit_error
+from telemetry_encoder import encode_telemetry
+from single_flight import SingleFlight
+from rate_limiter import ProviderRateLimiter, RateLimitWait, limited_completion
+from response_cache import make_cache_key
 
 app = Flask(__name__)
 CORS(app)
+metrics.instrument_flask(app)  # Request timing and the /metrics scrape endpoint
 
 # Initialize Groq client
 groq_client = Groq(api_key="PLACE_API_KEY_HERE<")
 
-# Global state for API availability
-api_available = True
-rate_limit_info = None
+# API availability is tracked in the background; handlers only read it
+health_monitor = ProviderHealthMonitor()
+
+# Identical concurrent completions share one upstream call
+single_flight = SingleFlight()
+
+# Client-side request and token budget, synced from rate-limit headers and 429s
+rate_limiter = ProviderRateLimiter(
+    'groq', requests_per_minute=30, tokens_per_minute=8000, requests_per_day=1000, max_wait=30.0,
+    header_buckets={'requests': 'requests_per_day', 'tokens': 'tokens'}  # Groq reports RPD and TPM
+)
 
 def test_api_availability():
-    """Test if Groq API is available"""
-    global api_available, rate_limit_info
+    """Probe Groq API with a minimal completion (run by the health monitor, raises on failure)"""
+    groq_client.chat.completions.create(
+        model="openai/gpt-oss-120b",
+        messages=[{"role": "user", "content": "test"}],
+        max_completion_tokens=5,
+        temperature=0.1
+    )
+    return True
+
+def create_completion(**kwargs):
+    """Call Groq and report the outcome to the health monitor.
+
+    Identical concurrent requests share one upstream completion.
+    """
+    params = {k: v for k, v in kwargs.items() if k not in ('model', 'messages')}
+    key = make_cache_key(kwargs.get('messages'), kwargs.get('model'), 'groq', **params)
+    return single_flight.do(key, lambda: _create_completion(**kwargs))
+
+def _create_completion(**kwargs):
+    """Single upstream call"""
     try:
-        completion = groq_client.chat.completions.create(
-            model="openai/gpt-oss-120b",
-            messages=[{"role": "user", "content": "test"}],
-            max_completion_tokens=5,
-            temperature=0.1
-        )
-        api_available = True
-        rate_limit_info = None
-        return True
+        completion = limited_completion(rate_limiter, groq_client.chat.completions.with_raw_response.create, **kwargs)
+    except RateLimitWait:
+        health_monitor.release('groq')  # Our own budget, not a provider failure
+        raise
     except Exception as e:
-        error_str = str(e)
-        if "rate_limit_exceeded" in error_str or "429" in error_str:
-            api_available = False
-            # Extract rate limit info
-            rate_limit_info = extract_rate_limit_info(error_str)
-            return False
-        api_available = False
-        return False
+        health_monitor.mark_failure('groq', e)
+        raise
+
+    health_monitor.mark_success('groq')
+    return completion
 
 def extract_rate_limit_info(error_str):
     """Extract rate limit information from error message"""
@@ -59,6 +86,9 @@ def extract_rate_limit_info(error_str):
     
     return info
 
+health_monitor.register('groq', test_api_availability, interval=60.0, retry_interval=15.0,
+                        rate_limit_parser=extract_rate_limit_info)
+
 def generate_offline_response(query, context_type="general"):
     """Generate offline responses when API is unavailable"""
     
@@ -101,20 +131,15 @@ def generate_offline_response(query, context_type="general"):
 *Note: This is offline analysis. For detailed AI insights, please wait for API quota reset or upgrade your plan.*
 """
     
-    # General query responses
-    topics = {
-        "predictive maintenance": "Predictive maintenance uses sensors and data analytics to predict equipment failures before they occur, reducing downtime by up to 50%.",
-        "vibration analysis": "Vibration analysis detects mechanical problems like misalignment, imbalance, and bearing wear through frequency domain analysis.",
-        "temperature monitoring": "Temperature monitoring helps identify overheating conditions that can lead to equipment failure and safety hazards.",
-        "pressure": "Pressure monitoring is critical for hydraulic and pneumatic systems to prevent over-pressure conditions and seal failures.",
-        "safety": "Industrial safety requires following LOTO procedures, using proper PPE, and adhering to OSHA regulations.",
-        "maintenance": "Preventive maintenance scheduling based on manufacturer recommendations and operating conditions extends equipment life."
-    }
+    # Passages from the local knowledge base when one is built
+    hits = search_knowledge(query)
+    if hits:
+        return f"🔄 **OFFLINE MODE** - from the maintenance knowledge base:\n\n{format_passages(hits)}\n\n*For detailed AI analysis, please wait for API quota reset.*"
     
-    query_lower = query.lower()
-    for topic, response in topics.items():
-        if topic in query_lower:
-            return f"🔄 **OFFLINE MODE**: {response}\n\n*For detailed AI analysis, please wait for API quota reset.*"
+    # General query responses
+    topic = maintenance_intents.match(query)
+    if topic:
+        return f"🔄 **OFFLINE MODE**: {MAINTENANCE_TOPICS[topic]}\n\n*For detailed AI analysis, please wait for API quota reset.*"
     
     return f"""🔄 **OFFLINE MODE ACTIVE**
 
@@ -158,21 +183,22 @@ def handle_query():
         if not query:
             return jsonify({'success': False, 'error': 'Query required'}), 400
         
-        # Test API availability first
-        if not test_api_availability():
+        # Fail fast to the offline response while the provider's circuit is open
+        if not health_monitor.allow_request('groq'):
             # Return offline response
+            metrics.count_fallback('unavailable')
             offline_response = generate_offline_response(query)
             return jsonify({
                 'success': True,
                 'response': offline_response,
                 'model_used': 'offline-mode',
                 'provider': 'Local Fallback',
-                'rate_limit_info': rate_limit_info,
+                'rate_limit_info': health_monitor.get_rate_limit_info('groq'),
                 'offline_mode': True
             })
         
         # Query Groq with industrial engineering system prompt
-        completion = groq_client.chat.completions.create(
+        completion = create_completion(
             model="openai/gpt-oss-120b",
             messages=[
                 {
@@ -226,9 +252,10 @@ Provide technical, actionable guidance that maintenance technicians can follow s
     except Exception as e:
         error_str = str(e)
         
-        # Handle rate limits specifically
-        if "rate_limit_exceeded" in error_str or "429" in error_str:
+        # Handle rate limits specifically (provider 429s and our own RateLimitWait)
+        if is_rate_limit_error(error_str):
             rate_info = extract_rate_limit_info(error_str)
+            metrics.count_fallback('rate_limit')
             offline_response = generate_offline_response(query)
             
             return jsonify({
@@ -257,9 +284,10 @@ def analyze_telemetry():
         if not machine_data:
             return jsonify({'success': False, 'error': 'Machine data required'}), 400
         
-        # Test API availability first
-        if not test_api_availability():
+        # Fail fast to the offline response while the provider's circuit is open
+        if not health_monitor.allow_request('groq'):
             # Return offline analysis
+            metrics.count_fallback('unavailable')
             offline_analysis = generate_offline_response("", "maintenance_analysis")
             return jsonify({
                 'success': True,
@@ -270,7 +298,7 @@ def analyze_telemetry():
                 },
                 'model_used': 'offline-mode',
                 'provider': 'Local Fallback',
-                'rate_limit_info': rate_limit_info,
+                'rate_limit_info': health_monitor.get_rate_limit_info('groq'),
                 'offline_mode': True
             })
         
@@ -278,7 +306,7 @@ def analyze_telemetry():
         analysis_prompt = f"""MAINTENANCE ANALYSIS REQUEST
 
 Machine Telemetry Data:
-{str(machine_data)[:2000]}  # Limit data size
+{encode_telemetry(machine_data)['text']}
 
 As an Industrial Maintenance Engineer, provide:
 
@@ -311,7 +339,7 @@ As an Industrial Maintenance Engineer, provide:
 
 Provide actionable insights for the maintenance department."""
 
-        completion = groq_client.chat.completions.create(
+        completion = create_completion(
             model="openai/gpt-oss-120b",
             messages=[
                 {
@@ -341,9 +369,10 @@ Provide actionable insights for the maintenance department."""
     except Exception as e:
         error_str = str(e)
         
-        # Handle rate limits
-        if "rate_limit_exceeded" in error_str or "429" in error_str:
+        # Handle rate limits (provider 429s and our own RateLimitWait)
+        if is_rate_limit_error(error_str):
             rate_info = extract_rate_limit_info(error_str)
+            metrics.count_fallback('rate_limit')
             offline_analysis = generate_offline_response("", "maintenance_analysis")
             
             return jsonify({
@@ -364,8 +393,8 @@ Provide actionable insights for the maintenance department."""
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check - backend is always healthy, API availability is separate"""
-    # Test API availability
-    api_working = test_api_availability()
+    # Read the background monitor's last known state
+    api_working = health_monitor.is_available('groq')
     
     return jsonify({
         'status': 'healthy',
@@ -373,14 +402,16 @@ def health_check():
         'api_working': api_working,  # Separate field for API status
         'model_name': 'openai/gpt-oss-120b',
         'provider': 'Groq Cloud',
-        'rate_limit_info': rate_limit_info if not api_working else None,
-        'offline_mode': not api_working
+        'rate_limit_info': health_monitor.get_rate_limit_info('groq') if not api_working else None,
+        'offline_mode': not api_working,
+        'single_flight': single_flight.stats(),
+        'rate_limiter': rate_limiter.stats()
     })
 
 @app.route('/api/model-status', methods=['GET'])
 def model_status():
     """Model status - backend is available, API status is separate"""
-    api_working = test_api_availability()
+    api_working = health_monitor.is_available('groq')
     
     return jsonify({
         'success': True,
@@ -388,26 +419,27 @@ def model_status():
         'api_working': api_working,  # Separate field for API status
         'current_model': 'openai/gpt-oss-120b' if api_working else 'offline-mode',
         'provider': 'Groq Cloud' if api_working else 'Local Fallback',
-        'rate_limit_info': rate_limit_info if not api_working else None,
+        'rate_limit_info': health_monitor.get_rate_limit_info('groq') if not api_working else None,
         'offline_mode': not api_working
     })
 
 @app.route('/api/retry-connection', methods=['POST'])
 def retry_connection():
-    """Endpoint to retry API connection"""
-    api_working = test_api_availability()
+    """Endpoint to retry API connection - forces an immediate probe"""
+    api_working = health_monitor.probe_now('groq')
     
     return jsonify({
         'success': True,
         'api_available': api_working,
         'message': 'API connection restored' if api_working else 'API still unavailable',
-        'rate_limit_info': rate_limit_info if not api_working else None
+        'rate_limit_info': health_monitor.get_rate_limit_info('groq') if not api_working else None
     })
 
 if __name__ == '__main__':
     print("🚀 Groq Flask Backend starting on http://localhost:5000")
     print("🔧 CORS enabled for frontend communication")
     print("📡 Health endpoint: http://localhost:5000/api/health")
+    health_monitor.start()
     try:
         app.run(host='127.0.0.1', port=5000, debug=True, use_reloader=False)
     except Exception as e:
@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Hybrid AI Backend - asyncio serving mode
+Serves the same routes as hybrid_backend.py from an ASGI server. LLM routes run
+natively on the event loop with pooled keep-alive async clients, so one process
+can hold hundreds of slow completions without tying up a thread per request.
+
+Run with:  uvicorn hybrid_asgi:app --host 127.0.0.1 --port 5000
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+import ollama
+from a2wsgi import WSGIMiddleware
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse as StarletteJSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import metrics
+from response_cache import cache_bypassed
+from single_flight import AsyncSingleFlight
+from rate_limiter import RateLimitWait, limited_completion_async
+from provider_health import is_rate_limit_error
+
+import hybrid_backend as hybrid
+from hybrid_backend import (
+    health_monitor, router, provider_slots, PROVIDERS, MODE_PROVIDERS, HEDGE_PROVIDERS, CLOUD_CLIENTS, GROQ_API_KEY, response_cache, query_cache_key, extract_rate_limit_info, build_ollama_messages, record_ollama_call,
+    chat_messages, analysis_fleet_id, prepare_analysis, complete_analysis, query_payload, query_fallback_payload,
+    sse_event, stream_meta, stream_error_events, stream_fallback_events,
+    batch_request_error, batch_parallelism, valid_batch_query, batch_item, batch_payload, BATCH_QUERY_REQUIRED,
+    QUERY_SYSTEM_PROMPT, ANALYSIS_SYSTEM_PROMPT, OLLAMA_OPTIONS, OLLAMA_UNAVAILABLE_ERROR,
+    analysis_jobs, run_analysis_job, async_requested, job_accepted_payload, job_queue_full_payload,
+    event_bus, events_subscription_args, events_stream_open, events_stream_messages, EVENTS_BUSY_ERROR, EVENTS_KEEPALIVE
+)
+from event_bus import TooManySubscribers
+from job_queue import QueueFull
+
+# Connection pool sizing - in-flight completions share a bounded set of sockets
+MAX_CONNECTIONS = 512
+MAX_KEEPALIVE_CONNECTIONS = 64
+KEEPALIVE_EXPIRY = 120.0  # seconds an idle connection stays open for reuse
+
+class JSONResponse(StarletteJSONResponse):
+    """JSONResponse that records its encoding as the request's ``serialize`` stage"""
+
+    def render(self, content):
+        with metrics.span('serialize'):
+            return super().render(content)
+
+def connection_limits():
+    """httpx pool limits shared by the async provider clients"""
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY
+    )
+
+# Shared async clients - created once per process, reused by every request
+openrouter_async_client = AsyncOpenAI(
+    api_key=hybrid.openrouter_client.api_key,
+    base_url=str(hybrid.openrouter_client.base_url),
+    timeout=120.0,  # 2 minutes timeout
+    http_client=DefaultAsyncHttpxClient(limits=connection_limits())
+)
+groq_async_client = AsyncOpenAI(
+    api_key=GROQ_API_KEY,
+    base_url=str(hybrid.groq_client.base_url),
+    timeout=120.0,
+    http_client=DefaultAsyncHttpxClient(limits=connection_limits())
+) if GROQ_API_KEY else None
+ollama_async_client = ollama.AsyncClient(timeout=600, limits=connection_limits())  # 10 minutes timeout
+
+# Async client per cloud provider, sharing the sync backend's rate limiters
+ASYNC_CLOUD_CLIENTS = {
+    name: (groq_async_client if name == 'groq' else openrouter_async_client, limiter)
+    for name, (_, limiter) in CLOUD_CLIENTS.items()
+}
+
+# Identical concurrent provider calls share one upstream completion
+single_flight = AsyncSingleFlight()
+
+async def query_ollama_async(prompt, system_prompt):
+    """Query local Ollama model without blocking the event loop"""
+    started = time.perf_counter()
+    try:
+        response = await ollama_async_client.chat(
+            model='gpt-oss:20b',
+            messages=build_ollama_messages(prompt, system_prompt),
+            options=OLLAMA_OPTIONS
+        )
+    except Exception as e:
+        print(f"Ollama query failed: {e}")
+        record_ollama_call(started, error=e)
+        health_monitor.mark_failure('ollama', e)
+        return None
+
+    record_ollama_call(started, response)
+    health_monitor.mark_success('ollama')
+    return response['message']['content']
+
+async def query_cloud_async(provider, messages, temperature, max_tokens):
+    """Query a cloud provider without blocking the event loop"""
+    client, limiter = ASYNC_CLOUD_CLIENTS[provider]
+    try:
+        completion = await limited_completion_async(
+            limiter,
+            client.chat.completions.with_raw_response.create,
+            model=PROVIDERS[provider]['model'],
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+    except RateLimitWait:
+        raise  # Our own budget, not a provider failure
+    except Exception as e:
+        health_monitor.mark_failure(provider, e)
+        raise
+
+    health_monitor.mark_success(provider)
+    return completion.choices[0].message.content
+
+async def stream_ollama_async(prompt, system_prompt):
+    """Yield Ollama response tokens as they are generated"""
+    started = time.perf_counter()
+    first = True
+    try:
+        async for chunk in await ollama_async_client.chat(
+            model='gpt-oss:20b',
+            messages=build_ollama_messages(prompt, system_prompt),
+            options=OLLAMA_OPTIONS,
+            stream=True
+        ):
+            if first:
+                record_ollama_call(started)
+                first = False
+            if chunk.get('done'):
+                metrics.record_tokens('ollama', 'gpt-oss:20b', chunk.get('prompt_eval_count'), chunk.get('eval_count'))
+            content = chunk['message']['content']
+            if content:
+                yield content
+    except Exception as e:
+        if first:
+            record_ollama_call(started, error=e)
+        health_monitor.mark_failure('ollama', e)
+        raise
+
+    health_monitor.mark_success('ollama')
+
+async def stream_cloud_async(provider, messages, temperature, max_tokens):
+    """Yield cloud provider response tokens as they arrive"""
+    client, limiter = ASYNC_CLOUD_CLIENTS[provider]
+    try:
+        completion = await limited_completion_async(
+            limiter,
+            client.chat.completions.with_raw_response.create,
+            model=PROVIDERS[provider]['model'],
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        async for chunk in completion:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except RateLimitWait:
+        raise
+    except Exception as e:
+        health_monitor.mark_failure(provider, e)
+        raise
+
+    health_monitor.mark_success(provider)
+
+async def ask_provider_async(provider, prompt, system_prompt, temperature, max_tokens):
+    """One completion from ``provider`` (Ollama returns None instead of raising), holding one of its slots"""
+    async with provider_slots.hold_async(provider):
+        if provider == 'ollama':
+            return await query_ollama_async(prompt, system_prompt)
+        return await query_cloud_async(provider, chat_messages(prompt, system_prompt), temperature, max_tokens)
+
+def stream_provider_async(provider, prompt, system_prompt, temperature, max_tokens):
+    """Async token stream from ``provider``"""
+    if provider == 'ollama':
+        return held_stream_async(provider, stream_ollama_async(prompt, system_prompt))
+    return held_stream_async(provider, stream_cloud_async(provider, chat_messages(prompt, system_prompt), temperature, max_tokens))
+
+async def held_stream_async(provider, tokens):
+    """held_stream() for async token streams; the slots are shared with the Flask side's threads"""
+    try:
+        async with provider_slots.hold_async(provider):
+            async for token in tokens:
+                yield token
+    finally:
+        await tokens.aclose()
+
+async def run_query_async(query, mode, bypass_cache=False):
+    """Answer one query in ``mode``; returns ``(payload, status_code, cache_status)`` like run_query"""
+    try:
+        with metrics.span('cache'):
+            cache_key = query_cache_key(query, mode)
+            cached = None if bypass_cache else response_cache.get(cache_key)
+        if cached is not None:
+            return cached, 200, 'HIT'
+
+        with metrics.span('probe'):
+            providers = router.order(MODE_PROVIDERS[mode])
+        if not providers:
+            if mode == 'offline':
+                return OLLAMA_UNAVAILABLE_ERROR, 500, None
+            return query_fallback_payload(query, mode, 'unavailable', health_monitor.get_rate_limit_info('openrouter')), 200, None
+
+        with metrics.span('provider'):
+            provider, response = await single_flight.do(cache_key, lambda: router.route_async(
+                providers,
+                lambda name: ask_provider_async(name, query, QUERY_SYSTEM_PROMPT, temperature=0.3, max_tokens=1024),
+                hedge_names=HEDGE_PROVIDERS[mode]
+            ))
+
+        if response:
+            metrics.note(provider, PROVIDERS[provider]['model'])
+            with metrics.span('postprocess'):
+                payload = query_payload(response, mode, provider)
+                response_cache.set(cache_key, payload)
+            return payload, 200, 'BYPASS' if bypass_cache else 'MISS'
+        return query_fallback_payload(query, mode, 'empty_response'), 200, None
+
+    except Exception as e:
+        error_str = str(e)
+
+        # Handle rate limits specifically for online mode
+        if mode != 'offline' and ("rate_limit" in error_str.lower() or "429" in error_str):
+            return query_fallback_payload(query, mode, 'rate_limit', extract_rate_limit_info(error_str)), 200, None
+
+        return {
+            'success': False,
+            'error': f"AI Service Error: {str(e)}",
+            'mode': mode
+        }, 500, None
+
+async def read_json(request):
+    """Request body as a dict, empty when it is missing or not JSON"""
+    try:
+        data = await request.json()
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+async def handle_query(request):
+    """Handle user queries with current mode (OpenRouter or Ollama)"""
+    with metrics.span('parse'):
+        data = await read_json(request)
+    query = data.get('query', '')
+
+    if not query:
+        return JSONResponse({'success': False, 'error': 'Query required'}, status_code=400)
+
+    payload, status, cache_status = await run_query_async(query, hybrid.current_mode, cache_bypassed(request.headers))
+    headers = {'X-Cache': cache_status} if cache_status else None
+    return JSONResponse(payload, status_code=status, headers=headers)
+
+async def handle_query_batch(request):
+    """Answer a list of queries concurrently, returning results in request order"""
+    data = await read_json(request)
+    error = batch_request_error(data)
+    if error:
+        return JSONResponse({'success': False, 'error': error}, status_code=400)
+
+    mode = hybrid.current_mode
+    bypass_cache = cache_bypassed(request.headers)
+    parallelism = batch_parallelism(data)
+    slots = asyncio.Semaphore(parallelism)
+
+    async def run_item(query):
+        async with slots:
+            started = time.perf_counter()
+            if not valid_batch_query(query):
+                return batch_item(query, BATCH_QUERY_REQUIRED, 400, None, started)
+            return batch_item(query, *await run_query_async(query, mode, bypass_cache), started)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run_item(query) for query in data['queries']))
+    return JSONResponse(batch_payload(results, mode, parallelism, started))
+
+async def handle_query_stream(request):
+    """Stream query responses token by token as Server-Sent Events"""
+    with metrics.span('parse'):
+        data = await read_json(request) if request.method == 'POST' else {}
+        query = data.get('query') or request.query_params.get('query', '')
+
+    if not query:
+        return JSONResponse({'success': False, 'error': 'Query required'}, status_code=400)
+
+    mode = hybrid.current_mode
+    flight_key = query_cache_key(query, mode)
+    req = metrics.current()
+
+    async def generate():
+        providers = router.order(MODE_PROVIDERS[mode])
+        tokens = single_flight.stream(flight_key, lambda: router.stream_async(
+            providers,
+            lambda name: stream_provider_async(name, query, QUERY_SYSTEM_PROMPT, temperature=0.3, max_tokens=1024),
+            hedge_names=HEDGE_PROVIDERS[mode]
+        )) if providers else None
+
+        sent_tokens = 0
+        fallback_reason = 'unavailable' if tokens is None else 'empty_response'
+        if tokens is not None:
+            try:
+                async for provider, content in tokens:
+                    if sent_tokens == 0:
+                        if req:
+                            req.note(provider, PROVIDERS[provider]['model'])
+                            req.first_token()
+                        yield sse_event('meta', stream_meta(mode, provider))
+                    sent_tokens += 1
+                    yield sse_event('token', {'content': content})
+            except Exception as e:
+                print(f"Streaming query failed: {e}")
+                if sent_tokens:
+                    for event in stream_error_events(e, sent_tokens):
+                        yield event
+                    return
+                fallback_reason = 'rate_limit' if is_rate_limit_error(str(e)) else 'error'
+
+        if sent_tokens == 0:
+            for event in stream_fallback_events(query, mode, fallback_reason):
+                yield event
+        else:
+            yield sse_event('done', {'tokens': sent_tokens, 'complete': True})
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+async def run_analysis_async(data, mode, bypass_cache=False, fleet_id=None):
+    """run_analysis with the provider call awaited on the event loop; same result tuple"""
+    try:
+        result, plan = prepare_analysis(data, mode, bypass_cache, fleet_id)
+        if result is not None:
+            return result
+
+        provider, analysis = None, None
+        if plan['providers']:
+            with metrics.span('provider'):
+                provider, analysis = await single_flight.do(plan['flight_key'], lambda: router.route_async(
+                    plan['providers'],
+                    lambda name: ask_provider_async(name, plan['prompts'][name], ANALYSIS_SYSTEM_PROMPT, temperature=0.2, max_tokens=1200),
+                    hedge_names=HEDGE_PROVIDERS[mode]
+                ))
+        return complete_analysis(plan, provider, analysis)
+
+    except Exception as e:
+        return {'success': False, 'error': str(e)}, 500, None
+
+async def analyze_telemetry(request):
+    """Analyze machine telemetry data for maintenance insights (``?async=1`` queues a job, see hybrid_backend)"""
+    with metrics.span('parse'):
+        data = await read_json(request)
+    if not data.get('machines'):
+        return JSONResponse({'success': False, 'error': 'Machine data required'}, status_code=400)
+
+    mode = hybrid.current_mode
+    bypass_cache = cache_bypassed(request.headers)
+    fleet_id = analysis_fleet_id(data, request.client.host if request.client else None)
+    if async_requested(request.query_params):
+        # Jobs run on the shared worker threads; /api/jobs/<id> is served by the Flask mount
+        try:
+            job = analysis_jobs.submit(run_analysis_job, data, mode, bypass_cache, fleet_id, kind='analysis')
+        except QueueFull as e:
+            return JSONResponse(job_queue_full_payload(e), status_code=503, headers={'Retry-After': str(hybrid.JOB_RETRY_AFTER)})
+        return JSONResponse(job_accepted_payload(job), status_code=202, headers={'Location': f"/api/jobs/{job['job_id']}"})
+
+    payload, status, cache_status = await run_analysis_async(data, mode, bypass_cache, fleet_id)
+    headers = {'X-Cache': cache_status} if cache_status else None
+    return JSONResponse(payload, status_code=status, headers=headers)
+
+async def event_stream(request):
+    """Push channel for dashboards (see hybrid_backend.event_stream); idle streams hold no thread"""
+    last_event_id, events = events_subscription_args(request.headers, request.query_params)
+    try:
+        subscription = event_bus.subscribe(last_event_id, events, loop=asyncio.get_running_loop())
+    except TooManySubscribers:
+        return JSONResponse(EVENTS_BUSY_ERROR, status_code=503)
+
+    async def generate():
+        try:
+            yield events_stream_open()
+            while True:
+                items = await subscription.next_async(EVENTS_KEEPALIVE)
+                yield events_stream_messages(items) if items else ": keepalive\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+async def cache_stats(request):
+    """Response cache counters and occupancy, plus calls saved by request coalescing"""
+    return JSONResponse({'success': True, 'cache': response_cache.stats(), 'single_flight': single_flight.stats()})
+
+@asynccontextmanager
+async def lifespan(app):
+    """Start the health monitor and warm the response cache; close connections on shutdown"""
+    health_monitor.start()
+    hybrid.open_response_store()
+    yield
+    health_monitor.stop()
+    await openrouter_async_client.close()
+    if groq_async_client:
+        await groq_async_client.close()
+    await ollama_async_client._client.aclose()  # AsyncClient wraps an httpx.AsyncClient
+    if response_cache.store is not None:
+        response_cache.store.close()
+        response_cache.store = None
+
+def terminated_input(wsgi_app):
+    """Mark a2wsgi's ``wsgi.input`` as ending with the body, so Flask reads chunked uploads (e.g. /api/telemetry)
+
+    Without Content-Length, Werkzeug otherwise treats the body as empty.
+    """
+    def app(environ, start_response):
+        environ['wsgi.input_terminated'] = True
+        return wsgi_app(environ, start_response)
+    return app
+
+routes = [
+    Route('/api/query', metrics.instrument_asgi(handle_query, '/api/query'), methods=['POST']),
+    Route('/api/query/batch', metrics.instrument_asgi(handle_query_batch, '/api/query/batch'), methods=['POST']),
+    Route('/api/query/stream', metrics.instrument_asgi(handle_query_stream, '/api/query/stream'), methods=['GET', 'POST']),
+    Route('/api/analyze', metrics.instrument_asgi(analyze_telemetry, '/api/analyze'), methods=['POST']),
+    Route('/api/events', event_stream, methods=['GET']),
+    Route('/api/cache-stats', cache_stats, methods=['GET']),
+    # Routes that never wait on an LLM are served by the Flask app unchanged (including /metrics)
+    Mount('/', app=WSGIMiddleware(terminated_input(hybrid.app)))
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'], expose_headers=['X-Cache', 'Server-Timing', 'Location', 'Retry-After'])],
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("🚀 Hybrid AI Backend (async) starting on http://localhost:5000")
+    print("🔧 CORS enabled for frontend communication")
+    print("🌐 Online Mode: OpenRouter API with gpt-oss-120b")
+    print("💻 Offline Mode: Ollama Local with gpt-oss:20b")
+    print(f"🧭 Auto Mode: fastest expected of {', '.join(MODE_PROVIDERS['auto'])}")
+    print(f"🔌 Connection pool: {MAX_CONNECTIONS} connections, {MAX_KEEPALIVE_CONNECTIONS} kept alive")
+    uvicorn.run(app, host='127.0.0.1', port=5000)
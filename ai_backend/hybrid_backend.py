@@ -1,47 +1,209 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from openai import OpenAI
 import ollama
 import json
+import os
 import random
 import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from provider_health import ProviderHealthMonitor, is_rate_limit_error
+from response_store import ResponseStore
+from response_cache import ResponseCache, make_cache_key, normalize_prompt, normalize_payload, cache_bypassed
+from lstm_memory_agent import LSTMMemoryAgent, METRICS
+from telemetry_encoder import CHARS_PER_TOKEN, encode_telemetry, estimate_tokens
+from telemetry_ingest import BodyTooLarge, UnsupportedBody, body_format, ingest, read_chunks
+from telemetry_store import TelemetryStore
+from downsample import downsample_points
+from single_flight import SingleFlight
+from rate_limiter import ProviderRateLimiter, RateLimitWait, limited_completion
+from provider_router import ProviderRouter, HedgeBudget
+from provider_slots import ProviderSlots
+from offline_intents import MAINTENANCE_TOPICS, maintenance_intents
+from knowledge_index import search_knowledge, format_passages
+from event_bus import EventBus, TooManySubscribers
+from job_queue import JobQueue, QueueFull, FAILED, CANCELLED
+from fleet_delta import AlertTracker, FleetDeltaTracker, delta_summary, format_readings, machine_id, machine_readings, summarize_machines
+from anomaly_detector import EWMADetector, format_anomalies
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Cache', 'Server-Timing', 'Location', 'Retry-After'])
+metrics.instrument_flask(app)  # Request timing and the /metrics scrape endpoint
+
+# Provider endpoints can be pointed elsewhere, e.g. at fake_llm_server.py for benchmarks
+# (Ollama reads OLLAMA_HOST itself)
+OPENROUTER_BASE_URL = os.environ.get('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
+GROQ_BASE_URL = os.environ.get('GROQ_BASE_URL', 'https://api.groq.com/openai/v1')
 
 # Initialize OpenRouter client with extended timeout
 openrouter_client = OpenAI(
     api_key="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",
-    base_url="https://openrouter.ai/api/v1",
+    base_url=OPENROUTER_BASE_URL,
     timeout=120.0  # 2 minutes timeout
 )
 
+# Groq is routed to alongside OpenRouter when a key is configured (OpenAI-compatible endpoint)
+GROQ_API_KEY = os.environ.get('GROQ_API_KEY', '')
+groq_client = OpenAI(
+    api_key=GROQ_API_KEY,
+    base_url=GROQ_BASE_URL,
+    timeout=120.0
+) if GROQ_API_KEY else None
+
+# Shared Ollama client - reuses its keep-alive connection across requests
+ollama_client = ollama.Client(timeout=600)  # 10 minutes timeout for large model processing
+
 # Global state
-current_mode = "online"  # "online" or "offline"
-api_available = True
-rate_limit_info = None
+current_mode = "online"  # "online", "offline" or "auto"
+
+# Provider availability is tracked in the background; handlers only read it
+health_monitor = ProviderHealthMonitor()
+
+# Mode changes, provider health transitions, alerts and finished analyses pushed to /api/events
+event_bus = EventBus(history=256, max_pending=256, max_subscribers=256)
+EVENTS_KEEPALIVE = 15.0  # Seconds between SSE comments that keep idle proxies from closing the stream
+EVENTS_RETRY_MS = 3000  # Browser reconnect delay sent to EventSource clients
+
+def publish_health_change(name, state):
+    """Push a provider availability transition to subscribers"""
+    event_bus.publish('provider_health', {
+        'provider': name,
+        'available': state['available'],
+        'circuit': state['circuit'],
+        'source': state['source'],
+        'changed_at': state['changed_at'],
+        'rate_limited': state['rate_limited'],
+        'rate_limit_info': state['rate_limit_info'],
+        'last_error': state['last_error']
+    })
+
+health_monitor.on_change(publish_health_change)
+
+# Client-side request budgets, synced from the providers' rate-limit headers and 429s
+openrouter_limiter = ProviderRateLimiter('openrouter', requests_per_minute=60, max_wait=30.0)
+groq_limiter = ProviderRateLimiter(
+    'groq', requests_per_minute=30, tokens_per_minute=8000, requests_per_day=1000, max_wait=30.0,
+    header_buckets={'requests': 'requests_per_day', 'tokens': 'tokens'}  # Groq reports RPD and TPM
+)
+
+# Model and display names per provider
+PROVIDERS = {
+    'openrouter': {'name': 'OpenRouter', 'label': 'OpenRouter', 'model': 'openai/gpt-oss-120b', 'local': False},
+    'groq': {'name': 'Groq', 'label': 'Groq Cloud', 'model': 'openai/gpt-oss-120b', 'local': False},
+    'ollama': {'name': 'Ollama', 'label': 'Ollama Local', 'model': 'gpt-oss:20b', 'local': True}
+}
+CLOUD_CLIENTS = {'openrouter': (openrouter_client, openrouter_limiter)}
+if groq_client:
+    CLOUD_CLIENTS['groq'] = (groq_client, groq_limiter)
+
+# Providers each mode may route to; "auto" picks whichever should answer soonest
+MODE_PROVIDERS = {
+    'online': list(CLOUD_CLIENTS),
+    'offline': ['ollama'],
+    'auto': list(CLOUD_CLIENTS) + ['ollama']
+}
+
+# Providers a slow request may also be hedged to without being failed over to:
+# online questions can race local Ollama, offline ones never leave the machine
+HEDGE_PROVIDERS = {
+    'online': ['ollama'],
+    'offline': [],
+    'auto': []
+}
+HEDGE_EXTRA_CALLS = 0.1  # Hedging may add at most 10% more provider calls (0 turns it off)
+
+def default_provider(mode):
+    """Provider named in payloads when no specific provider answered"""
+    return 'ollama' if mode == 'offline' else 'openrouter'
+
+# Completed responses are also kept on disk so a restart doesn't begin with a cold cache
+# (RESPONSE_STORE_PATH='' turns the store off)
+RESPONSE_STORE_PATH = os.environ.get(
+    'RESPONSE_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'response_store.sqlite3')
+)
+RESPONSE_STORE_WARMUP = int(os.environ.get('RESPONSE_STORE_WARMUP', '128'))  # Hottest entries preloaded at startup
+
+# Repeated dashboard questions and analyze payloads are answered from memory;
+# the store is attached at startup by open_response_store()
+response_cache = ResponseCache(max_entries=512, max_bytes=8 * 1024 * 1024, ttl_seconds=600.0)
+ANALYSIS_CACHE_TTL = 60.0  # Telemetry goes stale faster than general answers
+
+def open_response_store():
+    """Attach the on-disk store to response_cache and preload its hottest entries.
+
+    Called at server startup rather than import, so importing this module never
+    creates the file. If the file can't be opened (e.g. a read-only directory)
+    the cache stays memory-only. Returns the number of entries preloaded.
+    """
+    if not RESPONSE_STORE_PATH:
+        return 0
+    if response_cache.store is None:
+        try:
+            response_cache.store = ResponseStore(RESPONSE_STORE_PATH, max_bytes=64 * 1024 * 1024)
+        except sqlite3.Error as e:
+            print(f"⚠️ Response store unavailable at {RESPONSE_STORE_PATH}, caching in memory only: {e}")
+            return 0
+    return response_cache.warm_up(RESPONSE_STORE_WARMUP)
+
+# Identical concurrent provider calls share one upstream completion
+single_flight = SingleFlight()
+
+# Rolling per-machine telemetry history, fed by every /api/analyze request
+memory_agent = LSTMMemoryAgent()
+
+# Last analyzed snapshot per fleet for incremental /api/analyze requests
+fleet_tracker = FleetDeltaTracker(max_fleets=64)
+
+# Last severity per machine; changes are pushed to /api/events as alerts
+alert_tracker = AlertTracker(max_machines=4096)
+
+# Per machine and metric EWMA baselines, fed by /api/analyze and every /api/telemetry sample;
+# readings far outside a machine's own normal are flagged instead of using fixed limits
+anomaly_detector = EWMADetector(alpha=0.05, threshold=3.0, warmup=20, max_machines=100_000)
+MAX_REPORTED_ANOMALIES = 20  # Per analysis, prompt and ingest response
+
+# Samples pushed to /api/telemetry, newest TELEMETRY_STORE_SAMPLES kept in columnar form
+TELEMETRY_STORE_SAMPLES = int(os.environ.get('TELEMETRY_STORE_SAMPLES', '1000000'))
+TELEMETRY_MAX_BYTES = 64 * 1024 * 1024  # Largest accepted /api/telemetry body
+telemetry_store = TelemetryStore(capacity=TELEMETRY_STORE_SAMPLES, max_machines=100_000)
+
+# Downsampled /api/trends series, kept in memory only (they go stale as telemetry arrives)
+trend_cache = ResponseCache(max_entries=256, max_bytes=16 * 1024 * 1024, ttl_seconds=60.0)
+TREND_DEFAULT_RANGE = '1h'
+TREND_DEFAULT_WIDTH = 800
+TREND_MAX_WIDTH = 5000
+TREND_METRIC_ALIASES = {'rpm': 'motorSpeed'}  # TrendCharts' name for the motor speed series
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+# Background workers for /api/analyze?async=1 - slow Ollama analyses outlive proxy timeouts
+analysis_jobs = JobQueue(workers=2, max_queued=32, result_ttl=600.0, max_finished=256, name='analysis jobs')
+analysis_jobs.on_finish(lambda job: event_bus.publish('job', job))
+ANALYSIS_JOB_ROUTE = '/api/analyze (job)'  # Metrics route the queued analyses are timed under
+JOB_MAX_WAIT = 30.0  # Longest /api/jobs/<id>?wait= long-poll, in seconds
+JOB_RETRY_AFTER = 5  # Seconds a caller is asked to wait when the queue is full
 
 def test_openrouter_availability():
-    """Test if OpenRouter API is available"""
-    global api_available, rate_limit_info
-    try:
-        completion = openrouter_client.chat.completions.create(
-            model="openai/gpt-oss-120b",
-            messages=[{"role": "user", "content": "test"}],
-            max_tokens=5,
-            temperature=0.1
-        )
-        api_available = True
-        rate_limit_info = None
-        return True
-    except Exception as e:
-        error_str = str(e)
-        if "rate_limit" in error_str.lower() or "429" in error_str:
-            api_available = False
-            rate_limit_info = extract_rate_limit_info(error_str)
-            return False
-        api_available = False
-        return False
+    """Probe OpenRouter with a minimal completion (run by the health monitor, raises on failure)"""
+    openrouter_client.chat.completions.create(
+        model="openai/gpt-oss-120b",
+        messages=[{"role": "user", "content": "test"}],
+        max_tokens=5,
+        temperature=0.1
+    )
+    return True
+
+def test_groq_availability():
+    """Probe Groq with a minimal completion (run by the health monitor, raises on failure)"""
+    groq_client.chat.completions.create(
+        model="openai/gpt-oss-120b",
+        messages=[{"role": "user", "content": "test"}],
+        max_tokens=5,
+        temperature=0.1
+    )
+    return True
 
 def test_ollama_availability():
     """Test if Ollama is available with optimized settings"""
@@ -63,8 +225,43 @@ def test_ollama_availability():
         print(f"Ollama test failed: {e}")
         return False
 
+# Low-memory generation settings shared by blocking and streaming Ollama calls
+OLLAMA_OPTIONS = {
+    'temperature': 0.3,
+    'top_p': 0.9,
+    'num_predict': 256,      # Even smaller output for memory
+    'num_ctx': 1024,         # Much smaller context window (was 2048)
+    'low_vram': True,        # Enable low VRAM mode
+    'f16_kv': False,         # Use f32 for key-value cache (more memory efficient)
+    'use_mmap': True,        # Use memory mapping
+    'use_mlock': False,      # Don't lock memory pages
+    'numa': False            # Disable NUMA optimizations
+}
+
+OLLAMA_SYSTEM_CHARS = 1000
+# User prompt room in num_ctx once the system prompt and the reply are accounted for
+OLLAMA_PROMPT_TOKENS = OLLAMA_OPTIONS['num_ctx'] - OLLAMA_OPTIONS['num_predict'] - OLLAMA_SYSTEM_CHARS // CHARS_PER_TOKEN
+OLLAMA_PROMPT_CHARS = OLLAMA_PROMPT_TOKENS * CHARS_PER_TOKEN
+
+# Prompt token limits for providers with less room than our full prompts; analysis prompts are built to fit
+PROMPT_TOKEN_LIMITS = {'ollama': OLLAMA_PROMPT_TOKENS}
+
+def build_ollama_messages(prompt, system_prompt):
+    """Build the truncated chat messages sent to the local model"""
+    return [
+        {
+            'role': 'system',
+            'content': system_prompt[:OLLAMA_SYSTEM_CHARS]  # Truncate system prompt for memory
+        },
+        {
+            'role': 'user', 
+            'content': prompt[:OLLAMA_PROMPT_CHARS]  # Only free-text queries can be longer
+        }
+    ]
+
 def query_ollama(prompt, system_prompt):
     """Query local Ollama model with optimized settings"""
+    started = time.perf_counter()
     try:
         # Set environment variables for memory optimization BEFORE any Ollama operations
         import os
@@ -74,40 +271,128 @@ def query_ollama(prompt, system_prompt):
         os.environ['OLLAMA_LLM_LIBRARY'] = 'cpu'  # Force CPU mode
         os.environ['OLLAMA_LOW_VRAM'] = 'true'   # Enable low VRAM mode
         
-        # Use a smaller context and optimize for low memory with extended timeout
-        import ollama
-        # Set longer timeout for large model processing
-        client = ollama.Client(timeout=600)  # 10 minutes timeout
-        
-        response = client.chat(
+        # Use a smaller context and optimize for low memory
+        response = ollama_client.chat(
             model='gpt-oss:20b',
-            messages=[
-                {
-                    'role': 'system',
-                    'content': system_prompt[:1000]  # Truncate system prompt for memory
-                },
-                {
-                    'role': 'user', 
-                    'content': prompt[:500]  # Truncate user prompt for memory
-                }
-            ],
-            options={
-                'temperature': 0.3,
-                'top_p': 0.9,
-                'num_predict': 256,      # Even smaller output for memory
-                'num_ctx': 1024,         # Much smaller context window (was 2048)
-                'low_vram': True,        # Enable low VRAM mode
-                'f16_kv': False,         # Use f32 for key-value cache (more memory efficient)
-                'use_mmap': True,        # Use memory mapping
-                'use_mlock': False,      # Don't lock memory pages
-                'numa': False            # Disable NUMA optimizations
-            }
+            messages=build_ollama_messages(prompt, system_prompt),
+            options=OLLAMA_OPTIONS
         )
+        record_ollama_call(started, response)
+        health_monitor.mark_success('ollama')
         return response['message']['content']
     except Exception as e:
         print(f"Ollama query failed: {e}")
+        record_ollama_call(started, error=e)
+        health_monitor.mark_failure('ollama', e)
         return None
 
+def record_ollama_call(started, response=None, error=None):
+    """Upstream metrics for an Ollama call (token counts come with the final response)"""
+    response = response or {}
+    metrics.record_upstream(
+        'ollama', 'gpt-oss:20b', time.perf_counter() - started,
+        outcome='error' if error is not None else 'ok',
+        prompt_tokens=response.get('prompt_eval_count'),
+        completion_tokens=response.get('eval_count')
+    )
+
+def stream_ollama(prompt, system_prompt):
+    """Yield response tokens from the local Ollama model as they are generated"""
+    started = time.perf_counter()
+    first = True
+    try:
+        for chunk in ollama_client.chat(
+            model='gpt-oss:20b',
+            messages=build_ollama_messages(prompt, system_prompt),
+            options=OLLAMA_OPTIONS,
+            stream=True
+        ):
+            if first:
+                record_ollama_call(started)  # Time until the stream started
+                first = False
+            if chunk.get('done'):
+                metrics.record_tokens('ollama', 'gpt-oss:20b', chunk.get('prompt_eval_count'), chunk.get('eval_count'))
+            content = chunk['message']['content']
+            if content:
+                yield content
+    except Exception as e:
+        if first:
+            record_ollama_call(started, error=e)
+        health_monitor.mark_failure('ollama', e)
+        raise
+
+    health_monitor.mark_success('ollama')
+
+def query_cloud(provider, messages, temperature, max_tokens):
+    """Query a cloud provider within its request budget and report the outcome to the health monitor"""
+    client, limiter = CLOUD_CLIENTS[provider]
+    try:
+        completion = limited_completion(
+            limiter,
+            client.chat.completions.with_raw_response.create,
+            model=PROVIDERS[provider]['model'],
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+    except RateLimitWait:
+        raise  # Our own budget, not a provider failure
+    except Exception as e:
+        health_monitor.mark_failure(provider, e)
+        raise
+
+    health_monitor.mark_success(provider)
+    return completion.choices[0].message.content
+
+def stream_cloud(provider, messages, temperature, max_tokens):
+    """Yield response tokens from a cloud provider as they arrive"""
+    client, limiter = CLOUD_CLIENTS[provider]
+    try:
+        completion = limited_completion(
+            limiter,
+            client.chat.completions.with_raw_response.create,
+            model=PROVIDERS[provider]['model'],
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        for chunk in completion:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except RateLimitWait:
+        raise
+    except Exception as e:
+        health_monitor.mark_failure(provider, e)
+        raise
+
+    health_monitor.mark_success(provider)
+
+def chat_messages(prompt, system_prompt):
+    """System + user chat messages for a cloud provider"""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+def ask_provider(provider, prompt, system_prompt, temperature, max_tokens):
+    """One completion from ``provider`` (Ollama returns None instead of raising), holding one of its slots"""
+    with provider_slots.hold(provider):
+        if provider == 'ollama':
+            return query_ollama(prompt, system_prompt)
+        return query_cloud(provider, chat_messages(prompt, system_prompt), temperature, max_tokens)
+
+def stream_provider(provider, prompt, system_prompt, temperature, max_tokens):
+    """Token stream from ``provider``"""
+    if provider == 'ollama':
+        return held_stream(provider, stream_ollama(prompt, system_prompt))
+    return held_stream(provider, stream_cloud(provider, chat_messages(prompt, system_prompt), temperature, max_tokens))
+
+def held_stream(provider, tokens):
+    """Yield from ``tokens`` while holding one of the provider's slots, taken when the stream starts"""
+    with provider_slots.hold(provider):
+        yield from tokens
+
 def extract_rate_limit_info(error_str):
     """Extract rate limit information from error message"""
     info = {}
@@ -116,15 +401,106 @@ def extract_rate_limit_info(error_str):
         info['wait_time'] = wait_match.group(1)
     return info
 
-def generate_offline_response(query, context_type="general"):
-    """Generate basic offline responses when both APIs fail"""
+health_monitor.register('openrouter', test_openrouter_availability, interval=60.0, retry_interval=15.0,
+                        rate_limit_parser=extract_rate_limit_info)
+health_monitor.register('ollama', test_ollama_availability, interval=30.0, retry_interval=10.0)
+if groq_client:
+    health_monitor.register('groq', test_groq_availability, interval=60.0, retry_interval=15.0,
+                            rate_limit_parser=extract_rate_limit_info)
+
+# Concurrent calls per provider across every route, batch and hedge
+CLOUD_CONCURRENCY = int(os.environ.get('CLOUD_CONCURRENCY', '8'))
+PROVIDER_CONCURRENCY = {
+    'openrouter': CLOUD_CONCURRENCY,
+    'groq': CLOUD_CONCURRENCY,
+    'ollama': 1  # Local Ollama runs with OLLAMA_NUM_PARALLEL=1
+}
+provider_slots = ProviderSlots(PROVIDER_CONCURRENCY)
+
+# Sends each request to the provider expected to finish soonest, failing over to the others.
+# A request with no first token by the provider's p95 time-to-first-token is hedged.
+router = ProviderRouter(
+    health_monitor,
+    hedge_budget=HedgeBudget(ratio=HEDGE_EXTRA_CALLS, burst=3) if HEDGE_EXTRA_CALLS else None,
+    hedge_percentile=95
+)
+router.register('openrouter', expected_latency=8.0, concurrency=PROVIDER_CONCURRENCY['openrouter'], limiter=openrouter_limiter)
+if groq_client:
+    router.register('groq', expected_latency=3.0, concurrency=PROVIDER_CONCURRENCY['groq'], limiter=groq_limiter)
+router.register('ollama', expected_latency=30.0, concurrency=PROVIDER_CONCURRENCY['ollama'])
+
+# Industrial AI system prompt
+QUERY_SYSTEM_PROMPT = """You are an expert Industrial Maintenance Engineer AI Assistant specialized in:
+
+🔧 CORE EXPERTISE:
+- Predictive & Preventive Maintenance
+- Equipment Reliability & Asset Management  
+- Root Cause Analysis & Failure Investigation
+- Maintenance Planning & Scheduling
+- Industrial Safety Protocols & OSHA Compliance
+- Mechanical, Electrical, Hydraulic & Pneumatic Systems
+- Vibration Analysis, Thermography & NDT Inspection
+- Lubrication Management & Tribology
+- Spare Parts Management & Inventory Control
+
+⚠️ SAFETY PROTOCOLS:
+- Always prioritize LOTO (Lockout/Tagout) procedures
+- Emphasize PPE requirements for each task
+- Include confined space, hot work, and electrical safety considerations
+- Reference relevant safety standards (OSHA, NFPA, IEEE, etc.)
+
+📊 RESPONSE FORMAT:
+1. Immediate Safety Considerations
+2. Technical Analysis & Root Cause
+3. Step-by-Step Maintenance Procedures
+4. Required Tools & Parts
+5. Safety Precautions & PPE
+6. Quality Control & Testing
+7. Documentation & Reporting
+
+Provide technical, actionable guidance that maintenance technicians can follow safely and effectively."""
+
+def sse_event(event, payload, event_id=None):
+    """Format a Server-Sent Events message"""
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+def stream_meta(mode, provider=None):
+    """SSE ``meta`` payload for the provider streaming the answer"""
+    details = PROVIDERS[provider or default_provider(mode)]
+    return {'provider': details['label'], 'model_used': details['model'], 'mode': mode, 'offline_mode': details['local']}
+
+def stream_error_events(error, sent_tokens):
+    """SSE events closing a stream that failed part-way through"""
+    yield sse_event('error', {'error': f"AI Service Error: {str(error)}"})
+    yield sse_event('done', {'tokens': sent_tokens, 'complete': False})
+
+def stream_fallback_events(query, mode, reason):
+    """SSE events answering with the offline response when the provider could not stream"""
+    metrics.count_fallback(reason)
+    yield sse_event('meta', {
+        'provider': 'Local Fallback',
+        'model_used': 'basic-offline',
+        'mode': mode,
+        'offline_mode': True,
+        'rate_limit_info': health_monitor.get_rate_limit_info('openrouter') if mode != 'offline' else None
+    })
+    yield sse_event('token', {'content': generate_offline_response(query)})
+    yield sse_event('done', {'tokens': 1, 'complete': True})
+
+def generate_offline_response(query, context_type="general", anomalies=None):
+    """Generate basic offline responses when both APIs fail; ``anomalies`` lines head a maintenance analysis"""
     
     if context_type == "maintenance_analysis":
-        return """
+        flagged = f"""
+**Statistical Anomalies** (readings far from each machine's own recent baseline):
+{anomalies}
+""" if anomalies else ""
+        return f"""
 🔄 **OFFLINE MAINTENANCE ANALYSIS**
 
 ⚠️ **API UNAVAILABLE** - Providing basic analysis
-
+{flagged}
 **Immediate Actions:**
 • Check all machines with temperature > 85°C
 • Inspect equipment with vibration > 35 mm/s
@@ -140,11 +516,16 @@ def generate_offline_response(query, context_type="general"):
 *Note: This is basic offline analysis. Switch to Ollama mode for AI-powered insights.*
 """
     
+    # Passages from the local knowledge base when one is built, else the matching canned topic
+    hits = search_knowledge(query)
+    topic = None if hits else maintenance_intents.match(query)
+    guidance = format_passages(hits) if hits else MAINTENANCE_TOPICS[topic] if topic else ""
+    guidance = f"{guidance}\n\n" if guidance else ""
     return f"""🔄 **BASIC OFFLINE MODE**
 
 Current query: {query}
 
-For AI-powered responses, try:
+{guidance}For AI-powered responses, try:
 • Switch to Ollama mode (offline AI)
 • Check your OpenRouter connection
 • Ensure Ollama is running locally
@@ -152,18 +533,365 @@ For AI-powered responses, try:
 *Basic guidance available, but AI analysis requires either online or Ollama mode.*
 """
 
+ANALYSIS_TELEMETRY_TOKENS = 800  # Prompt budget for the telemetry table
+LIMITED_PROMPT_ANOMALIES = 5  # Anomaly lines kept when the prompt has a token limit
+
+def build_analysis_prompt(machine_data, anomalies=None, token_limit=None):
+    """Create maintenance analysis prompt.
+
+    With ``token_limit`` (see PROMPT_TOKEN_LIMITS) the short instructions are
+    used and the telemetry table gets whatever budget is left, so the whole
+    prompt fits and the table's omitted-machines line stays accurate.
+    """
+    instructions = ANALYSIS_INSTRUCTIONS if token_limit is None else SHORT_ANALYSIS_INSTRUCTIONS
+    flagged = anomaly_section(anomalies, None if token_limit is None else LIMITED_PROMPT_ANOMALIES)
+    prompt = """MAINTENANCE ANALYSIS REQUEST
+
+Machine Telemetry Data:
+{telemetry}
+{flagged}
+{instructions}"""
+    budget = ANALYSIS_TELEMETRY_TOKENS
+    if token_limit is not None:
+        budget = min(budget, token_limit - estimate_tokens(prompt.format(telemetry='', flagged=flagged, instructions=instructions)))
+    return prompt.format(telemetry=encode_telemetry(machine_data, budget)['text'], flagged=flagged, instructions=instructions)
+
+def anomaly_section(anomalies, max_lines=None):
+    """Prompt section listing detector flags (the first ``max_lines``), empty when there are none"""
+    if not anomalies:
+        return ""
+    lines = anomalies.split('\n')
+    if max_lines is not None and len(lines) > max_lines:
+        lines = lines[:max_lines] + [f"- and {len(lines) - max_lines} more"]
+    lines = '\n'.join(lines)
+    return f"""
+Statistical Anomalies (z-score against each machine's own EWMA baseline, |z| > {anomaly_detector.threshold:g}):
+{lines}
+"""
+
+def analysis_prompts(providers, build):
+    """Prompt per provider from ``build(token_limit)``, built once per distinct limit"""
+    built = {}
+    for name in providers:
+        limit = PROMPT_TOKEN_LIMITS.get(name)
+        if limit not in built:
+            built[limit] = build(limit)
+    return {name: built[PROMPT_TOKEN_LIMITS.get(name)] for name in providers}
+
+def fleet_anomalies(machine_data):
+    """Detector flags for the machines in ``machine_data``, largest |z| first"""
+    return anomaly_detector.anomalies([machine_id(machine) for machine in machine_data], limit=MAX_REPORTED_ANOMALIES)
+
+def anomaly_lines(anomalies, machine_data):
+    """format_anomalies with the machines' display names"""
+    names = {machine_id(machine): machine.get('name') or machine_id(machine) for machine in machine_data}
+    return format_anomalies(anomalies, names)
+
+PREVIOUS_ASSESSMENT_CHARS = 1500  # Longest excerpt of the previous assessment in incremental prompts
+
+def build_incremental_analysis_prompt(delta, anomalies=None, token_limit=None):
+    """Create a maintenance analysis prompt from only what changed since the last analysis.
+
+    The changes come first so they survive any truncation; the previous
+    assessment gets the room left under ``token_limit`` (at most
+    PREVIOUS_ASSESSMENT_CHARS), with changed machines cut short if even
+    they do not fit.
+    """
+    instructions = ANALYSIS_INSTRUCTIONS if token_limit is None else SHORT_ANALYSIS_INSTRUCTIONS
+    flagged = anomaly_section(anomalies, None if token_limit is None else LIMITED_PROMPT_ANOMALIES)
+    changes = [
+        f"- {change['machine'].get('name', change['machine'].get('id'))}: {'; '.join(change['reasons'])} | now {format_readings(machine_readings(change['machine']))}"
+        for change in delta['changed']
+    ]
+    removed = ', '.join(map(str, delta['removed'])) or "none"
+    prompt = """INCREMENTAL MAINTENANCE ANALYSIS REQUEST
+
+Machines Changed Since Previous Assessment ({changed}):
+{changes}
+
+Machines No Longer Reporting: {removed}
+Unchanged Machines ({unchanged}): {summary}
+{flagged}
+Previous Assessment:
+{previous}
+
+Update the previous assessment for the changes above, keeping advice for unchanged machines that still applies.
+
+{instructions}"""
+    fields = {
+        'changed': len(delta['changed']), 'removed': removed, 'unchanged': len(delta['unchanged']),
+        'summary': summarize_machines(delta['unchanged']), 'flagged': flagged, 'instructions': instructions
+    }
+
+    previous_chars = PREVIOUS_ASSESSMENT_CHARS
+    if token_limit is not None:
+        room = token_limit - estimate_tokens(prompt.format(changes='', previous='', **fields))
+        if estimate_tokens('\n'.join(changes)) > room:
+            # Keep the changes that fit, leaving room for the "and N more" line
+            kept, used = 0, len(f"- and {len(changes)} more")
+            while used + len(changes[kept]) + 1 <= room * CHARS_PER_TOKEN:
+                used += len(changes[kept]) + 1
+                kept += 1
+            changes = changes[:kept] + [f"- and {len(changes) - kept} more"]
+        room -= estimate_tokens('\n'.join(changes))
+        previous_chars = max(0, min(previous_chars, room * CHARS_PER_TOKEN))
+
+    previous = delta['previous']['analysis']['maintenance_insights']
+    return prompt.format(changes='\n'.join(changes) or "- none", previous=previous[:previous_chars], **fields)
+
+ANALYSIS_INSTRUCTIONS = """As an Industrial Maintenance Engineer, provide:
+
+🚨 IMMEDIATE ACTIONS:
+- Any critical safety concerns requiring immediate shutdown
+- Emergency procedures if equipment poses hazards
+
+🔍 TECHNICAL ANALYSIS:
+- Vibration analysis (bearing condition, alignment, balance)
+- Temperature analysis (overheating, thermal patterns)
+- Pressure analysis (leaks, blockages, pump performance)
+- Overall equipment effectiveness assessment
+
+📋 MAINTENANCE RECOMMENDATIONS:
+- Preventive maintenance schedule adjustments
+- Predictive maintenance strategies
+- Parts that may need replacement soon
+- Lubrication requirements
+
+⚠️ SAFETY PROTOCOLS:
+- Required PPE for maintenance tasks
+- LOTO procedures needed
+- Confined space or electrical safety considerations
+
+📊 PRIORITY MATRIX:
+- Critical (immediate action required)
+- High (schedule within 1 week)
+- Medium (schedule within 1 month)
+- Low (monitor during next scheduled maintenance)
+
+Provide actionable insights for the maintenance department."""
+
+# ANALYSIS_INSTRUCTIONS for providers with a small prompt limit
+SHORT_ANALYSIS_INSTRUCTIONS = """As an Industrial Maintenance Engineer, give: 🚨 immediate actions and shutdown needs; \
+🔍 vibration, temperature and pressure analysis; 📋 maintenance recommendations and parts; \
+⚠️ safety (PPE, LOTO); 📊 priority per machine (critical/high/medium/low)."""
+
+ANALYSIS_SYSTEM_PROMPT = "You are an expert Industrial Maintenance Engineer AI providing technical analysis and safety-focused recommendations."
+
+def sampling_params(mode, temperature, max_tokens):
+    """Sampling parameters that affect the provider's answer, used in cache keys"""
+    if mode == 'offline':
+        return OLLAMA_OPTIONS
+    return {'temperature': temperature, 'max_tokens': max_tokens}
+
+def query_cache_key(query, mode):
+    """Cache key for a user query in ``mode``"""
+    model = 'gpt-oss:20b' if mode == 'offline' else 'openai/gpt-oss-120b'
+    return make_cache_key(normalize_prompt(query), model, mode, **sampling_params(mode, 0.3, 1024))
+
+def analysis_cache_key(machine_data, mode, anomalies=()):
+    """Cache key for a telemetry analysis - floats are rounded so near-identical payloads match.
+
+    The flagged (machine, metric) pairs are part of the key, since they change the prompt.
+    """
+    model = 'gpt-oss:20b' if mode == 'offline' else 'openai/gpt-oss-120b'
+    flagged = sorted((anomaly['machine_id'], anomaly['metric']) for anomaly in anomalies)
+    return make_cache_key(normalize_payload(machine_data), model, mode, anomalies=flagged, **sampling_params(mode, 0.2, 1200))
+
+def analysis_flight_key(analysis_prompt, mode):
+    """Single-flight key for an analysis call - the exact prompt sent to the provider"""
+    model = 'gpt-oss:20b' if mode == 'offline' else 'openai/gpt-oss-120b'
+    return make_cache_key(analysis_prompt, model, mode, **sampling_params(mode, 0.2, 1200))
+
+def cached_json(payload, cache_status):
+    """JSON response tagged with its cache outcome (HIT, MISS or BYPASS)"""
+    response = jsonify(payload)
+    response.headers['X-Cache'] = cache_status
+    return response
+
+OLLAMA_UNAVAILABLE_ERROR = {
+    'success': False,
+    'error': 'Ollama not available. Please ensure Ollama is running and gpt-oss:20b model is installed.',
+    'mode': 'offline'
+}
+
+def query_payload(response, mode, provider=None):
+    """/api/query payload for a response from ``provider`` (default: the provider serving ``mode``)"""
+    details = PROVIDERS[provider or default_provider(mode)]
+    return {
+        'success': True,
+        'response': response,
+        'model_used': details['model'],
+        'provider': details['label'],
+        'mode': mode,
+        'offline_mode': details['local']
+    }
+
+def query_fallback_payload(query, mode, reason, rate_limit_info=None):
+    """/api/query payload when the provider for ``mode`` could not answer (``reason`` is counted in /metrics)"""
+    metrics.count_fallback(reason)
+    if mode == 'offline':
+        # In offline mode, if Ollama fails, provide a clear offline error message
+        offline_response = f"""🔄 **OLLAMA OFFLINE MODE - QUERY FAILED**
+
+❌ **Local AI Model Unavailable**
+
+The local Ollama model (gpt-oss:20b) encountered an error or is not responding properly.
+
+**Troubleshooting Steps:**
+1. Check if Ollama service is running: `ollama serve`
+2. Verify the model is installed: `ollama list`
+3. Try pulling the model: `ollama pull gpt-oss:20b`
+4. Restart Ollama service if needed
+
+**Your Query:** {query}
+
+*Note: This is offline mode - no external APIs are being used.*
+"""
+        return {
+            'success': True,
+            'response': offline_response,
+            'model_used': 'offline-fallback',
+            'provider': 'Local Fallback',
+            'mode': 'offline',
+            'offline_mode': True,
+            'error_info': 'Ollama query failed'
+        }
+    return {
+        'success': True,
+        'response': generate_offline_response(query),
+        'model_used': 'basic-offline',
+        'provider': 'Local Fallback',
+        'rate_limit_info': rate_limit_info,
+        'mode': mode,
+        'offline_mode': True
+    }
+
+# Concurrent queries per /api/query/batch request; each provider call also waits
+# for one of its provider's PROVIDER_CONCURRENCY slots
+BATCH_PARALLELISM = 8
+BATCH_MAX_QUERIES = 50
+BATCH_QUERY_REQUIRED = {'success': False, 'error': 'Query required'}
+
+def batch_request_error(data):
+    """Validation error for a batch request body, or None"""
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries:
+        return 'Queries list required'
+    if len(queries) > BATCH_MAX_QUERIES:
+        return f'At most {BATCH_MAX_QUERIES} queries per batch'
+    return None
+
+def valid_batch_query(query):
+    """A batch item must be a non-empty string"""
+    return isinstance(query, str) and query.strip() != ''
+
+def batch_parallelism(data):
+    """Requested parallelism, capped at BATCH_PARALLELISM"""
+    limit = BATCH_PARALLELISM
+    try:
+        requested = int(data.get('max_parallel', limit))
+    except (TypeError, ValueError):
+        requested = limit
+    return max(1, min(requested, limit))
+
+def batch_item(query, payload, status, cache_status, started):
+    """One /api/query/batch result: the /api/query payload plus timing"""
+    item = dict(payload)
+    item['query'] = query
+    item['status'] = status
+    item['cache'] = cache_status
+    item['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return item
+
+def batch_payload(results, mode, parallelism, started):
+    """/api/query/batch payload"""
+    return {
+        'success': True,
+        'mode': mode,
+        'results': results,
+        'count': len(results),
+        'failed': sum(1 for item in results if not item.get('success')),
+        'parallelism': parallelism,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+def analysis_payload(analysis, machines_analyzed, mode, provider=None, anomalies=None):
+    """/api/analyze payload; an empty ``analysis`` means the provider could not answer.
+
+    ``anomalies`` are the formatted detector flags shown in that offline fallback.
+    """
+    if not analysis:
+        payload = {
+            'success': True,
+            'analysis': {
+                'maintenance_insights': generate_offline_response("", "maintenance_analysis", anomalies),
+                'machines_analyzed': machines_analyzed,
+                'analysis_type': 'Basic Offline Analysis'
+            },
+            'model_used': 'basic-offline',
+            'provider': 'Local Fallback',
+            'mode': mode
+        }
+        if mode != 'offline':
+            payload['offline_mode'] = True
+        return payload
+    
+    details = PROVIDERS[provider or default_provider(mode)]
+    return {
+        'success': True,
+        'analysis': {
+            'maintenance_insights': analysis,
+            'machines_analyzed': machines_analyzed,
+            'analysis_type': f"{details['name']} AI Analysis"
+        },
+        'model_used': details['model'],
+        'provider': details['label'],
+        'mode': mode
+    }
+
+def analysis_fleet_id(data, remote_addr):
+    """Fleet key for incremental analysis: the request's fleet_id, else the caller's address"""
+    return str(data.get('fleet_id') or remote_addr or 'default')
+
+def delta_unchanged(delta):
+    """True when a fleet has a baseline and nothing in it changed materially"""
+    return not delta['full'] and not delta['changed'] and not delta['removed']
+
+def reused_analysis_payload(delta):
+    """The fleet's previous analysis, returned without calling the model"""
+    payload = dict(delta['previous'])
+    payload['incremental'] = delta_summary(delta, reused=True)
+    return payload
+
+def with_memory_analysis(payload, machine_data):
+    """Attach current memory insights, predictions and anomaly flags to an /api/analyze payload"""
+    payload = dict(payload)
+    with metrics.span('insights'):
+        payload['analysis'] = dict(
+            payload['analysis'],
+            memory_insights=memory_agent.get_memory_insights(),
+            predictive_analysis=memory_agent.get_maintenance_recommendations(machine_data),
+            anomalies=fleet_anomalies(machine_data)
+        )
+    return payload
+
+def set_mode(mode):
+    """Switch the serving mode and tell subscribers"""
+    global current_mode
+    previous, current_mode = current_mode, mode
+    if previous != mode:
+        event_bus.publish('mode', {'mode': mode, 'previous': previous, 'providers': router.order(MODE_PROVIDERS[mode])})
+
 @app.route('/api/toggle-mode', methods=['POST'])
 def toggle_mode():
     """Toggle between online (OpenRouter) and offline (Ollama) modes"""
-    global current_mode
-    
     data = request.json
-    new_mode = data.get('mode', 'online')  # 'online' or 'offline'
+    new_mode = data.get('mode', 'online')  # 'online', 'offline' or 'auto'
     
     if new_mode == 'offline':
-        # Test if Ollama is available
-        if test_ollama_availability():
-            current_mode = 'offline'
+        # Ollama is local and cheap to probe, so verify it before switching
+        if health_monitor.probe_now('ollama'):
+            set_mode('offline')
             return jsonify({
                 'success': True,
                 'mode': 'offline',
@@ -179,8 +907,8 @@ def toggle_mode():
             }), 400
     
     elif new_mode == 'online':
-        current_mode = 'online'
-        api_working = test_openrouter_availability()
+        set_mode('online')
+        api_working = health_monitor.is_available('openrouter')
         return jsonify({
             'success': True,
             'mode': 'online',
@@ -190,327 +918,677 @@ def toggle_mode():
             'message': 'Switched to online mode with OpenRouter'
         })
     
+    elif new_mode == 'auto':
+        set_mode('auto')
+        return jsonify({
+            'success': True,
+            'mode': 'auto',
+            'providers': router.order(MODE_PROVIDERS['auto']),
+            'message': 'Switched to auto mode - each request goes to the provider expected to answer soonest'
+        })
+    
     else:
-        return jsonify({'success': False, 'error': 'Invalid mode. Use "online" or "offline"'}), 400
+        return jsonify({'success': False, 'error': 'Invalid mode. Use "online", "offline" or "auto"'}), 400
+
+def run_query(query, mode, bypass_cache=False):
+    """Answer one query in ``mode``.
+
+    Returns ``(payload, status_code, cache_status)``; ``cache_status`` is
+    None when the answer is a fallback or error that was not cached.
+    """
+    try:
+        with metrics.span('cache'):
+            cache_key = query_cache_key(query, mode)
+            cached = None if bypass_cache else response_cache.get(cache_key)
+        if cached is not None:
+            return cached, 200, 'HIT'
+        
+        # Available providers for this mode, the one expected to answer soonest first
+        with metrics.span('probe'):
+            providers = router.order(MODE_PROVIDERS[mode])
+        if not providers:
+            if mode == 'offline':
+                return OLLAMA_UNAVAILABLE_ERROR, 500, None
+            return query_fallback_payload(query, mode, 'unavailable', health_monitor.get_rate_limit_info('openrouter')), 200, None
+        
+        with metrics.span('provider'):
+            provider, response = single_flight.do(cache_key, lambda: router.route(
+                providers,
+                lambda name: ask_provider(name, query, QUERY_SYSTEM_PROMPT, temperature=0.3, max_tokens=1024),
+                hedge_names=HEDGE_PROVIDERS[mode]
+            ))
+        
+        if response:
+            metrics.note(provider, PROVIDERS[provider]['model'])  # Also labels coalesced callers
+            with metrics.span('postprocess'):
+                payload = query_payload(response, mode, provider)
+                response_cache.set(cache_key, payload)
+            return payload, 200, 'BYPASS' if bypass_cache else 'MISS'
+        return query_fallback_payload(query, mode, 'empty_response'), 200, None
+    
+    except Exception as e:
+        error_str = str(e)
+        
+        # Handle rate limits specifically for online mode
+        if mode != 'offline' and ("rate_limit" in error_str.lower() or "429" in error_str):
+            return query_fallback_payload(query, mode, 'rate_limit', extract_rate_limit_info(error_str)), 200, None
+        
+        return {
+            'success': False, 
+            'error': f"AI Service Error: {str(e)}",
+            'mode': mode
+        }, 500, None
 
 @app.route('/api/query', methods=['POST'])
 def handle_query():
     """Handle user queries with current mode (OpenRouter or Ollama)"""
-    try:
-        data = request.json
-        query = data.get('query', '')
+    with metrics.span('parse'):
+        data = request.get_json(silent=True) or {}
+    query = data.get('query', '')
+    
+    if not query:
+        return jsonify({'success': False, 'error': 'Query required'}), 400
+    
+    payload, status, cache_status = run_query(query, current_mode, cache_bypassed(request.headers))
+    if cache_status:
+        return cached_json(payload, cache_status), status
+    return jsonify(payload), status
+
+@app.route('/api/query/batch', methods=['POST'])
+def handle_query_batch():
+    """Answer a list of queries concurrently, returning results in request order.
+
+    Body: ``{"queries": [...], "max_parallel": n}``; ``max_parallel`` is optional
+    and capped at BATCH_PARALLELISM; provider calls are further limited by
+    PROVIDER_CONCURRENCY, so an offline batch still runs one Ollama call at a time.
+    """
+    data = request.get_json(silent=True) or {}
+    error = batch_request_error(data)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    
+    mode = current_mode
+    bypass_cache = cache_bypassed(request.headers)
+    parallelism = batch_parallelism(data)
+    req = metrics.current()
+    
+    def run_item(query):
+        metrics.adopt(req)  # Attribute provider calls to the batch route
+        started = time.perf_counter()
+        if not valid_batch_query(query):
+            return batch_item(query, BATCH_QUERY_REQUIRED, 400, None, started)
+        return batch_item(query, *run_query(query, mode, bypass_cache), started)
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(parallelism, len(data['queries']))) as pool:
+        results = list(pool.map(run_item, data['queries']))
+    
+    return jsonify(batch_payload(results, mode, parallelism, started))
+
+@app.route('/api/query/stream', methods=['GET', 'POST'])
+def handle_query_stream():
+    """Stream query responses token by token as Server-Sent Events.
+
+    Events: ``meta`` (provider info), ``token`` (response text as it arrives),
+    ``done`` (end of response) and ``error``. GET with ``?query=`` is accepted
+    so the endpoint also works with the browser's EventSource.
+    """
+    with metrics.span('parse'):
+        data = request.get_json(silent=True) or {}
+        query = data.get('query') or request.args.get('query', '')
+    
+    if not query:
+        return jsonify({'success': False, 'error': 'Query required'}), 400
+    
+    mode = current_mode
+    flight_key = query_cache_key(query, mode)
+    req = metrics.current()
+    
+    def generate():
+        providers = router.order(MODE_PROVIDERS[mode])
+        tokens = single_flight.stream(flight_key, lambda: router.stream(
+            providers,
+            lambda name: stream_provider(name, query, QUERY_SYSTEM_PROMPT, temperature=0.3, max_tokens=1024),
+            hedge_names=HEDGE_PROVIDERS[mode]
+        )) if providers else None
         
-        if not query:
-            return jsonify({'success': False, 'error': 'Query required'}), 400
+        sent_tokens = 0
+        fallback_reason = 'unavailable' if tokens is None else 'empty_response'
+        if tokens is not None:
+            try:
+                for provider, content in tokens:
+                    if sent_tokens == 0:
+                        if req:
+                            req.note(provider, PROVIDERS[provider]['model'])
+                            req.first_token()
+                        yield sse_event('meta', stream_meta(mode, provider))
+                    sent_tokens += 1
+                    yield sse_event('token', {'content': content})
+            except Exception as e:
+                print(f"Streaming query failed: {e}")
+                if sent_tokens:
+                    # Part of the answer is already on screen - report instead of replacing it
+                    yield from stream_error_events(e, sent_tokens)
+                    return
+                fallback_reason = 'rate_limit' if is_rate_limit_error(str(e)) else 'error'
         
-        # Industrial AI system prompt
-        system_prompt = """You are an expert Industrial Maintenance Engineer AI Assistant specialized in:
+        if sent_tokens == 0:
+            # Provider unavailable or failed before the first token
+            yield from stream_fallback_events(query, mode, fallback_reason)
+        else:
+            yield sse_event('done', {'tokens': sent_tokens, 'complete': True})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Stop reverse proxies from buffering the stream
+        }
+    )
 
-🔧 CORE EXPERTISE:
-- Predictive & Preventive Maintenance
-- Equipment Reliability & Asset Management  
-- Root Cause Analysis & Failure Investigation
-- Maintenance Planning & Scheduling
-- Industrial Safety Protocols & OSHA Compliance
-- Mechanical, Electrical, Hydraulic & Pneumatic Systems
-- Vibration Analysis, Thermography & NDT Inspection
-- Lubrication Management & Tribology
-- Spare Parts Management & Inventory Control
+def run_analysis(data, mode, bypass_cache=False, fleet_id=None, announce=True):
+    """Analyze the machines in an /api/analyze body in ``mode``.
 
-⚠️ SAFETY PROTOCOLS:
-- Always prioritize LOTO (Lockout/Tagout) procedures
-- Emphasize PPE requirements for each task
-- Include confined space, hot work, and electrical safety considerations
-- Reference relevant safety standards (OSHA, NFPA, IEEE, etc.)
+    Returns ``(payload, status_code, cache_status)`` like run_query;
+    ``cache_status`` is None for incremental, fallback and error payloads.
+    ``fleet_id`` is only needed for incremental requests. With ``announce``,
+    a newly produced analysis is also published as an ``analysis`` event.
+    """
+    try:
+        result, plan = prepare_analysis(data, mode, bypass_cache, fleet_id)
+        if result is not None:
+            return result
+        
+        provider, analysis = None, None
+        if plan['providers']:
+            with metrics.span('provider'):
+                provider, analysis = single_flight.do(plan['flight_key'], lambda: router.route(
+                    plan['providers'],
+                    lambda name: ask_provider(name, plan['prompts'][name], ANALYSIS_SYSTEM_PROMPT, temperature=0.2, max_tokens=1200),
+                    hedge_names=HEDGE_PROVIDERS[mode]
+                ))
+        return complete_analysis(plan, provider, analysis, announce)
+    
+    except Exception as e:
+        return {'success': False, 'error': str(e)}, 500, None
 
-📊 RESPONSE FORMAT:
-1. Immediate Safety Considerations
-2. Technical Analysis & Root Cause
-3. Step-by-Step Maintenance Procedures
-4. Required Tools & Parts
-5. Safety Precautions & PPE
-6. Quality Control & Testing
-7. Documentation & Reporting
+def prepare_analysis(data, mode, bypass_cache=False, fleet_id=None):
+    """Everything in an analysis before the provider call, shared by run_analysis and the ASGI route.
 
-Provide technical, actionable guidance that maintenance technicians can follow safely and effectively."""
+    Returns ``(result, None)`` when the request is answered without a
+    provider (cache hit or unchanged fleet), ``result`` being
+    ``(payload, status_code, cache_status)``; otherwise ``(None, plan)``
+    where ``plan`` holds the ``providers``, a ``prompts`` dict sized for
+    each of them and for the mode's hedge targets, and the ``flight_key``
+    for the call, plus the state complete_analysis needs.
+    """
+    machine_data = data.get('machines', [])
+    
+    # Memory is updated before the cache check so repeated snapshots still build history
+    with metrics.span('memory'):
+        memory_agent.add_telemetry_data(machine_data)
+        publish_alerts(machine_data)
+        anomaly_detector.update_records(machine_data)
+        anomalies = fleet_anomalies(machine_data)
+    
+    incremental = bool(data.get('incremental'))
+    # Incremental requests reuse the fleet's last analysis instead of the response cache
+    bypass_cache = incremental or bypass_cache
+    with metrics.span('cache'):
+        cache_key = analysis_cache_key(machine_data, mode, anomalies)
+        cached = None if bypass_cache else response_cache.get(cache_key)
+    if cached is not None:
+        return (with_memory_analysis(cached, machine_data), 200, 'HIT'), None
+    
+    delta = None
+    with metrics.span('prompt'):
+        flagged = anomaly_lines(anomalies, machine_data)
+        if incremental:
+            # Only machines that crossed a threshold or drifted go to the model
+            delta = fleet_tracker.diff(fleet_id, machine_data, mode)
+    if delta is not None and delta_unchanged(delta):
+        return (with_memory_analysis(reused_analysis_payload(delta), machine_data), 200, None), None
+    
+    with metrics.span('probe'):
+        providers = router.order(MODE_PROVIDERS[mode])
+    
+    def build(token_limit):
+        if delta is not None and not delta['full']:
+            return build_incremental_analysis_prompt(delta, flagged, token_limit)
+        return build_analysis_prompt(machine_data, flagged, token_limit)
+    
+    with metrics.span('prompt'):
+        # Sized per provider, hedge targets included; identical requests share one call through the first provider's prompt
+        prompts = analysis_prompts(providers + [name for name in HEDGE_PROVIDERS[mode] if name not in providers], build)
+    return None, {
+        'machine_data': machine_data,
+        'mode': mode,
+        'bypass_cache': bypass_cache,
+        'cache_key': cache_key,
+        'fleet_id': fleet_id,
+        'delta': delta,
+        'flagged': flagged,
+        'prompts': prompts,
+        'providers': providers,
+        'flight_key': analysis_flight_key(prompts[providers[0]], mode) if providers else None,
+        'request_id': client_request_id(data)
+    }
 
-        if current_mode == 'offline':
-            # Use Ollama for offline processing
-            if not test_ollama_availability():
-                return jsonify({
-                    'success': False,
-                    'error': 'Ollama not available. Please ensure Ollama is running and gpt-oss:20b model is installed.',
-                    'mode': current_mode
-                }), 500
-            
-            response = query_ollama(query, system_prompt)
-            if response:
-                return jsonify({
-                    'success': True,
-                    'response': response,
-                    'model_used': 'gpt-oss:20b',
-                    'provider': 'Ollama Local',
-                    'mode': 'offline',
-                    'offline_mode': True
-                })
-            else:
-                # In offline mode, if Ollama fails, provide a clear offline error message
-                offline_response = f"""🔄 **OLLAMA OFFLINE MODE - QUERY FAILED**
+def complete_analysis(plan, provider, analysis, announce=True):
+    """Build, cache and announce the payload for a prepare_analysis plan and the provider's answer.
 
-❌ **Local AI Model Unavailable**
+    An empty ``analysis`` gives the basic offline analysis. Returns
+    ``(payload, status_code, cache_status)``.
+    """
+    machine_data, mode, delta = plan['machine_data'], plan['mode'], plan['delta']
+    with metrics.span('postprocess'):
+        payload = analysis_payload(analysis, len(machine_data), mode, provider, plan['flagged'])
+        if delta is not None:
+            payload['incremental'] = delta_summary(delta)
+    if not analysis:
+        metrics.count_fallback('empty_response' if plan['providers'] else 'unavailable')
+        return announced_analysis(with_memory_analysis(payload, machine_data), announce, plan['request_id']), 200, None
+    metrics.note(provider, PROVIDERS[provider]['model'])
+    
+    with metrics.span('postprocess'):
+        if delta is not None:
+            fleet_tracker.commit(plan['fleet_id'], machine_data, mode, payload, delta)
+        else:
+            response_cache.set(plan['cache_key'], payload, ttl_seconds=ANALYSIS_CACHE_TTL)
+    payload = announced_analysis(with_memory_analysis(payload, machine_data), announce, plan['request_id'])
+    if delta is not None:
+        return payload, 200, None
+    return payload, 200, 'BYPASS' if plan['bypass_cache'] else 'MISS'
 
-The local Ollama model (gpt-oss:20b) encountered an error or is not responding properly.
+def publish_alerts(machine_data):
+    """Publish an ``alert`` event for each machine whose severity changed"""
+    for alert in alert_tracker.update(machine_data):
+        event_bus.publish('alert', alert)
 
-**Troubleshooting Steps:**
-1. Check if Ollama service is running: `ollama serve`
-2. Verify the model is installed: `ollama list`
-3. Try pulling the model: `ollama pull gpt-oss:20b`
-4. Restart Ollama service if needed
+def announced_analysis(payload, announce, request_id=None):
+    """Publish a freshly produced analysis payload as an ``analysis`` event; returns it.
 
-**Your Query:** {query}
+    The caller's ``request_id`` goes into the payload, so a dashboard can skip
+    the event for an analysis it already shows from its own response.
+    """
+    if request_id:
+        payload = dict(payload, request_id=request_id)
+    if announce:
+        event_bus.publish('analysis', payload)
+    return payload
 
-*Note: This is offline mode - no external APIs are being used.*
-"""
-                return jsonify({
-                    'success': True,
-                    'response': offline_response,
-                    'model_used': 'offline-fallback',
-                    'provider': 'Local Fallback',
-                    'mode': 'offline',
-                    'offline_mode': True,
-                    'error_info': 'Ollama query failed'
-                })
-        
-        else:  # online mode
-            # Test OpenRouter API availability first
-            if not test_openrouter_availability():
-                # Return offline response
-                offline_response = generate_offline_response(query)
-                return jsonify({
-                    'success': True,
-                    'response': offline_response,
-                    'model_used': 'basic-offline',
-                    'provider': 'Local Fallback',
-                    'rate_limit_info': rate_limit_info,
-                    'mode': 'online',
-                    'offline_mode': True
-                })
-            
-            # Query OpenRouter
-            completion = openrouter_client.chat.completions.create(
-                model="openai/gpt-oss-120b",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": query}
-                ],
-                temperature=0.3,
-                max_tokens=1024
-            )
-            
-            response = completion.choices[0].message.content
-            
-            return jsonify({
-                'success': True,
-                'response': response,
-                'model_used': 'openai/gpt-oss-120b',
-                'provider': 'OpenRouter',
-                'mode': 'online',
-                'offline_mode': False
-            })
-    
-    except Exception as e:
-        error_str = str(e)
-        
-        # Handle rate limits specifically for online mode
-        if current_mode == 'online' and ("rate_limit" in error_str.lower() or "429" in error_str):
-            rate_info = extract_rate_limit_info(error_str)
-            offline_response = generate_offline_response(query)
-            
-            return jsonify({
-                'success': True,
-                'response': offline_response,
-                'model_used': 'basic-offline',
-                'provider': 'Local Fallback',
-                'rate_limit_info': rate_info,
-                'mode': current_mode,
-                'offline_mode': True
-            })
-        
-        return jsonify({
-            'success': False, 
-            'error': f"AI Service Error: {str(e)}",
-            'mode': current_mode
-        }), 500
+def client_request_id(data):
+    """The ``request_id`` a client tagged its /api/analyze body with, None if absent or unusable"""
+    request_id = data.get('request_id')
+    return request_id[:64] if isinstance(request_id, str) else None
+
+def run_analysis_job(data, mode, bypass_cache, fleet_id):
+    """run_analysis on a job worker, timed as its own ANALYSIS_JOB_ROUTE request; returns the payload.
+
+    A failed analysis raises, so the job ends FAILED with the error.
+    """
+    req = metrics.begin(ANALYSIS_JOB_ROUTE)
+    # The finished job is published as a ``job`` event carrying this payload
+    payload, status, cache_status = run_analysis(data, mode, bypass_cache, fleet_id, announce=False)
+    req.finish(status, cache_status)
+    if status != 200:
+        raise RuntimeError(payload.get('error') or f"Analysis failed with status {status}")
+    return payload
+
+def async_requested(args):
+    """True when the caller asked for a job ID instead of waiting (``?async=1``)"""
+    return args.get('async', '').lower() in ('1', 'true', 'yes')
+
+def job_accepted_payload(job):
+    """Body of the 202 returned for a queued analysis job"""
+    return {
+        'success': True,
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'position': job['position'],
+        'status_url': f"/api/jobs/{job['job_id']}"
+    }
+
+def job_queue_full_payload(error):
+    """Body of the 503 returned when the analysis job queue is full"""
+    return {'success': False, 'error': f"Analysis queue full ({error}) - retry shortly", 'retry_after': JOB_RETRY_AFTER}
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze_telemetry():
-    """Analyze machine telemetry data for maintenance insights"""
+    """Analyze machine telemetry data for maintenance insights.
+
+    With ``?async=1`` the analysis is queued and a job ID is returned at once
+    (202); poll ``/api/jobs/<id>`` for the result.
+    """
+    with metrics.span('parse'):
+        data = request.get_json(silent=True) or {}
+    if not data.get('machines'):
+        return jsonify({'success': False, 'error': 'Machine data required'}), 400
+    
+    mode = current_mode
+    bypass_cache = cache_bypassed(request.headers)
+    fleet_id = analysis_fleet_id(data, request.remote_addr)
+    if async_requested(request.args):
+        try:
+            job = analysis_jobs.submit(run_analysis_job, data, mode, bypass_cache, fleet_id, kind='analysis')
+        except QueueFull as e:
+            return jsonify(job_queue_full_payload(e)), 503, {'Retry-After': str(JOB_RETRY_AFTER)}
+        return jsonify(job_accepted_payload(job)), 202, {'Location': f"/api/jobs/{job['job_id']}"}
+    
+    payload, status, cache_status = run_analysis(data, mode, bypass_cache, fleet_id)
+    if cache_status:
+        return cached_json(payload, cache_status), status
+    return jsonify(payload), status
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status of an analysis job, with its result once done.
+
+    ``?wait=<seconds>`` holds the request until the job finishes or the wait
+    (capped at JOB_MAX_WAIT) runs out.
+    """
     try:
-        data = request.json
-        machine_data = data.get('machines', [])
-        
-        if not machine_data:
-            return jsonify({'success': False, 'error': 'Machine data required'}), 400
-        
-        # Create maintenance analysis prompt
-        analysis_prompt = f"""MAINTENANCE ANALYSIS REQUEST
+        wait = min(max(float(request.args.get('wait', 0)), 0.0), JOB_MAX_WAIT)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'wait must be a number of seconds'}), 400
+    job = analysis_jobs.get(job_id, wait=wait)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired job'}), 404
+    return jsonify(dict(job, success=job['status'] != FAILED))
 
-Machine Telemetry Data:
-{str(machine_data)[:2000]}
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running analysis job"""
+    job = analysis_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired job'}), 404
+    return jsonify(dict(job, success=job['status'] == CANCELLED))
 
-As an Industrial Maintenance Engineer, provide:
+@app.route('/api/jobs', methods=['GET'])
+def job_stats():
+    """Analysis job queue depth and counters"""
+    return jsonify({'success': True, 'jobs': analysis_jobs.stats()})
 
-🚨 IMMEDIATE ACTIONS:
-- Any critical safety concerns requiring immediate shutdown
-- Emergency procedures if equipment poses hazards
+TELEMETRY_FORMAT_ERROR = {
+    'success': False,
+    'error': 'Send telemetry as application/x-ndjson or application/msgpack'
+}
 
-🔍 TECHNICAL ANALYSIS:
-- Vibration analysis (bearing condition, alignment, balance)
-- Temperature analysis (overheating, thermal patterns)
-- Pressure analysis (leaks, blockages, pump performance)
-- Overall equipment effectiveness assessment
+@app.route('/api/telemetry', methods=['POST'])
+def ingest_telemetry():
+    """Bulk telemetry ingestion: NDJSON or MessagePack samples (format in telemetry_ingest).
 
-📋 MAINTENANCE RECOMMENDATIONS:
-- Preventive maintenance schedule adjustments
-- Predictive maintenance strategies
-- Parts that may need replacement soon
-- Lubrication requirements
+    The body is parsed as it streams in. Valid samples are stored even when
+    others are rejected, and every one updates the anomaly detector; each
+    machine's newest sample also updates the memory agent and raises alerts.
+    """
+    body_type = body_format(request.mimetype)
+    if body_type is None:
+        return jsonify(TELEMETRY_FORMAT_ERROR), 415
+    if request.content_length and request.content_length > TELEMETRY_MAX_BYTES:
+        return jsonify({'success': False, 'error': f"Body exceeds {TELEMETRY_MAX_BYTES} bytes - split it into batches"}), 413
+    
+    started = time.perf_counter()
+    try:
+        with metrics.span('parse'):
+            result = ingest(read_chunks(request.stream, max_bytes=TELEMETRY_MAX_BYTES), body_type, telemetry_store, detector=anomaly_detector)
+    except BodyTooLarge as e:
+        return jsonify({'success': False, 'error': f"{e} - samples before the limit were stored"}), 413
+    except UnsupportedBody as e:
+        return jsonify({'success': False, 'error': str(e)}), 415
+    
+    with metrics.span('memory'):
+        latest = result.latest_machines()
+        if latest:
+            memory_agent.add_telemetry_data(latest)
+            publish_alerts(latest)
+    
+    payload = result.payload(time.perf_counter() - started)
+    payload['anomalies'] = anomaly_detector.anomalies(list(result.latest), limit=MAX_REPORTED_ANOMALIES)
+    payload['success'] = result.accepted > 0 or result.rejected == 0
+    return jsonify(payload), 200 if payload['success'] else 400
 
-⚠️ SAFETY PROTOCOLS:
-- Required PPE for maintenance tasks
-- LOTO procedures needed
-- Confined space or electrical safety considerations
+@app.route('/api/telemetry/stats', methods=['GET'])
+def telemetry_stats():
+    """Telemetry store occupancy"""
+    return jsonify({'success': True, 'telemetry': telemetry_store.stats()})
 
-📊 PRIORITY MATRIX:
-- Critical (immediate action required)
-- High (schedule within 1 week)
-- Medium (schedule within 1 month)
-- Low (monitor during next scheduled maintenance)
+@app.route('/api/anomalies', methods=['GET'])
+def anomalies():
+    """Series whose latest reading is anomalous (optionally ?machine_id=), with detector counters"""
+    requested = request.args.get('machine_id')
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify({
+        'success': True,
+        'anomalies': anomaly_detector.anomalies([requested] if requested else None, limit=max(limit, 1)),
+        'detector': anomaly_detector.stats()
+    })
 
-Provide actionable insights for the maintenance department."""
+def parse_duration(text):
+    """Seconds in a duration like ``90s``, ``15m``, ``24h`` or ``7d``; None if malformed"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhdw])', text.strip().lower())
+    return float(match.group(1)) * DURATION_UNITS[match.group(2)] if match else None
 
-        system_prompt = "You are an expert Industrial Maintenance Engineer AI providing technical analysis and safety-focused recommendations."
-
-        if current_mode == 'offline':
-            # Use Ollama
-            if not test_ollama_availability():
-                offline_analysis = generate_offline_response("", "maintenance_analysis")
-                return jsonify({
-                    'success': True,
-                    'analysis': {
-                        'maintenance_insights': offline_analysis,
-                        'machines_analyzed': len(machine_data),
-                        'analysis_type': 'Basic Offline Analysis'
-                    },
-                    'model_used': 'basic-offline',
-                    'provider': 'Local Fallback',
-                    'mode': 'offline'
-                })
-            
-            analysis = query_ollama(analysis_prompt, system_prompt)
-            if analysis:
-                return jsonify({
-                    'success': True,
-                    'analysis': {
-                        'maintenance_insights': analysis,
-                        'machines_analyzed': len(machine_data),
-                        'analysis_type': 'Ollama AI Analysis'
-                    },
-                    'model_used': 'gpt-oss:20b',
-                    'provider': 'Ollama Local',
-                    'mode': 'offline'
-                })
-        
-        else:  # online mode
-            if not test_openrouter_availability():
-                offline_analysis = generate_offline_response("", "maintenance_analysis")
-                return jsonify({
-                    'success': True,
-                    'analysis': {
-                        'maintenance_insights': offline_analysis,
-                        'machines_analyzed': len(machine_data),
-                        'analysis_type': 'Basic Offline Analysis'
-                    },
-                    'model_used': 'basic-offline',
-                    'provider': 'Local Fallback',
-                    'mode': 'online',
-                    'offline_mode': True
-                })
-            
-            completion = openrouter_client.chat.completions.create(
-                model="openai/gpt-oss-120b",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": analysis_prompt}
-                ],
-                temperature=0.2,
-                max_tokens=1200
-            )
-            
-            analysis = completion.choices[0].message.content
-            
-            return jsonify({
-                'success': True,
-                'analysis': {
-                    'maintenance_insights': analysis,
-                    'machines_analyzed': len(machine_data),
-                    'analysis_type': 'OpenRouter AI Analysis'
-                },
-                'model_used': 'openai/gpt-oss-120b',
-                'provider': 'OpenRouter',
-                'mode': 'online'
-            })
+def trend_window(args, now):
+    """``(start, end, live)`` from ``start``/``end`` (Unix seconds) or ``range`` (default 1h, ending now).
+
+    ``live`` is True when the window reaches the present.
+    """
+    seconds = parse_duration(args.get('range', TREND_DEFAULT_RANGE))
+    if seconds is None:
+        raise ValueError("range must look like 15m, 24h or 7d")
+    try:
+        end = float(args['end']) if args.get('end') else None
+        start = float(args['start']) if args.get('start') else None
+    except ValueError:
+        raise ValueError("start and end must be Unix timestamps in seconds")
+    live = end is None or end >= now
+    if end is None:
+        end = now
+    if start is None:
+        start = end - seconds
+    if start >= end:
+        raise ValueError("start must be before end")
+    return start, end, live
+
+def trend_payload(machine_id, metric, start, end, width):
+    """Downsampled series for one machine and metric"""
+    timestamps, values = telemetry_store.series(metric, machine_id, start, end)
+    return {
+        'success': True,
+        'machine': machine_id,
+        'metric': metric,
+        'start': start,
+        'end': end,
+        'width': width,
+        'raw_points': len(timestamps),
+        'points': downsample_points(timestamps, values, width)
+    }
+
+@app.route('/api/trends', methods=['GET'])
+def trends():
+    """History of one metric for one machine, LTTB-downsampled to about ``width`` points.
+
+    Query: ``machine``, ``metric`` (a TelemetryData field, or ``rpm``),
+    ``width`` (chart pixels), and ``range`` or ``start``/``end``. Responses are
+    cached per (machine, metric, window, width) and marked cacheable for
+    browsers and proxies.
+    """
+    machine_id = request.args.get('machine', '')
+    metric = TREND_METRIC_ALIASES.get(request.args.get('metric', ''), request.args.get('metric', ''))
+    if not machine_id:
+        return jsonify({'success': False, 'error': 'machine required'}), 400
+    if metric not in METRICS:
+        return jsonify({'success': False, 'error': f"metric must be one of {', '.join(METRICS + tuple(TREND_METRIC_ALIASES))}"}), 400
+    try:
+        width = min(max(int(request.args.get('width', TREND_DEFAULT_WIDTH)), 3), TREND_MAX_WIDTH)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'width must be a whole number of pixels'}), 400
+    now = time.time()
+    try:
+        start, end, live = trend_window(request.args, now)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if machine_id not in telemetry_store:
+        return jsonify({'success': False, 'error': f"No telemetry for machine {machine_id}"}), 404
     
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    # A live window's end is moved up to the next bucket boundary (bucket = span / width), so
+    # requests within one bucket share a cache entry that expires when the boundary passes
+    span = end - start
+    if live:
+        bucket = span / width
+        end += bucket - end % bucket
+        start = end - span
+    ttl = max(end - now, 1.0) if live else trend_cache.ttl_seconds
+    
+    with metrics.span('cache'):
+        cache_key = make_cache_key(f'{machine_id}:{metric}', 'lttb', 'trends', start=round(start, 3), end=round(end, 3), width=width)
+        cached = None if cache_bypassed(request.headers) else trend_cache.get(cache_key)
+    if cached is not None:
+        cache_status = 'HIT'
+        payload = cached
+    else:
+        with metrics.span('downsample'):
+            payload = trend_payload(machine_id, metric, start, end, width)
+        trend_cache.set(cache_key, payload, ttl_seconds=ttl)
+        cache_status = 'MISS'
+    
+    response = cached_json(payload, cache_status)
+    response.headers['Cache-Control'] = f"public, max-age={int(ttl)}"
+    return response
+
+def events_snapshot():
+    """State a new /api/events subscriber starts from, sent as its first ``snapshot`` event"""
+    return {
+        'mode': current_mode,
+        'routing_order': router.order(MODE_PROVIDERS[current_mode]),
+        'provider_health': health_monitor.snapshot(),
+        'jobs': analysis_jobs.stats()
+    }
+
+def events_subscription_args(headers, args):
+    """``(last_event_id, events)`` for a subscription from Last-Event-ID (or ``?last_event_id=``) and ``?events=a,b``"""
+    last_event_id = headers.get('Last-Event-ID') or args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    events = [name.strip() for name in args.get('events', '').split(',') if name.strip()]
+    return last_event_id, events or None
+
+def events_stream_open():
+    """First messages of an event stream: reconnect delay and current state"""
+    return f"retry: {EVENTS_RETRY_MS}\n" + sse_event('snapshot', events_snapshot())
+
+def events_stream_messages(items):
+    """SSE messages for a batch of bus events"""
+    return ''.join(sse_event(event, data, event_id) for event_id, event, data, _ in items)
+
+EVENTS_BUSY_ERROR = {'success': False, 'error': 'Too many event streams open - poll /api/health instead'}
+
+@app.route('/api/events', methods=['GET'])
+def event_stream():
+    """Push channel for dashboards as Server-Sent Events.
+
+    Starts with a ``snapshot`` event, then sends ``mode``, ``provider_health``,
+    ``alert``, ``analysis`` and ``job`` events as they happen. ``?events=``
+    limits the stream to a comma-separated list of those; reconnecting
+    EventSource clients resume from Last-Event-ID.
+    """
+    last_event_id, events = events_subscription_args(request.headers, request.args)
+    try:
+        subscription = event_bus.subscribe(last_event_id, events)
+    except TooManySubscribers:
+        return jsonify(EVENTS_BUSY_ERROR), 503
+    
+    def generate():
+        try:
+            yield events_stream_open()
+            while True:
+                items = subscription.next(EVENTS_KEEPALIVE)
+                yield events_stream_messages(items) if items else ": keepalive\n\n"
+        finally:
+            subscription.close()
+    
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/events/stats', methods=['GET'])
+def event_stats():
+    """Open event streams and events published"""
+    return jsonify({'success': True, 'events': event_bus.stats()})
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    openrouter_working = test_openrouter_availability() if current_mode == 'online' else False
-    ollama_working = test_ollama_availability() if current_mode == 'offline' else False
+    """Health check endpoint - reports the background monitor's last known state"""
+    openrouter_working = health_monitor.is_available('openrouter') if current_mode != 'offline' else False
+    ollama_working = health_monitor.is_available('ollama')
     
     return jsonify({
         'status': 'healthy',
         'mode': current_mode,
         'openrouter_available': openrouter_working,
-        'ollama_available': test_ollama_availability(),
-        'api_working': openrouter_working if current_mode == 'online' else ollama_working,
-        'current_provider': 'OpenRouter' if current_mode == 'online' else 'Ollama Local',
-        'current_model': 'openai/gpt-oss-120b' if current_mode == 'online' else 'gpt-oss:20b',
-        'rate_limit_info': rate_limit_info if not openrouter_working else None
+        'ollama_available': ollama_working,
+        'api_working': openrouter_working if current_mode != 'offline' else ollama_working,
+        'current_provider': 'OpenRouter' if current_mode != 'offline' else 'Ollama Local',
+        'current_model': 'openai/gpt-oss-120b' if current_mode != 'offline' else 'gpt-oss:20b',
+        'rate_limit_info': health_monitor.get_rate_limit_info('openrouter') if not openrouter_working else None,
+        'provider_health': health_monitor.snapshot()
     })
 
 @app.route('/api/model-status', methods=['GET'])
 def model_status():
     """Model status endpoint"""
-    openrouter_working = test_openrouter_availability() if current_mode == 'online' else False
-    ollama_working = test_ollama_availability()
+    openrouter_working = health_monitor.is_available('openrouter') if current_mode != 'offline' else False
+    ollama_working = health_monitor.is_available('ollama')
     
     return jsonify({
         'success': True,
         'mode': current_mode,
         'openrouter_available': openrouter_working,
         'ollama_available': ollama_working,
-        'api_working': openrouter_working if current_mode == 'online' else ollama_working,
-        'current_model': 'openai/gpt-oss-120b' if current_mode == 'online' else 'gpt-oss:20b',
-        'provider': 'OpenRouter' if current_mode == 'online' else 'Ollama Local',
-        'rate_limit_info': rate_limit_info if not openrouter_working else None
+        'api_working': openrouter_working if current_mode != 'offline' else ollama_working,
+        'current_model': 'openai/gpt-oss-120b' if current_mode != 'offline' else 'gpt-oss:20b',
+        'provider': 'OpenRouter' if current_mode != 'offline' else 'Ollama Local',
+        'rate_limit_info': health_monitor.get_rate_limit_info('openrouter') if not openrouter_working else None,
+        'provider_health': health_monitor.snapshot(),
+        'rate_limiters': {name: limiter.stats() for name, (_, limiter) in CLOUD_CLIENTS.items()},
+        'routing_order': router.order(MODE_PROVIDERS[current_mode]),
+        'router': router.scoreboard(),
+        'hedging': router.hedge_stats(),
+        'provider_slots': provider_slots.stats()
     })
 
+@app.route('/api/memory-status', methods=['GET'])
+def memory_status():
+    """Telemetry memory occupancy and model coverage"""
+    return jsonify({
+        'success': True,
+        'memory_status': memory_agent.get_memory_insights()
+    })
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Response cache counters and occupancy, plus calls saved by request coalescing"""
+    return jsonify({'success': True, 'cache': response_cache.stats(), 'single_flight': single_flight.stats()})
+
 @app.route('/api/retry-connection', methods=['POST'])
 def retry_connection():
-    """Endpoint to retry API connection"""
+    """Endpoint to retry API connection - forces an immediate probe"""
     if current_mode == 'online':
-        api_working = test_openrouter_availability()
+        api_working = health_monitor.probe_now('openrouter')
         return jsonify({
             'success': True,
             'api_available': api_working,
             'message': 'OpenRouter connection restored' if api_working else 'OpenRouter still unavailable',
-            'rate_limit_info': rate_limit_info if not api_working else None
+            'rate_limit_info': health_monitor.get_rate_limit_info('openrouter') if not api_working else None
         })
     else:
-        api_working = test_ollama_availability()
+        api_working = health_monitor.probe_now('ollama')
         return jsonify({
             'success': True,
             'api_available': api_working,
@@ -522,8 +1600,21 @@ if __name__ == '__main__':
     print("🔧 CORS enabled for frontend communication")
     print("🌐 Online Mode: OpenRouter API with gpt-oss-120b")
     print("💻 Offline Mode: Ollama Local with gpt-oss:20b")
+    print(f"🧭 Auto Mode: fastest expected of {', '.join(MODE_PROVIDERS['auto'])}")
     print("📡 Health endpoint: http://localhost:5000/api/health")
     print("🔄 Toggle endpoint: http://localhost:5000/api/toggle-mode")
+    print("📶 Streaming endpoint: http://localhost:5000/api/query/stream")
+    print("📥 Telemetry ingest: POST http://localhost:5000/api/telemetry (NDJSON or MessagePack)")
+    print("📈 Trends: http://localhost:5000/api/trends?machine=<id>&metric=temperature&range=24h&width=800")
+    print("📣 Event stream: http://localhost:5000/api/events (mode, provider health, alerts, analyses)")
+    print(f"🧵 Analysis jobs: POST /api/analyze?async=1, poll /api/jobs/<id> ({analysis_jobs.workers} workers, {analysis_jobs.max_queued} queued max)")
+    
+    health_monitor.start()
+    print("🩺 Provider health monitor running in background")
+    
+    warmed = open_response_store()
+    if response_cache.store is not None:
+        print(f"💾 Response store: {RESPONSE_STORE_PATH} ({warmed} hot entries preloaded)")
     
     try:
         app.run(host='127.0.0.1', port=5000, debug=True, use_reloader=False)
@@ -0,0 +1,230 @@
+"""
+Job Queue - Bounded worker pool for long-running requests
+Callers get a job ID straight away and poll (or long-poll) for the result, so
+slow analyses no longer hold an HTTP connection open past proxy timeouts
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class QueueFull(Exception):
+    """Raised by submit() when ``max_queued`` jobs are already waiting"""
+
+
+class Job:
+    def __init__(self, func, args, kwargs, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.expires_at = None  # Monotonic time the finished job is dropped
+
+    def snapshot(self):
+        """JSON-ready view of the job"""
+        view = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.status == DONE:
+            view['result'] = self.result
+        elif self.status == FAILED:
+            view['error'] = self.error
+        return view
+
+
+class JobQueue:
+    """Runs submitted calls on ``workers`` threads.
+
+    At most ``max_queued`` jobs wait for a worker; more are refused with
+    QueueFull. Queued jobs can be cancelled outright. A running job cannot
+    be interrupted, so cancelling it only discards its result. Finished jobs
+    are kept for ``result_ttl`` seconds, and only the newest ``max_finished``
+    of them once more have piled up. Callbacks registered with
+    on_finish() get each finished job's snapshot, on the thread that finished it.
+    """
+
+    def __init__(self, workers=2, max_queued=32, result_ttl=600.0, max_finished=256, name='jobs'):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.max_finished = max_finished
+        self.name = name
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)  # Notified on every status change
+        self._queue = deque()
+        self._jobs = OrderedDict()  # job id -> Job, oldest first
+        self._finished = OrderedDict()  # job id -> Job, in the order they finished (and expire)
+        self._threads = []
+        self._listeners = []
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._expired = 0
+        self._evicted = 0
+
+    def submit(self, func, *args, kind='job', **kwargs):
+        """Queue ``func(*args, **kwargs)``; returns the job's snapshot"""
+        with self._lock:
+            self._expire()
+            if len(self._queue) >= self.max_queued:
+                self._rejected += 1
+                raise QueueFull(f"{len(self._queue)} {self.name} already queued")
+            job = Job(func, args, kwargs, kind)
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._submitted += 1
+            self._start_workers()
+            self._changed.notify_all()
+            return dict(job.snapshot(), position=len(self._queue))
+
+    def get(self, job_id, wait=0.0):
+        """Job snapshot, or None for an unknown or expired ID.
+
+        With ``wait`` > 0, blocks up to that many seconds for the job to finish.
+        """
+        deadline = time.monotonic() + wait
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            while job is not None and job.status not in FINISHED:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            if job is None:
+                return None
+            view = job.snapshot()
+            if job.status == QUEUED:
+                view['position'] = self._queue.index(job) + 1
+            return view
+
+    def cancel(self, job_id):
+        """Cancel a job; returns its snapshot, or None for an unknown ID"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            cancelled = job.status in (QUEUED, RUNNING)
+            if job.status == QUEUED:
+                self._queue.remove(job)
+            if cancelled:
+                self._finish(job, CANCELLED)
+                self._cancelled += 1
+            view = job.snapshot()
+        if cancelled:
+            self._notify(view)
+        return view
+
+    def on_finish(self, callback):
+        """Call ``callback(snapshot)`` whenever a job finishes, fails or is cancelled"""
+        self._listeners.append(callback)
+
+    def stats(self):
+        """Queue depth, worker use and job counters"""
+        with self._lock:
+            self._expire()
+            running = sum(1 for job in self._jobs.values() if job.status == RUNNING)
+            return {
+                'workers': self.workers,
+                'running': running,
+                'queued': len(self._queue),
+                'max_queued': self.max_queued,
+                'retained': len(self._jobs),
+                'result_ttl': self.result_ttl,
+                'max_finished': self.max_finished,
+                'submitted': self._submitted,
+                'rejected': self._rejected,
+                'completed': self._completed,
+                'failed': self._failed,
+                'cancelled': self._cancelled,
+                'expired': self._expired,
+                'evicted': self._evicted
+            }
+
+    def _start_workers(self):
+        """Start worker threads on first use (caller holds the lock)"""
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f'{self.name}-worker-{len(self._threads)}', daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._changed.wait()
+                job = self._queue.popleft()
+                job.status = RUNNING
+                job.started_at = time.time()
+                self._changed.notify_all()
+
+            try:
+                result, error = job.func(*job.args, **job.kwargs), None
+            except Exception as e:
+                result, error = None, str(e)
+
+            with self._lock:
+                if job.status == CANCELLED:
+                    continue  # Cancelled while running - the result is discarded
+                job.result, job.error = result, error
+                self._finish(job, FAILED if error is not None else DONE)
+                if error is None:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                view = job.snapshot()
+            self._notify(view)
+
+    def _finish(self, job, status):
+        """Mark a job finished and start its expiry clock (caller holds the lock)"""
+        job.status = status
+        job.finished_at = time.time()
+        job.expires_at = time.monotonic() + self.result_ttl
+        job.func = job.args = job.kwargs = None  # Don't keep request bodies alive
+        self._finished[job.id] = job
+        self._changed.notify_all()
+
+    def _notify(self, view):
+        for callback in list(self._listeners):
+            try:
+                callback(view)
+            except Exception as e:
+                print(f"Job listener failed: {e}")
+
+    def _expire(self):
+        """Drop finished jobs past their retention or beyond ``max_finished``, oldest first (caller holds the lock)"""
+        now = time.monotonic()
+        while self._finished:
+            job_id, job = next(iter(self._finished.items()))
+            if job.expires_at <= now:
+                self._expired += 1
+            elif len(self._finished) > self.max_finished:
+                self._evicted += 1
+            else:
+                break
+            del self._finished[job_id]
+            del self._jobs[job_id]
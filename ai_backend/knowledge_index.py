@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Knowledge Index - On-disk BM25 index over maintenance procedures and manuals
+Built once from a folder of text/markdown documents; postings, passage lengths
+and passage text are memory-mapped at load time, so offline answers can quote
+real procedures without holding the corpus in memory
+
+Build with:   python knowledge_index.py build ./manuals ./knowledge_index
+Search with:  python knowledge_index.py search ./knowledge_index "pump cavitation noise"
+"""
+
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+INDEX_VERSION = 1
+DOCUMENT_EXTENSIONS = ('.md', '.txt', '.rst')
+PASSAGE_WORDS = 120  # Target passage size; paragraphs are packed up to about this many words
+DEFAULT_INDEX_DIR = os.environ.get(
+    'KNOWLEDGE_INDEX_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knowledge_index')
+)
+MIN_SCORE = 1.0  # Weaker hits are treated as no answer
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i if in into is it its my of on or our should so
+than that the their then there these this to was we what when where which while who why will with you your
+""".split())
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+_HEADING = re.compile(r'^\s{0,3}#{1,6}\s+(.*)$')
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords or single characters; plurals folded ("bearings" -> "bearing")"""
+    return [_singular(token) for token in _TOKEN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+def _singular(token):
+    if len(token) > 3 and token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        return token[:-3] + 'y' if token.endswith('ies') else token[:-1]
+    return token
+
+
+def split_passages(text, passage_words=PASSAGE_WORDS):
+    """(heading, passage) pairs: paragraphs packed up to ``passage_words``, long ones split"""
+    passages = []
+    heading = ''
+    current, current_words = [], 0
+
+    def flush():
+        nonlocal current, current_words
+        if current:
+            passages.append((heading, '\n\n'.join(current)))
+        current, current_words = [], 0
+
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        title = _HEADING.match(paragraph.splitlines()[0])
+        if title:
+            flush()
+            heading = title.group(1).strip()
+            paragraph = '\n'.join(paragraph.splitlines()[1:]).strip()
+            if not paragraph:
+                continue
+
+        words = paragraph.split()
+        if current_words and current_words + len(words) > passage_words:
+            flush()
+        while len(words) > passage_words * 2:
+            # A wall of text is cut into passage-sized windows
+            passages.append((heading, ' '.join(words[:passage_words])))
+            words = words[passage_words:]
+            paragraph = ' '.join(words)
+        current.append(paragraph)
+        current_words += len(words)
+    flush()
+    return passages
+
+
+def iter_documents(source_dir):
+    """(relative path, text) for every document under ``source_dir``, in a stable order"""
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(DOCUMENT_EXTENSIONS):
+                path = os.path.join(root, name)
+                with open(path, encoding='utf-8', errors='replace') as f:
+                    yield os.path.relpath(path, source_dir), f.read()
+
+
+def build_index(source_dir, index_dir, passage_words=PASSAGE_WORDS, k1=1.2, b=0.75):
+    """Index every document under ``source_dir`` into ``index_dir``; returns build stats"""
+    started = time.perf_counter()
+    postings = {}  # term -> {passage id: term frequency}
+    lengths = []
+    sources = []
+    texts = []
+
+    for path, text in iter_documents(source_dir):
+        for heading, passage in split_passages(text, passage_words):
+            passage_id = len(lengths)
+            tokens = tokenize(f'{heading}\n{passage}')
+            lengths.append(len(tokens))
+            sources.append([path, heading])
+            texts.append(passage.encode('utf-8'))
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[passage_id] = counts.get(passage_id, 0) + 1
+
+    os.makedirs(index_dir, exist_ok=True)
+    vocabulary = {}
+    doc_ids, freqs = [], []
+    for term in sorted(postings):
+        counts = postings[term]
+        vocabulary[term] = [len(doc_ids), len(counts)]  # Offset into the postings, document frequency
+        doc_ids.extend(counts)
+        freqs.extend(min(count, 65535) for count in counts.values())
+
+    offsets = np.zeros(len(texts) + 1, dtype=np.uint64)
+    np.cumsum([len(text) for text in texts], out=offsets[1:])
+    _save_array(index_dir, 'doc_ids.npy', np.array(doc_ids, dtype=np.uint32))
+    _save_array(index_dir, 'freqs.npy', np.array(freqs, dtype=np.uint16))
+    _save_array(index_dir, 'lengths.npy', np.array(lengths, dtype=np.uint32))
+    _save_array(index_dir, 'text_offsets.npy', offsets)
+    _write_atomic(index_dir, 'passages.bin', b''.join(texts))
+
+    meta = {
+        'version': INDEX_VERSION,
+        'passages': len(lengths),
+        'average_length': (sum(lengths) / len(lengths)) if lengths else 0.0,
+        'k1': k1,
+        'b': b,
+        'sources': sources,
+        'vocabulary': vocabulary
+    }
+    # Written last: an index without meta.json is incomplete and is not loaded
+    _write_atomic(index_dir, 'meta.json', json.dumps(meta).encode('utf-8'))
+    return {
+        'documents': len({source for source, _ in sources}),
+        'passages': len(lengths),
+        'terms': len(vocabulary),
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+
+
+def _save_array(index_dir, name, array):
+    tmp = os.path.join(index_dir, name + '.tmp')
+    with open(tmp, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp, os.path.join(index_dir, name))
+
+
+def _write_atomic(index_dir, name, data):
+    tmp = os.path.join(index_dir, name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, os.path.join(index_dir, name))
+
+
+class KnowledgeIndex:
+    """Read-only BM25 index written by build_index. Arrays and passage text stay memory-mapped."""
+
+    def __init__(self, index_dir):
+        with open(os.path.join(index_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported knowledge index version {meta.get('version')} in {index_dir}")
+
+        self.index_dir = index_dir
+        self.passages = meta['passages']
+        self.k1 = meta['k1']
+        self.b = meta['b']
+        self._sources = meta['sources']
+        self._vocabulary = meta['vocabulary']
+        self._doc_ids = np.load(os.path.join(index_dir, 'doc_ids.npy'), mmap_mode='r')
+        self._freqs = np.load(os.path.join(index_dir, 'freqs.npy'), mmap_mode='r')
+        self._offsets = np.load(os.path.join(index_dir, 'text_offsets.npy'), mmap_mode='r')
+        lengths = np.load(os.path.join(index_dir, 'lengths.npy'), mmap_mode='r')
+        # BM25 length normalisation per passage, computed once
+        average = meta['average_length'] or 1.0
+        self._norms = (self.k1 * (1 - self.b + self.b * lengths / average)).astype(np.float32)
+
+        self._text_file = open(os.path.join(index_dir, 'passages.bin'), 'rb')
+        size = os.fstat(self._text_file.fileno()).st_size
+        self._text = mmap.mmap(self._text_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    @classmethod
+    def load(cls, index_dir=DEFAULT_INDEX_DIR):
+        """Index at ``index_dir``, or None when none has been built there"""
+        if not os.path.exists(os.path.join(index_dir, 'meta.json')):
+            return None
+        return cls(index_dir)
+
+    def search(self, query, k=3):
+        """Top ``k`` passages for ``query`` as dicts with source, heading, text and score"""
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term in self._vocabulary]
+        if not terms or not self.passages:
+            return []
+
+        scores = np.zeros(self.passages, dtype=np.float32)
+        for term in terms:
+            offset, df = self._vocabulary[term]
+            ids = self._doc_ids[offset:offset + df]
+            tf = self._freqs[offset:offset + df].astype(np.float32)
+            idf = math.log(1 + (self.passages - df + 0.5) / (df + 0.5))
+            scores[ids] += idf * tf * (self.k1 + 1) / (tf + self._norms[ids])
+
+        k = min(k, self.passages)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self._hit(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+    def passage(self, passage_id):
+        """Text of one passage"""
+        start, end = int(self._offsets[passage_id]), int(self._offsets[passage_id + 1])
+        return self._text[start:end].decode('utf-8')
+
+    def close(self):
+        if isinstance(self._text, mmap.mmap):
+            self._text.close()
+        self._text_file.close()
+
+    def _hit(self, passage_id, score):
+        source, heading = self._sources[passage_id]
+        return {'source': source, 'heading': heading, 'text': self.passage(passage_id), 'score': round(score, 3)}
+
+
+_default_index = None
+_default_loaded = False
+
+
+def default_index():
+    """The index at KNOWLEDGE_INDEX_DIR (default ``ai_backend/knowledge_index``), loaded once; None if not built"""
+    global _default_index, _default_loaded
+    if not _default_loaded:
+        try:
+            _default_index = KnowledgeIndex.load()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Knowledge index not loaded: {e}")
+        _default_loaded = True
+    return _default_index
+
+
+def search_knowledge(query, k=2, min_score=MIN_SCORE):
+    """Top passages from the default index scoring at least ``min_score`` (empty without an index)"""
+    index = default_index()
+    if index is None or not query:
+        return []
+    return [hit for hit in index.search(query, k) if hit['score'] >= min_score]
+
+
+def format_passages(hits, max_chars=600):
+    """Retrieved passages as a markdown block for offline answers"""
+    blocks = []
+    for hit in hits:
+        text = hit['text'] if len(hit['text']) <= max_chars else hit['text'][:max_chars].rsplit(' ', 1)[0] + ' …'
+        title = f"{hit['heading']} ({hit['source']})" if hit['heading'] else hit['source']
+        blocks.append(f"📘 **{title}**\n{text}")
+    return '\n\n'.join(blocks)
+
+
+def main():
+    if len(sys.argv) < 4 or sys.argv[1] not in ('build', 'search'):
+        print("Usage: python knowledge_index.py build <documents dir> <index dir>")
+        print("       python knowledge_index.py search <index dir> <query>")
+        sys.exit(1)
+
+    if sys.argv[1] == 'build':
+        stats = build_index(sys.argv[2], sys.argv[3])
+        print(f"📚 Indexed {stats['documents']} documents into {stats['passages']} passages "
+              f"({stats['terms']} terms) in {stats['seconds']}s")
+        return
+
+    index = KnowledgeIndex.load(sys.argv[2])
+    if index is None:
+        print(f"❌ No knowledge index in {sys.argv[2]}")
+        sys.exit(1)
+    query = ' '.join(sys.argv[3:])
+    started = time.perf_counter()
+    hits = index.search(query, k=5)
+    print(f"🔍 {len(hits)} passages in {(time.perf_counter() - started) * 1000:.2f} ms\n")
+    for hit in hits:
+        print(f"[{hit['score']:.2f}] {hit['source']} - {hit['heading']}")
+        print(f"   {hit['text'][:200]}\n")
+
+if __name__ == "__main__":
+    main()
@@ -8,78 +8,107 @@ import json
 import random
 import time
 from datetime import datetime
+from fleet_rules import FleetSnapshot, evaluate_fleet
+from fleet_delta import machine_id
+from anomaly_detector import EWMADetector, format_anomalies
+from offline_intents import IntentMatcher
+from knowledge_index import search_knowledge, format_passages
+
+# Canned answers for general questions, in priority order
+GENERAL_QUERY_RESPONSES = {
+    "predictive maintenance": """
+🔮 PREDICTIVE MAINTENANCE OVERVIEW
+
+Key Components:
+• Sensor Integration: Temperature, vibration, pressure, current
+• Data Analytics: Trend analysis and anomaly detection  
+• Machine Learning: Failure prediction models
+• Alert Systems: Early warning notifications
+
+Benefits:
+• Reduced unplanned downtime (up to 50%)
+• Lower maintenance costs (10-40% savings)
+• Extended equipment life
+• Improved safety and reliability
+
+Implementation Steps:
+1. Install condition monitoring sensors
+2. Establish data collection infrastructure
+3. Develop baseline performance metrics
+4. Train predictive models
+5. Deploy alert and response systems
+""",
+    "iot": """
+🌐 IoT IN INDUSTRIAL SETTINGS
+
+Core Technologies:
+• Wireless Sensors: LoRaWAN, WiFi, Cellular
+• Edge Computing: Local data processing
+• Cloud Platforms: Azure IoT, AWS IoT, Google Cloud IoT
+• Communication Protocols: MQTT, OPC-UA, Modbus
+
+Applications:
+• Asset tracking and monitoring
+• Environmental condition monitoring
+• Energy management and optimization
+• Supply chain visibility
+• Quality control automation
+
+Security Considerations:
+• Network segmentation
+• Encrypted communications
+• Device authentication
+• Regular security updates
+""",
+    "digital twin": """
+🔄 DIGITAL TWIN TECHNOLOGY
+
+Definition: Virtual replica of physical assets/processes
+
+Components:
+• Real-time data synchronization
+• Physics-based modeling
+• Simulation capabilities
+• Predictive analytics
+• Visualization interfaces
+
+Use Cases:
+• Process optimization
+• Design validation
+• Predictive maintenance
+• Training simulations
+• What-if scenario analysis
+
+Technologies:
+• 3D modeling and CAD integration
+• Real-time data streaming
+• Machine learning algorithms
+• Cloud computing platforms
+• AR/VR visualization
+"""
+}
+
+general_query_intents = IntentMatcher(GENERAL_QUERY_RESPONSES, {
+    "predictive maintenance": ["predictive", "condition monitoring", "failure prediction", "predict failures"],
+    "iot": ["iiot", "internet of things", "sensors", "lorawan", "mqtt", "opc-ua", "modbus", "edge computing"],
+    "digital twin": ["digital twins", "virtual replica", "simulation model"]
+})
 
 class LocalAIAgent:
     def __init__(self):
         self.running = True
+        # Per-machine baselines across factory runs, so drift and outliers show up beyond the fixed limits
+        self.anomaly_detector = EWMADetector()
         
         print("🤖 Local AI Agent Starting...")
         print("💻 Running in offline mode - no API calls required")
         print("📊 Providing factory analysis using local algorithms")
         
     def analyze_factory_data_local(self, factory_data):
-        """Local analysis without API calls"""
-        analysis = {
-            "overall_health": "Good",
-            "critical_issues": [],
-            "warnings": [],
-            "recommendations": []
-        }
-        
-        for machine in factory_data:
-            name = machine['name']
-            temp = machine['temperature']
-            vib = machine['vibration']
-            pressure = machine['pressure']
-            status = machine['status']
-            
-            # Temperature analysis
-            if temp > 90:
-                analysis["critical_issues"].append(f"{name}: Critical temperature ({temp}°C)")
-            elif temp > 80:
-                analysis["warnings"].append(f"{name}: High temperature ({temp}°C)")
-            
-            # Vibration analysis
-            if vib > 40:
-                analysis["critical_issues"].append(f"{name}: Excessive vibration ({vib} mm/s)")
-            elif vib > 30:
-                analysis["warnings"].append(f"{name}: Elevated vibration ({vib} mm/s)")
-            
-            # Pressure analysis
-            if pressure > 10:
-                analysis["critical_issues"].append(f"{name}: Over-pressure ({pressure} bar)")
-            elif pressure > 8.5:
-                analysis["warnings"].append(f"{name}: High pressure ({pressure} bar)")
-            
-            # Status-based analysis
-            if status == 'critical':
-                analysis["critical_issues"].append(f"{name}: System reports critical status")
-            elif status == 'warning':
-                analysis["warnings"].append(f"{name}: System reports warning status")
-        
-        # Generate recommendations
-        if analysis["critical_issues"]:
-            analysis["recommendations"].extend([
-                "Immediate shutdown of critical machines recommended",
-                "Perform emergency maintenance on flagged equipment",
-                "Check cooling systems and fluid levels"
-            ])
-        
-        if analysis["warnings"]:
-            analysis["recommendations"].extend([
-                "Schedule preventive maintenance within 24-48 hours",
-                "Monitor trending parameters closely",
-                "Verify sensor calibration"
-            ])
-        
-        # Overall health assessment
-        if analysis["critical_issues"]:
-            analysis["overall_health"] = "Critical"
-        elif len(analysis["warnings"]) > 2:
-            analysis["overall_health"] = "Poor"
-        elif analysis["warnings"]:
-            analysis["overall_health"] = "Fair"
-        
+        """Local analysis without API calls (vectorized over the whole fleet)"""
+        analysis = evaluate_fleet(FleetSnapshot.from_records(factory_data))
+        self.anomaly_detector.update_records(factory_data)
+        analysis['anomalies'] = self.anomaly_detector.anomalies([machine_id(machine) for machine in factory_data])
         return analysis
     
     def generate_factory_data(self):
@@ -130,6 +159,11 @@ class LocalAIAgent:
             for warning in analysis['warnings']:
                 report += f"⚠️  {warning}\n"
         
+        if analysis.get('anomalies'):
+            report += f"\n📉 STATISTICAL ANOMALIES ({len(analysis['anomalies'])})\n"
+            report += "─" * 40 + "\n"
+            report += format_anomalies(analysis['anomalies']) + "\n"
+        
         if analysis['recommendations']:
             report += f"\n💡 RECOMMENDATIONS\n"
             report += "─" * 40 + "\n"
@@ -147,83 +181,14 @@ class LocalAIAgent:
     
     def handle_general_query(self, query):
         """Handle general industrial AI questions"""
-        keywords_responses = {
-            "predictive maintenance": """
-🔮 PREDICTIVE MAINTENANCE OVERVIEW
-
-Key Components:
-• Sensor Integration: Temperature, vibration, pressure, current
-• Data Analytics: Trend analysis and anomaly detection  
-• Machine Learning: Failure prediction models
-• Alert Systems: Early warning notifications
-
-Benefits:
-• Reduced unplanned downtime (up to 50%)
-• Lower maintenance costs (10-40% savings)
-• Extended equipment life
-• Improved safety and reliability
-
-Implementation Steps:
-1. Install condition monitoring sensors
-2. Establish data collection infrastructure
-3. Develop baseline performance metrics
-4. Train predictive models
-5. Deploy alert and response systems
-""",
-            "iot": """
-🌐 IoT IN INDUSTRIAL SETTINGS
-
-Core Technologies:
-• Wireless Sensors: LoRaWAN, WiFi, Cellular
-• Edge Computing: Local data processing
-• Cloud Platforms: Azure IoT, AWS IoT, Google Cloud IoT
-• Communication Protocols: MQTT, OPC-UA, Modbus
-
-Applications:
-• Asset tracking and monitoring
-• Environmental condition monitoring
-• Energy management and optimization
-• Supply chain visibility
-• Quality control automation
-
-Security Considerations:
-• Network segmentation
-• Encrypted communications
-• Device authentication
-• Regular security updates
-""",
-            "digital twin": """
-🔄 DIGITAL TWIN TECHNOLOGY
-
-Definition: Virtual replica of physical assets/processes
-
-Components:
-• Real-time data synchronization
-• Physics-based modeling
-• Simulation capabilities
-• Predictive analytics
-• Visualization interfaces
-
-Use Cases:
-• Process optimization
-• Design validation
-• Predictive maintenance
-• Training simulations
-• What-if scenario analysis
-
-Technologies:
-• 3D modeling and CAD integration
-• Real-time data streaming
-• Machine learning algorithms
-• Cloud computing platforms
-• AR/VR visualization
-"""
-        }
         
-        query_lower = query.lower()
-        for keyword, response in keywords_responses.items():
-            if keyword in query_lower:
-                return response
+        hits = search_knowledge(query, k=3)
+        if hits:
+            return f"\n📚 FROM THE MAINTENANCE KNOWLEDGE BASE\n\n{format_passages(hits)}\n"
+        
+        topic = general_query_intents.match(query)
+        if topic:
+            return GENERAL_QUERY_RESPONSES[topic]
         
         # Default response for unmatched queries
         return """
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+LSTM Memory Agent - Bounded telemetry memory for predictive maintenance
+Keeps a fixed-size NumPy ring buffer per machine and metric, and derives
+trends, forecasts and anomaly scores from vectorized window statistics
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from fleet_rules import (
+    TEMPERATURE_WARNING, TEMPERATURE_CRITICAL, VIBRATION_WARNING, VIBRATION_CRITICAL,
+    PRESSURE_WARNING, PRESSURE_CRITICAL
+)
+
+# TelemetryData fields tracked for every machine
+METRICS = ('temperature', 'motorSpeed', 'pressure', 'vibration', 'load', 'humidity', 'oilLevel', 'noiseLevel')
+
+# metric -> (warning limit, critical limit, direction); direction -1 means low readings are bad
+METRIC_LIMITS = {
+    'temperature': (TEMPERATURE_WARNING, TEMPERATURE_CRITICAL, 1),
+    'vibration': (VIBRATION_WARNING, VIBRATION_CRITICAL, 1),
+    'pressure': (PRESSURE_WARNING, PRESSURE_CRITICAL, 1),
+    'load': (85, 90, 1),
+    'oilLevel': (30, 20, -1),
+    'noiseLevel': (100, 110, 1)
+}
+
+MAINTENANCE_ACTIONS = {
+    'temperature': "Inspect cooling system, fans and heat exchangers",
+    'vibration': "Run vibration analysis and check bearings, alignment and balance",
+    'pressure': "Check hydraulic seals, valves and relief settings",
+    'load': "Reduce load and verify drive and motor sizing",
+    'oilLevel': "Top up lubricant and inspect for leaks",
+    'noiseLevel': "Inspect gearbox and moving parts for wear",
+    'motorSpeed': "Check motor drive and speed controller",
+    'humidity': "Check enclosure sealing and ventilation"
+}
+
+RISK_ORDER = ['low', 'medium', 'high', 'critical']
+
+
+class LSTMMemoryAgent:
+    """Fixed-capacity telemetry memory.
+
+    Every machine gets one row of a (machines x metrics x capacity) array used
+    as a ring buffer, so appends are O(1) and memory never grows past
+    ``max_machines * len(METRICS) * capacity`` readings. When ``max_machines``
+    is reached the least recently updated machine's row is reused.
+    """
+
+    def __init__(self, capacity=256, prediction_horizon=24, min_samples=8, max_machines=10000, initial_machines=32):
+        self.capacity = capacity
+        self.prediction_horizon = prediction_horizon
+        self.min_samples = min_samples
+        self.max_machines = max_machines
+        self.total_data_points = 0
+
+        self._lock = threading.Lock()
+        self._rows = {}  # machine id -> buffer row
+        self._ids = []
+        rows = min(initial_machines, max_machines)
+        self._buffer = np.full((rows, len(METRICS), capacity), np.nan)
+        self._positions = np.zeros(rows, dtype=np.int64)  # next slot to write per machine
+        self._counts = np.zeros(rows, dtype=np.int64)     # readings held per machine
+        self._last_update = np.zeros(rows)
+
+    def add_telemetry_data(self, machine_data):
+        """Append one reading per machine (a repeated machine in one batch keeps its last reading)"""
+        if not machine_data:
+            return
+
+        with self._lock:
+            latest = {}
+            for machine in machine_data:
+                latest[self._machine_id(machine)] = machine
+
+            rows = np.array([self._row_for(machine_id) for machine_id in latest], dtype=np.int64)
+            values = np.array([self._metric_values(machine) for machine in latest.values()], dtype=np.float64)
+
+            slots = self._positions[rows]
+            self._buffer[rows[:, None], np.arange(len(METRICS))[None, :], slots[:, None]] = values
+            self._positions[rows] = (slots + 1) % self.capacity
+            self._counts[rows] = np.minimum(self._counts[rows] + 1, self.capacity)
+            self._last_update[rows] = time.time()
+            self.total_data_points += len(rows)
+
+    def window_statistics(self, machine_ids=None, window=None):
+        """Vectorized per-machine, per-metric statistics over the most recent ``window`` readings"""
+        with self._lock:
+            if machine_ids is None:
+                rows = np.arange(len(self._ids), dtype=np.int64)
+            else:
+                rows = np.array([self._rows[m] for m in machine_ids if m in self._rows], dtype=np.int64)
+            ids = [self._ids[r] for r in rows]
+            windows = self._windows(rows, window or self.capacity)
+
+        valid = ~np.isnan(windows)
+        samples = valid.sum(axis=2)
+        steps = np.arange(windows.shape[2], dtype=np.float64)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            x = np.where(valid, steps, 0.0)
+            y = np.where(valid, windows, 0.0)
+            sum_x, sum_y = x.sum(axis=2), y.sum(axis=2)
+            sum_xy, sum_xx = (x * y).sum(axis=2), (x * x).sum(axis=2)
+
+            mean = np.where(samples > 0, sum_y / samples, np.nan)
+            deviations = np.where(valid, windows - mean[:, :, None], 0.0)
+            std = np.where(samples > 0, np.sqrt((deviations ** 2).sum(axis=2) / samples), np.nan)
+
+            # Least-squares slope per series, ignoring empty slots
+            denominator = samples * sum_xx - sum_x ** 2
+            slope = np.where(denominator > 0, (samples * sum_xy - sum_x * sum_y) / denominator, 0.0)
+            intercept = np.where(samples > 0, (sum_y - slope * sum_x) / samples, np.nan)
+
+        # Most recent non-empty reading per series
+        last_index = np.where(valid.any(axis=2), windows.shape[2] - 1 - np.argmax(valid[:, :, ::-1], axis=2), 0)
+        latest = np.take_along_axis(windows, last_index[:, :, None], axis=2)[:, :, 0]
+
+        return {
+            'machine_ids': ids,
+            'metrics': list(METRICS),
+            'samples': samples,
+            'mean': mean,
+            'std': std,
+            'latest': latest,
+            'slope': slope,
+            'intercept': intercept,
+            'window': windows.shape[2]
+        }
+
+    def get_maintenance_recommendations(self, machine_data):
+        """Risk level, forecasts, anomalies and actions for each machine in ``machine_data``"""
+        machine_ids = [self._machine_id(machine) for machine in machine_data]
+        stats = self.window_statistics(machine_ids)
+        row_of = {machine_id: i for i, machine_id in enumerate(stats['machine_ids'])}
+
+        horizon = np.arange(1, self.prediction_horizon + 1, dtype=np.float64)
+        window = stats['window']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            forecasts = stats['intercept'][:, :, None] + stats['slope'][:, :, None] * (window - 1 + horizon)[None, None, :]
+            z_scores = np.where(stats['std'] > 0, (stats['latest'] - stats['mean']) / stats['std'], 0.0)
+
+        recommendations = []
+        for machine, machine_id in zip(machine_data, machine_ids):
+            i = row_of.get(machine_id)
+            current = self._metric_values(machine)
+            actions, predictions, anomalies = [], {}, {}
+            risk = 'low'
+
+            for m, metric in enumerate(METRICS):
+                value = current[m]
+                enough_history = i is not None and stats['samples'][i, m] >= self.min_samples
+                limits = METRIC_LIMITS.get(metric)
+
+                if enough_history:
+                    forecast = forecasts[i, m]
+                    predictions[metric] = [round(float(v), 2) for v in forecast]
+                    z = float(z_scores[i, m])
+                    if abs(z) >= 2:
+                        anomalies[metric] = {'severity': 'high' if abs(z) >= 3 else 'medium', 'score': round(abs(z), 2)}
+
+                if limits and not np.isnan(value):
+                    warning, critical, direction = limits
+                    if direction * (value - critical) > 0:
+                        risk = self._raise(risk, 'critical')
+                        actions.append({'action': MAINTENANCE_ACTIONS[metric], 'priority': 'critical',
+                                        'reason': f"{metric} at {value:g} is past the critical limit of {critical:g}"})
+                        continue
+                    if direction * (value - warning) > 0:
+                        risk = self._raise(risk, 'high')
+                        actions.append({'action': MAINTENANCE_ACTIONS[metric], 'priority': 'high',
+                                        'reason': f"{metric} at {value:g} is past the warning limit of {warning:g}"})
+                        continue
+                    if enough_history and np.any(direction * (forecasts[i, m] - critical) > 0):
+                        steps = int(np.argmax(direction * (forecasts[i, m] - critical) > 0)) + 1
+                        risk = self._raise(risk, 'high')
+                        actions.append({'action': MAINTENANCE_ACTIONS[metric], 'priority': 'high',
+                                        'reason': f"{metric} trend reaches the critical limit of {critical:g} in ~{steps} readings"})
+                        continue
+
+                if metric in anomalies:
+                    risk = self._raise(risk, 'medium')
+                    actions.append({'action': MAINTENANCE_ACTIONS[metric], 'priority': 'medium',
+                                    'reason': f"{metric} deviates {anomalies[metric]['score']} standard deviations from recent behaviour"})
+
+            status = machine.get('status', 'normal')
+            if status == 'critical':
+                risk = self._raise(risk, 'critical')
+            elif status == 'warning':
+                risk = self._raise(risk, 'medium')
+
+            recommendations.append({
+                'machine_id': machine_id,
+                'machine_name': machine.get('name', machine_id),
+                'current_status': status,
+                'risk_level': risk,
+                'predictions': predictions,
+                'anomalies': anomalies,
+                'maintenance_actions': sorted(actions, key=lambda a: RISK_ORDER.index(a['priority']), reverse=True)
+            })
+
+        return recommendations
+
+    def get_memory_insights(self):
+        """Summary of what the memory holds"""
+        with self._lock:
+            machines = len(self._ids)
+            counts = self._counts[:machines]
+            trained = int(np.count_nonzero(
+                (~np.isnan(self._buffer[:machines])).sum(axis=2) >= self.min_samples
+            )) if machines else 0
+            return {
+                'total_data_points': self.total_data_points,
+                'parameters_tracked': len(METRICS),
+                'machines_monitored': machines,
+                'models_trained': trained,
+                'memory_utilization': {
+                    'capacity_per_series': self.capacity,
+                    'readings_stored': int(counts.sum()) * len(METRICS),
+                    'fill_ratio': round(float(counts.mean()) / self.capacity, 4) if machines else 0.0,
+                    'buffer_bytes': int(self._buffer.nbytes),
+                    'max_machines': self.max_machines
+                }
+            }
+
+    def _machine_id(self, machine):
+        """Stable identifier for a machine record"""
+        return str(machine.get('id') or machine.get('name'))
+
+    def _metric_values(self, machine):
+        """Metric readings in METRICS order, NaN where missing"""
+        telemetry = machine.get('telemetry', machine)
+        values = []
+        for metric in METRICS:
+            value = telemetry.get(metric)
+            values.append(float(value) if isinstance(value, (int, float)) else np.nan)
+        return values
+
+    def _row_for(self, machine_id):
+        """Buffer row for a machine, allocating or recycling one if needed (caller holds the lock)"""
+        row = self._rows.get(machine_id)
+        if row is not None:
+            return row
+
+        if len(self._ids) < self.max_machines:
+            row = len(self._ids)
+            if row >= len(self._positions):
+                self._grow(min(len(self._positions) * 2, self.max_machines))
+            self._ids.append(machine_id)
+        else:
+            # Full: recycle the least recently updated machine's row
+            row = int(np.argmin(self._last_update[:len(self._ids)]))
+            del self._rows[self._ids[row]]
+            self._ids[row] = machine_id
+            self._buffer[row] = np.nan
+            self._positions[row] = 0
+            self._counts[row] = 0
+
+        self._rows[machine_id] = row
+        return row
+
+    def _grow(self, rows):
+        """Enlarge the machine dimension (amortized O(1) per new machine)"""
+        extra = rows - len(self._positions)
+        self._buffer = np.concatenate([self._buffer, np.full((extra, len(METRICS), self.capacity), np.nan)])
+        self._positions = np.concatenate([self._positions, np.zeros(extra, dtype=np.int64)])
+        self._counts = np.concatenate([self._counts, np.zeros(extra, dtype=np.int64)])
+        self._last_update = np.concatenate([self._last_update, np.zeros(extra)])
+
+    def _windows(self, rows, window):
+        """Oldest-to-newest copy of the last ``window`` slots for each row (caller holds the lock)"""
+        window = min(window, self.capacity)
+        slots = (self._positions[rows][:, None] - window + np.arange(window)[None, :]) % self.capacity
+        return self._buffer[rows[:, None, None], np.arange(len(METRICS))[None, :, None], slots[:, None, :]]
+
+    @staticmethod
+    def _raise(current, level):
+        """Keep the more severe of two risk levels"""
+        return level if RISK_ORDER.index(level) > RISK_ORDER.index(current) else current
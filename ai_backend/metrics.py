@@ -0,0 +1,388 @@
+"""
+Metrics - Prometheus text-format counters and histograms for the backends
+Recording is a label-tuple lookup and an add under a per-metric lock; the text
+exposition is only built when /metrics is scraped.
+Requests also collect per-stage spans, reported as a Server-Timing header.
+"""
+
+import bisect
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds - spans cache hits (ms) through slow local completions (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+NO_PROVIDER = 'none'  # Label for requests answered without a provider call (cache, fallback, errors)
+
+# Ask for a JSON trace block with ?trace=1 or an "X-Trace: 1" header
+TRACE_HEADER = 'X-Trace'
+TRACE_PARAM = 'trace'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic counter with fixed label names"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        """Add ``amount`` to the series for ``labels``"""
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        """Exposition lines for every series"""
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {value}' for key, value in values]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with fixed label names"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        """Record one observation for ``labels``"""
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)  # Outside the lock
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        """Exposition lines for every series (buckets, sum and count)"""
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+REGISTRY = []
+
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+REQUESTS = _register(Counter(
+    'llm_requests_total', 'HTTP requests served',
+    ('route', 'provider', 'model', 'status')
+))
+REQUEST_SECONDS = _register(Histogram(
+    'llm_request_duration_seconds', 'Time to serve a request, to the end of the stream for streamed responses',
+    ('route', 'provider', 'model')
+))
+FIRST_TOKEN_SECONDS = _register(Histogram(
+    'llm_time_to_first_token_seconds', 'Time from request start to the first streamed token',
+    ('route', 'provider', 'model')
+))
+UPSTREAM_SECONDS = _register(Histogram(
+    'llm_upstream_duration_seconds', 'Provider call latency (for streams, until the stream starts)',
+    ('route', 'provider', 'model', 'outcome')
+))
+TOKENS = _register(Counter(
+    'llm_tokens_total', 'Tokens reported by providers',
+    ('route', 'provider', 'model', 'kind')
+))
+CACHE_LOOKUPS = _register(Counter(
+    'llm_cache_lookups_total', 'Response cache outcomes (X-Cache header)',
+    ('route', 'result')
+))
+FALLBACKS = _register(Counter(
+    'llm_fallbacks_total', 'Requests answered by the offline fallback',
+    ('route', 'reason')
+))
+RATE_LIMITED = _register(Counter(
+    'llm_rate_limited_total', 'Provider 429 responses and calls refused by the client-side rate limiter',
+    ('route', 'provider', 'model', 'source')
+))
+
+
+def render():
+    """Prometheus text exposition of every registered metric"""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """Timing and labels for one HTTP request, finished exactly once"""
+
+    __slots__ = ('route', 'started', 'provider', 'model', 'first_token_seen', 'finished', 'spans')
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.provider = NO_PROVIDER
+        self.model = NO_PROVIDER
+        self.first_token_seen = False
+        self.finished = False
+        self.spans = []  # (stage, seconds), appended from any thread serving the request
+
+    def stage_totals(self):
+        """Seconds per stage, in the order stages first ran (repeated stages are summed)"""
+        totals = {}
+        for name, seconds in list(self.spans):
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def server_timing(self):
+        """``Server-Timing`` header value: each stage and the total so far, in milliseconds"""
+        entries = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.stage_totals().items()]
+        entries.append(f'total;dur={(time.perf_counter() - self.started) * 1000:.1f}')
+        return ', '.join(entries)
+
+    def trace(self):
+        """Trace block for a JSON response body"""
+        return {
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'spans': [{'name': name, 'ms': round(seconds * 1000, 2)} for name, seconds in self.stage_totals().items()]
+        }
+
+    def note(self, provider, model):
+        """Label the request with the provider and model that answered it"""
+        self.provider = provider
+        self.model = model
+
+    def first_token(self):
+        """Record time to first token (only the first call counts)"""
+        if self.first_token_seen:
+            return
+        self.first_token_seen = True
+        FIRST_TOKEN_SECONDS.observe(time.perf_counter() - self.started,
+                                    route=self.route, provider=self.provider, model=self.model)
+
+    def finish(self, status, cache=None):
+        """Count the request and record its duration"""
+        if self.finished:
+            return
+        self.finished = True
+        labels = {'route': self.route, 'provider': self.provider, 'model': self.model}
+        REQUESTS.inc(status=str(status), **labels)
+        REQUEST_SECONDS.observe(time.perf_counter() - self.started, **labels)
+        if cache:
+            CACHE_LOOKUPS.inc(route=self.route, result=cache.lower())
+
+
+# Request being served in this thread / task; copied into helper threads with contextvars
+_current = contextvars.ContextVar('metrics_request', default=None)
+
+
+def begin(route):
+    """Start timing a request and make it current"""
+    req = RequestMetrics(route)
+    _current.set(req)
+    return req
+
+
+def adopt(req):
+    """Make ``req`` current in a worker thread serving part of it"""
+    _current.set(req)
+
+
+def current():
+    """Request being served, or None outside a request"""
+    return _current.get()
+
+
+def current_route():
+    req = _current.get()
+    return req.route if req else 'background'
+
+
+@contextmanager
+def span(name):
+    """Time one stage of the current request (no-op outside a request)"""
+    req = _current.get()
+    if req is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        req.spans.append((name, time.perf_counter() - started))
+
+
+def trace_requested(headers, params):
+    """Whether the client asked for a JSON trace block"""
+    value = headers.get(TRACE_HEADER) or params.get(TRACE_PARAM) or ''
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def with_trace(body, req):
+    """JSON ``body`` (bytes) with a ``trace`` block added; unchanged if it is not a JSON object"""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    if not isinstance(data, dict):
+        return body
+    data['trace'] = req.trace()
+    return json.dumps(data).encode('utf-8')
+
+
+def note(provider, model):
+    """Label the current request with the provider and model that answered it"""
+    req = _current.get()
+    if req:
+        req.note(provider, model)
+
+
+def record_upstream(provider, model, seconds, outcome='ok', prompt_tokens=None, completion_tokens=None):
+    """Record one provider call; a successful call also labels the current request"""
+    UPSTREAM_SECONDS.observe(seconds, route=current_route(), provider=provider, model=model, outcome=outcome)
+    record_tokens(provider, model, prompt_tokens, completion_tokens)
+    if outcome == 'ok':
+        note(provider, model)
+
+
+def record_tokens(provider, model, prompt_tokens=None, completion_tokens=None):
+    """Count tokens a provider reported for one call"""
+    route = current_route()
+    if prompt_tokens:
+        TOKENS.inc(prompt_tokens, route=route, provider=provider, model=model, kind='prompt')
+    if completion_tokens:
+        TOKENS.inc(completion_tokens, route=route, provider=provider, model=model, kind='completion')
+
+
+def record_rate_limit(provider, model, source='provider'):
+    """Count a 429 from the provider (``source='provider'``) or a client-side refusal (``'client'``)"""
+    RATE_LIMITED.inc(route=current_route(), provider=provider, model=model, source=source)
+
+
+def count_fallback(reason):
+    """Count a request answered by the offline fallback"""
+    FALLBACKS.inc(route=current_route(), reason=reason)
+
+
+def instrument_flask(app):
+    """Time every Flask request, add Server-Timing headers and serve ``/metrics``"""
+    from flask import Response, request
+    from flask.json.provider import DefaultJSONProvider
+
+    class TimedJSONProvider(DefaultJSONProvider):
+        """Records jsonify() as the request's ``serialize`` stage"""
+
+        def response(self, *args, **kwargs):
+            with span('serialize'):
+                return super().response(*args, **kwargs)
+
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _begin_request_metrics():
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        if rule != '/metrics':
+            begin(rule)
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        req = _current.get()
+        if req is None or request.path == '/metrics':
+            return response
+        cache = response.headers.get('X-Cache')
+        # Streams only report the stages before their first byte
+        response.headers['Server-Timing'] = req.server_timing()
+        response.headers['Timing-Allow-Origin'] = '*'
+        if response.is_json and not response.is_streamed and trace_requested(request.headers, request.args):
+            response.set_data(with_trace(response.get_data(), req))
+        if response.is_streamed:
+            # Finish when the last chunk has gone out, not when the view returns
+            response.call_on_close(lambda: req.finish(response.status_code, cache))
+        else:
+            req.finish(response.status_code, cache)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        """Prometheus scrape endpoint"""
+        return Response(render(), content_type=CONTENT_TYPE)
+
+    return app
+
+
+def instrument_asgi(endpoint, route):
+    """Wrap a Starlette endpoint so it is timed like the Flask routes"""
+    async def instrumented(request):
+        req = begin(route)
+        try:
+            response = await endpoint(request)
+        except Exception:
+            req.finish(500)
+            raise
+
+        cache = response.headers.get('x-cache')
+        response.headers['Server-Timing'] = req.server_timing()
+        response.headers['Timing-Allow-Origin'] = '*'
+        body = getattr(response, 'body_iterator', None)
+        if body is None and response.media_type == 'application/json' and trace_requested(request.headers, request.query_params):
+            response.body = with_trace(response.body, req)
+            response.headers['content-length'] = str(len(response.body))
+        if body is None:
+            req.finish(response.status_code, cache)
+            return response
+
+        async def finish_after(chunks):
+            try:
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                req.finish(response.status_code, cache)
+
+        response.body_iterator = finish_after(body)
+        return response
+
+    instrumented.__name__ = endpoint.__name__
+    instrumented.__doc__ = endpoint.__doc__
+    return instrumented
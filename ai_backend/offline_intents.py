@@ -0,0 +1,105 @@
+"""
+Offline Intents - Precompiled keyword matcher for the offline fallback answers
+Every topic phrase and synonym is folded into one trie-shaped regex when the
+matcher is built, so picking a topic is a single pass over the query however
+many topics there are, instead of an ``in`` scan per topic
+"""
+
+import re
+
+# Topic answers shared by the backends' offline fallbacks, in priority order
+MAINTENANCE_TOPICS = {
+    "predictive maintenance": "Predictive maintenance uses sensors and data analytics to predict equipment failures before they occur, reducing downtime by up to 50%.",
+    "vibration analysis": "Vibration analysis detects mechanical problems like misalignment, imbalance, and bearing wear through frequency domain analysis.",
+    "temperature monitoring": "Temperature monitoring helps identify overheating conditions that can lead to equipment failure and safety hazards.",
+    "pressure": "Pressure monitoring is critical for hydraulic and pneumatic systems to prevent over-pressure conditions and seal failures.",
+    "safety": "Industrial safety requires following LOTO procedures, using proper PPE, and adhering to OSHA regulations.",
+    "maintenance": "Preventive maintenance scheduling based on manufacturer recommendations and operating conditions extends equipment life."
+}
+
+MAINTENANCE_SYNONYMS = {
+    "predictive maintenance": ["condition based maintenance", "condition monitoring", "failure prediction", "predict failures"],
+    "vibration analysis": ["vibration", "vibrations", "vibrating", "imbalance", "misalignment", "bearing wear"],
+    "temperature monitoring": ["temperature", "overheating", "overheat", "hot", "thermal", "thermography"],
+    "pressure": ["hydraulic", "pneumatic", "psi", "bar", "over-pressure", "seal failure"],
+    "safety": ["loto", "lockout", "tagout", "ppe", "osha", "hazard", "hazards"],
+    "maintenance": ["preventive maintenance", "repair", "service", "servicing", "lubrication", "inspection"]
+}
+
+
+def normalize_phrase(text):
+    """Lowercase with runs of whitespace collapsed, the form phrases are stored in"""
+    return ' '.join(text.lower().split())
+
+
+class IntentMatcher:
+    """Picks the topic a query is about.
+
+    ``topics`` is an ordered mapping (or list) of topic names; each name is
+    also matched as a phrase. ``synonyms`` maps a topic to extra phrases.
+    Phrases match whole words only, case-insensitively, with any whitespace
+    between their words. Where phrases overlap the longest one wins, and each
+    match scores its word count - a topic named by "bearing wear" outranks one
+    named by "bearing". Ties go to the topic listed first.
+    """
+
+    def __init__(self, topics, synonyms=None):
+        self.topics = list(topics)
+        self._priority = {topic: i for i, topic in enumerate(self.topics)}
+        self._phrase_topic = {}
+        for topic in self.topics:
+            for phrase in [topic] + list((synonyms or {}).get(topic, [])):
+                phrase = normalize_phrase(phrase)
+                if phrase:
+                    self._phrase_topic.setdefault(phrase, topic)  # First topic keeps a shared phrase
+        self._weights = {phrase: len(phrase.split()) for phrase in self._phrase_topic}
+        self.pattern = re.compile(
+            r'(?<!\w)' + _trie_pattern(self._phrase_topic) + r'(?!\w)', re.IGNORECASE
+        ) if self._phrase_topic else None
+
+    def scores(self, text):
+        """Score per matched topic"""
+        scores = {}
+        if self.pattern is None or not text:
+            return scores
+        for match in self.pattern.finditer(text):
+            phrase = normalize_phrase(match.group())
+            topic = self._phrase_topic[phrase]
+            scores[topic] = scores.get(topic, 0) + self._weights[phrase]
+        return scores
+
+    def match(self, text):
+        """Best topic for ``text``, or None when no phrase occurs in it"""
+        scores = self.scores(text)
+        if not scores:
+            return None
+        return max(scores, key=lambda topic: (scores[topic], -self._priority[topic]))
+
+
+def _trie_pattern(phrases):
+    """One regex alternation for all ``phrases``, factored by shared prefixes"""
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = {}  # End of a phrase
+    return _node_pattern(trie)
+
+
+def _node_pattern(node):
+    branches = [
+        (r'\s+' if char == ' ' else re.escape(char)) + _node_pattern(child)
+        for char, child in sorted(node.items()) if char
+    ]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        # A phrase may end here; the greedy ? still prefers the longer phrases below
+        pattern = '(?:' + pattern + ')?'
+    return pattern
+
+
+# Shared by the backends' offline fallbacks; compiled once at import
+maintenance_intents = IntentMatcher(MAINTENANCE_TOPICS, MAINTENANCE_SYNONYMS)
@@ -4,9 +4,18 @@ from openai import OpenAI
 import json
 import random
 import re
+import metrics
+from offline_intents import MAINTENANCE_TOPICS, maintenance_intents
+from knowledge_index import search_knowledge, format_passages
+from provider_health import ProviderHealthMonitor
+from telemetry_encoder import encode_telemetry
+from single_flight import SingleFlight
+from rate_limiter import ProviderRateLimiter, RateLimitWait, limited_completion
+from response_cache import make_cache_key
 
 app = Flask(__name__)
 CORS(app)
+metrics.instrument_flask(app)  # Request timing and the /metrics scrape endpoint
 
 # Initialize OpenRouter client
 openrouter_client = OpenAI(
@@ -14,32 +23,47 @@ openrouter_client = OpenAI(
     base_url="https://openrouter.ai/api/v1"
 )
 
-# Global state for API availability
-api_available = True
-rate_limit_info = None
+# API availability is tracked in the background; handlers only read it
+health_monitor = ProviderHealthMonitor()
+
+# Identical concurrent completions share one upstream call
+single_flight = SingleFlight()
+
+# Client-side request and token budget, synced from rate-limit headers and 429s
+rate_limiter = ProviderRateLimiter('openrouter', requests_per_minute=60, max_wait=30.0)
 
 def test_api_availability():
-    """Test if OpenRouter API is available"""
-    global api_available, rate_limit_info
+    """Probe OpenRouter API with a minimal completion (run by the health monitor, raises on failure)"""
+    openrouter_client.chat.completions.create(
+        model="openai/gpt-4o-mini",
+        messages=[{"role": "user", "content": "test"}],
+        max_tokens=5,
+        temperature=0.1
+    )
+    return True
+
+def create_completion(**kwargs):
+    """Call OpenRouter and report the outcome to the health monitor.
+
+    Identical concurrent requests share one upstream completion.
+    """
+    params = {k: v for k, v in kwargs.items() if k not in ('model', 'messages')}
+    key = make_cache_key(kwargs.get('messages'), kwargs.get('model'), 'openrouter', **params)
+    return single_flight.do(key, lambda: _create_completion(**kwargs))
+
+def _create_completion(**kwargs):
+    """Single upstream call"""
     try:
-        completion = openrouter_client.chat.completions.create(
-            model="openai/gpt-4o-mini",
-            messages=[{"role": "user", "content": "test"}],
-            max_tokens=5,
-            temperature=0.1
-        )
-        api_available = True
-        rate_limit_info = None
-        return True
+        completion = limited_completion(rate_limiter, openrouter_client.chat.completions.with_raw_response.create, **kwargs)
+    except RateLimitWait:
+        health_monitor.release('openrouter')  # Our own budget, not a provider failure
+        raise
     except Exception as e:
-        error_str = str(e)
-        if "rate_limit" in error_str.lower() or "429" in error_str:
-            api_available = False
-            # Extract rate limit info
-            rate_limit_info = extract_rate_limit_info(error_str)
-            return False
-        api_available = False
-        return False
+        health_monitor.mark_failure('openrouter', e)
+        raise
+
+    health_monitor.mark_success('openrouter')
+    return completion
 
 def extract_rate_limit_info(error_str):
     """Extract rate limit information from error message"""
@@ -52,6 +76,9 @@ def extract_rate_limit_info(error_str):
     
     return info
 
+health_monitor.register('openrouter', test_api_availability, interval=60.0, retry_interval=15.0,
+                        rate_limit_parser=extract_rate_limit_info)
+
 def generate_offline_response(query, context_type="general"):
     """Generate offline responses when API is unavailable"""
     
@@ -88,20 +115,15 @@ def generate_offline_response(query, context_type="general"):
 *Note: This is offline analysis. For detailed AI insights, please check your OpenRouter credits.*
 """
     
-    # General query responses
-    topics = {
-        "predictive maintenance": "Predictive maintenance uses sensors and data analytics to predict equipment failures before they occur, reducing downtime by up to 50%.",
-        "vibration analysis": "Vibration analysis detects mechanical problems like misalignment, imbalance, and bearing wear through frequency domain analysis.",
-        "temperature monitoring": "Temperature monitoring helps identify overheating conditions that can lead to equipment failure and safety hazards.",
-        "pressure": "Pressure monitoring is critical for hydraulic and pneumatic systems to prevent over-pressure conditions and seal failures.",
-        "safety": "Industrial safety requires following LOTO procedures, using proper PPE, and adhering to OSHA regulations.",
-        "maintenance": "Preventive maintenance scheduling based on manufacturer recommendations and operating conditions extends equipment life."
-    }
+    # Passages from the local knowledge base when one is built
+    hits = search_knowledge(query)
+    if hits:
+        return f"🔄 **OFFLINE MODE** - from the maintenance knowledge base:\n\n{format_passages(hits)}\n\n*For detailed AI analysis, please check your OpenRouter credits.*"
     
-    query_lower = query.lower()
-    for topic, response in topics.items():
-        if topic in query_lower:
-            return f"🔄 **OFFLINE MODE**: {response}\n\n*For detailed AI analysis, please check your OpenRouter credits.*"
+    # General query responses
+    topic = maintenance_intents.match(query)
+    if topic:
+        return f"🔄 **OFFLINE MODE**: {MAINTENANCE_TOPICS[topic]}\n\n*For detailed AI analysis, please check your OpenRouter credits.*"
     
     return f"""🔄 **OFFLINE MODE ACTIVE**
 
@@ -129,21 +151,22 @@ def handle_query():
         if not query:
             return jsonify({'success': False, 'error': 'Query required'}), 400
         
-        # Test API availability first
-        if not test_api_availability():
+        # Fail fast to the offline response while the provider's circuit is open
+        if not health_monitor.allow_request('openrouter'):
             # Return offline response
+            metrics.count_fallback('unavailable')
             offline_response = generate_offline_response(query)
             return jsonify({
                 'success': True,
                 'response': offline_response,
                 'model_used': 'offline-mode',
                 'provider': 'Local Fallback',
-                'rate_limit_info': rate_limit_info,
+                'rate_limit_info': health_monitor.get_rate_limit_info('openrouter'),
                 'offline_mode': True
             })
         
         # Query OpenRouter with industrial engineering system prompt
-        completion = openrouter_client.chat.completions.create(
+        completion = create_completion(
             model="openai/gpt-4o-mini",
             messages=[
                 {
@@ -200,6 +223,7 @@ Provide technical, actionable guidance that maintenance technicians can follow s
         # Handle rate limits specifically
         if "rate_limit" in error_str.lower() or "429" in error_str:
             rate_info = extract_rate_limit_info(error_str)
+            metrics.count_fallback('rate_limit')
             offline_response = generate_offline_response(query)
             
             return jsonify({
@@ -228,9 +252,10 @@ def analyze_telemetry():
         if not machine_data:
             return jsonify({'success': False, 'error': 'Machine data required'}), 400
         
-        # Test API availability first
-        if not test_api_availability():
+        # Fail fast to the offline response while the provider's circuit is open
+        if not health_monitor.allow_request('openrouter'):
             # Return offline analysis
+            metrics.count_fallback('unavailable')
             offline_analysis = generate_offline_response("", "maintenance_analysis")
             return jsonify({
                 'success': True,
@@ -241,7 +266,7 @@ def analyze_telemetry():
                 },
                 'model_used': 'offline-mode',
                 'provider': 'Local Fallback',
-                'rate_limit_info': rate_limit_info,
+                'rate_limit_info': health_monitor.get_rate_limit_info('openrouter'),
                 'offline_mode': True
             })
         
@@ -249,7 +274,7 @@ def analyze_telemetry():
         analysis_prompt = f"""MAINTENANCE ANALYSIS REQUEST
 
 Machine Telemetry Data:
-{str(machine_data)[:2000]}
+{encode_telemetry(machine_data)['text']}
 
 As an Industrial Maintenance Engineer, provide:
 
@@ -282,7 +307,7 @@ As an Industrial Maintenance Engineer, provide:
 
 Provide actionable insights for the maintenance department."""
 
-        completion = openrouter_client.chat.completions.create(
+        completion = create_completion(
             model="openai/gpt-4o-mini",
             messages=[
                 {
@@ -315,6 +340,7 @@ Provide actionable insights for the maintenance department."""
         # Handle rate limits
         if "rate_limit" in error_str.lower() or "429" in error_str:
             rate_info = extract_rate_limit_info(error_str)
+            metrics.count_fallback('rate_limit')
             offline_analysis = generate_offline_response("", "maintenance_analysis")
             
             return jsonify({
@@ -335,7 +361,7 @@ Provide actionable insights for the maintenance department."""
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    api_working = test_api_availability()
+    api_working = health_monitor.is_available('openrouter')
     
     return jsonify({
         'status': 'healthy',
@@ -343,14 +369,16 @@ def health_check():
         'api_working': api_working,  # Separate field for API status
         'model_name': 'openai/gpt-4o-mini',
         'provider': 'OpenRouter',
-        'rate_limit_info': rate_limit_info if not api_working else None,
-        'offline_mode': not api_working
+        'rate_limit_info': health_monitor.get_rate_limit_info('openrouter') if not api_working else None,
+        'offline_mode': not api_working,
+        'single_flight': single_flight.stats(),
+        'rate_limiter': rate_limiter.stats()
     })
 
 @app.route('/api/model-status', methods=['GET'])
 def model_status():
     """Model status endpoint"""
-    api_working = test_api_availability()
+    api_working = health_monitor.is_available('openrouter')
     
     return jsonify({
         'success': True,
@@ -358,26 +386,27 @@ def model_status():
         'api_working': api_working,  # Separate field for API status
         'current_model': 'openai/gpt-4o-mini' if api_working else 'offline-mode',
         'provider': 'OpenRouter' if api_working else 'Local Fallback',
-        'rate_limit_info': rate_limit_info if not api_working else None,
+        'rate_limit_info': health_monitor.get_rate_limit_info('openrouter') if not api_working else None,
         'offline_mode': not api_working
     })
 
 @app.route('/api/retry-connection', methods=['POST'])
 def retry_connection():
-    """Endpoint to retry API connection"""
-    api_working = test_api_availability()
+    """Endpoint to retry API connection - forces an immediate probe"""
+    api_working = health_monitor.probe_now('openrouter')
     
     return jsonify({
         'success': True,
         'api_available': api_working,
         'message': 'API connection restored' if api_working else 'API still unavailable',
-        'rate_limit_info': rate_limit_info if not api_working else None
+        'rate_limit_info': health_monitor.get_rate_limit_info('openrouter') if not api_working else None
     })
 
 if __name__ == '__main__':
     print("🚀 OpenRouter Flask Backend starting on http://localhost:5000")
     print("🔧 CORS enabled for frontend communication")
     print("📡 Health endpoint: http://localhost:5000/api/health")
+    health_monitor.start()
     print("🌐 Using OpenRouter API with gpt-4o-mini model")
     try:
         app.run(host='127.0.0.1', port=5000, debug=True, use_reloader=False)
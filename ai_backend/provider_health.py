@@ -0,0 +1,273 @@
+"""
+Provider Health Monitor - Background availability tracking for LLM providers
+Probes each provider on its own schedule so request handlers only read state.
+Request outcomes feed a per-provider circuit breaker that decides availability.
+"""
+
+import re
+import threading
+import time
+from datetime import datetime
+
+from circuit_breaker import CLOSED, OPEN, CircuitBreaker, is_timeout_error
+
+
+def is_rate_limit_error(error_str):
+    """Check whether an error message describes a provider rate limit"""
+    return "rate_limit" in error_str.lower() or "429" in error_str
+
+
+def parse_wait_seconds(wait_time):
+    """Convert a provider wait hint like '7m12.5s' or '850ms' into seconds"""
+    if not wait_time:
+        return None
+
+    units = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+    total = 0.0
+    matched = False
+    for value, unit in re.findall(r'(\d+(?:\.\d+)?)\s*(ms|h|m|s)', wait_time):
+        total += float(value) * units[unit]
+        matched = True
+
+    return total if matched else None
+
+
+class ProviderHealthMonitor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._providers = {}
+        self._thread = None
+        self._running = False
+        self._listeners = []
+
+    def register(self, name, probe, interval=60.0, retry_interval=15.0, rate_limit_parser=None, breaker=None):
+        """Register a provider probe.
+
+        ``probe`` returns True when the provider is usable and either returns
+        False or raises when it is not. Healthy providers are re-probed every
+        ``interval`` seconds, failing ones every ``retry_interval`` seconds.
+        ``breaker`` defaults to a CircuitBreaker that stays open for
+        ``retry_interval`` seconds once tripped.
+        """
+        with self._lock:
+            self._providers[name] = {
+                'name': name,
+                'probe': probe,
+                'interval': interval,
+                'retry_interval': retry_interval,
+                'rate_limit_parser': rate_limit_parser,
+                'breaker': breaker or CircuitBreaker(open_seconds=retry_interval),
+                'next_probe_at': 0.0,
+                'announced': True,  # Availability listeners last heard about
+                'state': {
+                    'available': True,  # Optimistic until the first probe completes
+                    'circuit': 'closed',
+                    'checked_at': None,
+                    'changed_at': None,
+                    'source': None,
+                    'last_error': None,
+                    'rate_limited': False,
+                    'rate_limit_info': None,
+                    'consecutive_failures': 0
+                }
+            }
+        self._wakeup.set()
+
+    def start(self):
+        """Start the background probing thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="provider-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background probing thread"""
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def on_change(self, callback):
+        """Call ``callback(name, state)`` whenever a provider becomes available or unavailable.
+
+        Only committed transitions count: the circuit closing or opening. The
+        half-open state, where availability flips as each trial call is taken
+        and given back, is not announced.
+
+        Callbacks run while the monitor's lock is held, so they must be quick
+        and must not call back into the monitor.
+        """
+        self._listeners.append(callback)
+
+    def is_available(self, name):
+        """Read the last known availability without touching the network"""
+        with self._lock:
+            return self._sync(self._providers[name])
+
+    def allow_request(self, name):
+        """Admit one request to the provider; False while its circuit is open.
+
+        In the half-open state only one caller is admitted, as the trial. A
+        caller that gets True must report back with mark_success, mark_failure
+        or release.
+        """
+        with self._lock:
+            entry = self._providers[name]
+            allowed = entry['breaker'].allow()
+            self._sync(entry)
+            return allowed
+
+    def release(self, name):
+        """An admitted request ended without a verdict (e.g. cancelled or held back by our own rate limiter)"""
+        with self._lock:
+            entry = self._providers[name]
+            entry['breaker'].release()
+            self._sync(entry)
+
+    def get_state(self, name):
+        """Return a copy of the provider's timestamped state"""
+        with self._lock:
+            entry = self._providers[name]
+            self._sync(entry)
+            return dict(entry['state'], breaker=entry['breaker'].stats())
+
+    def get_rate_limit_info(self, name):
+        """Return the last parsed rate limit info, if the provider is limited"""
+        with self._lock:
+            return self._providers[name]['state']['rate_limit_info']
+
+    def snapshot(self):
+        """Return the state of every registered provider"""
+        with self._lock:
+            snapshot = {}
+            for name, entry in self._providers.items():
+                self._sync(entry)
+                snapshot[name] = dict(entry['state'], breaker=entry['breaker'].stats())
+            return snapshot
+
+    def mark_success(self, name, source="request"):
+        """Record a successful real call - closes the circuit and flips the provider back to available"""
+        with self._lock:
+            entry = self._providers[name]
+            entry['breaker'].record_success()
+            entry['state']['last_error'] = None
+            entry['state']['rate_limited'] = False
+            entry['state']['rate_limit_info'] = None
+            entry['state']['consecutive_failures'] = 0
+            self._update(entry, True, source)
+            entry['next_probe_at'] = time.monotonic() + entry['interval']
+
+    def mark_failure(self, name, error=None, source="request"):
+        """Record a failed call.
+
+        A failed probe or a rate limit opens the circuit immediately; failed
+        requests count toward the breaker's error and timeout rates.
+        """
+        error_str = str(error) if error is not None else None
+        with self._lock:
+            entry = self._providers[name]
+            breaker = entry['breaker']
+            state = entry['state']
+            state['last_error'] = error_str
+            state['consecutive_failures'] += 1
+
+            delay = entry['retry_interval']
+            if error_str and is_rate_limit_error(error_str):
+                parser = entry['rate_limit_parser']
+                info = parser(error_str) if parser else {}
+                state['rate_limited'] = True
+                state['rate_limit_info'] = info
+                # Don't spend quota probing before the provider said to retry
+                wait_seconds = parse_wait_seconds(info.get('wait_time'))
+                delay = max(wait_seconds or entry['interval'], entry['retry_interval'])
+                breaker.trip(delay)
+            else:
+                state['rate_limited'] = False
+                state['rate_limit_info'] = None
+                if source == 'probe':
+                    breaker.trip()
+                else:
+                    breaker.record_failure(timeout=is_timeout_error(error_str))
+
+            self._update(entry, breaker.available(), source)
+            entry['next_probe_at'] = time.monotonic() + delay
+        self._wakeup.set()
+
+    def probe_now(self, name):
+        """Run a provider probe synchronously (explicit retry or mode switch)"""
+        with self._lock:
+            probe = self._providers[name]['probe']
+
+        try:
+            ok = probe()
+        except Exception as e:
+            self.mark_failure(name, e, source="probe")
+            return False
+
+        if ok:
+            self.mark_success(name, source="probe")
+        else:
+            self.mark_failure(name, "probe reported provider unavailable", source="probe")
+        return bool(ok)
+
+    def _sync(self, entry):
+        """Mirror the breaker's state into the provider state; returns availability (caller holds the lock)"""
+        breaker = entry['breaker']
+        available = breaker.available()
+        state = entry['state']
+        changed = state['available'] != available
+        if changed:
+            state['changed_at'] = datetime.now().isoformat()
+        state['available'] = available
+        state['circuit'] = breaker.state
+        self._announce(entry)
+        return available
+
+    def _update(self, entry, available, source):
+        """Update availability and timestamps (caller holds the lock)"""
+        state = entry['state']
+        now = datetime.now().isoformat()
+        changed = state['available'] != available
+        if changed or state['changed_at'] is None:
+            state['changed_at'] = now
+        state['available'] = available
+        state['circuit'] = entry['breaker'].state
+        state['checked_at'] = now
+        state['source'] = source
+        self._announce(entry)
+
+    def _announce(self, entry):
+        """Tell listeners if the circuit has closed or opened since they last heard (caller holds the lock)"""
+        circuit = entry['state']['circuit']
+        if circuit not in (CLOSED, OPEN) or (circuit == CLOSED) == entry['announced']:
+            return
+        entry['announced'] = circuit == CLOSED
+        for callback in self._listeners:
+            try:
+                callback(entry['name'], dict(entry['state']))
+            except Exception as e:
+                print(f"Health listener failed: {e}")
+
+    def _run(self):
+        """Probe each provider when its schedule comes due"""
+        while self._running:
+            # Cleared before the schedule is read, so a wakeup during the probes isn't lost
+            self._wakeup.clear()
+            now = time.monotonic()
+            with self._lock:
+                due = [name for name, entry in self._providers.items() if entry['next_probe_at'] <= now]
+                # Push the schedule forward so a slow probe isn't started twice
+                for name in due:
+                    entry = self._providers[name]
+                    entry['next_probe_at'] = now + entry['interval']
+
+            for name in due:
+                self.probe_now(name)
+
+            with self._lock:
+                next_due = min((entry['next_probe_at'] for entry in self._providers.values()), default=None)
+
+            timeout = 1.0 if next_due is None else max(0.0, next_due - time.monotonic())
+            self._wakeup.wait(timeout)
@@ -0,0 +1,617 @@
+"""
+Provider Router - Latency-aware routing across LLM providers
+Keeps rolling latency percentiles, error rates and quota headroom per provider
+and tries providers in order of how soon each is expected to finish a request.
+Slow first answers can be hedged with a second request to another provider.
+"""
+
+import asyncio
+import contextvars
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+from rate_limiter import RateLimitWait
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a small sample, None when empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class HedgeBudget:
+    """Caps hedged calls at ``ratio`` extra calls per routed request, with a small burst.
+
+    Every routed request earns ``ratio`` credits (up to ``burst``); a hedge
+    spends one. When providers slow down across the board the budget runs dry
+    instead of doubling the load on them.
+    """
+
+    def __init__(self, ratio=0.1, burst=3):
+        self.ratio = ratio
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._credits = float(burst)
+        self._requests = 0
+        self._hedged = 0
+        self._denied = 0
+        self._wins = 0
+
+    def earn(self):
+        """Credit one routed request"""
+        with self._lock:
+            self._requests += 1
+            self._credits = min(self.burst, self._credits + self.ratio)
+
+    def spend(self):
+        """Take a credit for one hedge; False when the budget is exhausted"""
+        with self._lock:
+            if self._credits < 1.0:
+                self._denied += 1
+                return False
+            self._credits -= 1.0
+            self._hedged += 1
+            return True
+
+    def record_win(self):
+        """A hedge answered before the request it was hedging"""
+        with self._lock:
+            self._wins += 1
+
+    def stats(self):
+        """Hedges sent, denied and won"""
+        with self._lock:
+            return {
+                'ratio': self.ratio,
+                'credits': round(self._credits, 2),
+                'requests': self._requests,
+                'hedged': self._hedged,
+                'denied': self._denied,
+                'hedge_wins': self._wins,
+                'extra_call_rate': round(self._hedged / self._requests, 3) if self._requests else 0.0
+            }
+
+
+class ProviderRouter:
+    """Orders providers by expected finish time and fails over between them.
+
+    A provider's expected time is its median latency (or ``expected_latency``
+    until it has samples), stretched by the requests already queued on it and
+    by its rate-limit wait, then divided by its recent success rate.
+
+    With a ``hedge_budget``, a request whose provider has not produced a first
+    token within that provider's ``hedge_percentile`` first-token latency is
+    also sent to the next provider; the first answer wins and the other call
+    is cancelled (or, for blocking calls, abandoned and its answer dropped).
+    Hedges only go to a provider with a free slot (``in_flight`` below its
+    ``concurrency``): an abandoned blocking call keeps its slot until it
+    finishes, so a single-slot provider such as Ollama is never stacked up
+    with calls nobody is waiting for.
+    """
+
+    def __init__(self, health_monitor, window=100, hedge_budget=None, hedge_percentile=95,
+                 min_hedge_samples=10, min_hedge_delay=0.5):
+        self.health_monitor = health_monitor
+        self.window = window
+        self.hedge_budget = hedge_budget
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_samples = min_hedge_samples
+        self.min_hedge_delay = min_hedge_delay
+        self._lock = threading.Lock()
+        self._providers = {}
+
+    def register(self, name, expected_latency, concurrency=1, limiter=None):
+        """Add a provider; ``concurrency`` is how many requests it serves in parallel"""
+        with self._lock:
+            self._providers[name] = {
+                'expected_latency': expected_latency,
+                'concurrency': concurrency,
+                'limiter': limiter,
+                'latencies': deque(maxlen=self.window),
+                'first_tokens': deque(maxlen=self.window),
+                'outcomes': deque(maxlen=self.window),
+                'in_flight': 0,
+                'requests': 0,
+                'failures': 0,
+                'last_error': None
+            }
+
+    def order(self, names):
+        """Available providers among ``names``: fastest expected first, the rest in weighted failover order"""
+        candidates = [name for name in names if name in self._providers and self.health_monitor.is_available(name)]
+        if not candidates:
+            return []
+
+        scores = {name: self.expected_seconds(name) for name in candidates}
+        best = min(candidates, key=scores.get)
+        ordered, rest = [best], [name for name in candidates if name != best]
+        # Spread failover load: faster providers are more likely to be tried next
+        while rest:
+            pick = random.choices(rest, weights=[1.0 / scores[name] for name in rest])[0]
+            ordered.append(pick)
+            rest.remove(pick)
+        return ordered
+
+    def expected_seconds(self, name):
+        """Expected seconds for ``name`` to finish one more request"""
+        with self._lock:
+            provider = self._providers[name]
+            latency = percentile(provider['latencies'], 50) or provider['expected_latency']
+            queued = provider['in_flight'] // provider['concurrency']
+            outcomes = provider['outcomes']
+            success_rate = sum(outcomes) / len(outcomes) if outcomes else 1.0
+            limiter = provider['limiter']
+        wait = limiter.estimated_wait() if limiter else 0.0
+        return (wait + latency * (1 + queued)) / max(success_rate, 0.05)
+
+    def hedge_delay(self, name):
+        """Seconds to wait for a first token from ``name`` before hedging"""
+        with self._lock:
+            provider = self._providers[name]
+            samples = provider['first_tokens']
+            if len(samples) >= self.min_hedge_samples:
+                delay = percentile(samples, self.hedge_percentile)
+            else:
+                delay = provider['expected_latency']
+        return max(self.min_hedge_delay, delay)
+
+    def route(self, names, call, hedge_names=()):
+        """Try ``call(name)`` on each provider in turn until one returns a non-empty result.
+
+        Returns ``(provider, result)``, or ``(None, None)`` when every provider
+        came back empty; re-raises the last error if any provider raised.
+        ``hedge_names`` are providers that may receive a hedge but are not
+        failed over to.
+        """
+        if self._hedging(names, hedge_names):
+            name, started, result, error = self._race(names, hedge_names, call)
+            if error is not None:
+                raise error
+            if name is not None:
+                self._settle(name, started, result, None)
+            return name, result
+
+        last_error = None
+        for name in names:
+            if not self.health_monitor.allow_request(name):
+                continue  # Circuit open - fail fast to the next provider
+            started = self._start(name)
+            try:
+                result = call(name)
+            except Exception as e:
+                self._settle(name, started, None, e)
+                last_error = e
+                continue
+
+            self._settle(name, started, result, None)
+            if result:
+                return name, result
+
+        if last_error is not None:
+            raise last_error
+        return None, None
+
+    async def route_async(self, names, call, hedge_names=()):
+        """route() for coroutine ``call``s"""
+        if self._hedging(names, hedge_names):
+            name, started, result, error = await self._race_async(names, hedge_names, call)
+            if error is not None:
+                raise error
+            if name is not None:
+                self._settle(name, started, result, None)
+            return name, result
+
+        last_error = None
+        for name in names:
+            if not self.health_monitor.allow_request(name):
+                continue  # Circuit open - fail fast to the next provider
+            started = self._start(name)
+            try:
+                result = await call(name)
+            except Exception as e:
+                self._settle(name, started, None, e)
+                last_error = e
+                continue
+
+            self._settle(name, started, result, None)
+            if result:
+                return name, result
+
+        if last_error is not None:
+            raise last_error
+        return None, None
+
+    def stream(self, names, factory, hedge_names=()):
+        """Yield ``(provider, token)`` from the first provider that starts streaming.
+
+        Fails over to the next provider only until the first token; after that
+        an error is raised to the caller. With hedging, the first provider to
+        produce a token keeps the stream and the other stream is closed.
+        """
+        if self._hedging(names, hedge_names):
+            yield from self._hedged_stream(names, hedge_names, factory)
+            return
+
+        last_error = None
+        for name in names:
+            if not self.health_monitor.allow_request(name):
+                continue  # Circuit open - fail fast to the next provider
+            started = self._start(name)
+            sent = 0
+            try:
+                for token in factory(name):
+                    if not sent:
+                        self._first_token(name, started)
+                    sent += 1
+                    yield name, token
+            except GeneratorExit:
+                self._finish(name, started, None)  # Client went away mid-stream
+                raise
+            except Exception as e:
+                self._finish(name, started, None if isinstance(e, RateLimitWait) else False, e)
+                if sent:
+                    raise
+                last_error = e
+                continue
+
+            self._finish(name, started, bool(sent), None if sent else 'empty response')
+            if sent:
+                return
+
+        if last_error is not None:
+            raise last_error
+
+    async def stream_async(self, names, factory, hedge_names=()):
+        """stream() for async token generators"""
+        if self._hedging(names, hedge_names):
+            async for item in self._hedged_stream_async(names, hedge_names, factory):
+                yield item
+            return
+
+        last_error = None
+        for name in names:
+            if not self.health_monitor.allow_request(name):
+                continue  # Circuit open - fail fast to the next provider
+            started = self._start(name)
+            sent = 0
+            try:
+                async for token in factory(name):
+                    if not sent:
+                        self._first_token(name, started)
+                    sent += 1
+                    yield name, token
+            except GeneratorExit:
+                self._finish(name, started, None)  # Client went away mid-stream
+                raise
+            except Exception as e:
+                self._finish(name, started, None if isinstance(e, RateLimitWait) else False, e)
+                if sent:
+                    raise
+                last_error = e
+                continue
+
+            self._finish(name, started, bool(sent), None if sent else 'empty response')
+            if sent:
+                return
+
+        if last_error is not None:
+            raise last_error
+
+    def scoreboard(self):
+        """Live per-provider latency, error rate, load and quota"""
+        board = {}
+        for name in list(self._providers):
+            expected = self.expected_seconds(name)
+            hedge_delay = self.hedge_delay(name)
+            with self._lock:
+                provider = self._providers[name]
+                latencies = list(provider['latencies'])
+                outcomes = provider['outcomes']
+                limiter = provider['limiter']
+                board[name] = {
+                    'available': self.health_monitor.is_available(name),
+                    'expected_seconds': round(expected, 3),
+                    'p50_seconds': round(percentile(latencies, 50), 3) if latencies else None,
+                    'p95_seconds': round(percentile(latencies, 95), 3) if latencies else None,
+                    'hedge_delay_seconds': round(hedge_delay, 3),
+                    'error_rate': round(1 - sum(outcomes) / len(outcomes), 3) if outcomes else 0.0,
+                    'in_flight': provider['in_flight'],
+                    'concurrency': provider['concurrency'],
+                    'requests': provider['requests'],
+                    'failures': provider['failures'],
+                    'last_error': provider['last_error']
+                }
+            if limiter:
+                board[name]['quota'] = {
+                    bucket: values['available'] for bucket, values in limiter.stats()['buckets'].items()
+                }
+        return board
+
+    def hedge_stats(self):
+        """Hedge budget counters, None when hedging is off"""
+        return self.hedge_budget.stats() if self.hedge_budget else None
+
+    def _hedging(self, names, hedge_names):
+        """Whether this request may be hedged; counts it toward the hedge budget"""
+        if self.hedge_budget is None or not names:
+            return False
+        self.hedge_budget.earn()
+        return len(names) > 1 or bool(self._spares(names, hedge_names))
+
+    def _spares(self, names, hedge_names):
+        """Available hedge-only providers, fastest expected first"""
+        return [name for name in self.order(hedge_names) if name not in names]
+
+    def _admit(self, candidates):
+        """Pop candidates until one's circuit admits the call; None if none does"""
+        while candidates:
+            name = candidates.pop(0)
+            if self.health_monitor.allow_request(name):
+                return name
+        return None
+
+    def _has_slot(self, name):
+        """Whether ``name`` has fewer calls in flight than it serves in parallel"""
+        with self._lock:
+            provider = self._providers[name]
+            return provider['in_flight'] < provider['concurrency']
+
+    def _can_hedge(self, pending, spares):
+        """Whether any hedge candidate has a free slot"""
+        return any(self._has_slot(name) for name in pending + spares)
+
+    def _hedge_target(self, pending, spares):
+        """Pop the first candidate with a free slot whose circuit admits the call; None if none does.
+
+        Busy providers stay in ``pending`` for a later failover.
+        """
+        for candidates in (pending, spares):
+            for name in [name for name in candidates if self._has_slot(name)]:
+                candidates.remove(name)
+                if self.health_monitor.allow_request(name):
+                    return name
+        return None
+
+    def _race(self, names, hedge_names, attempt, late=None):
+        """Run ``attempt(name)`` down ``names``, hedging a slow call once.
+
+        Returns ``(name, started, value, error)`` for the first non-empty value,
+        or ``(None, None, None, last_error)``. A call that finishes after another
+        has won is passed to ``late`` (default: recorded like any other call).
+        """
+        late = late or self._settle
+        pending, spares = list(names), self._spares(names, hedge_names)
+        outcomes = queue.Queue()
+        lock = threading.Lock()
+        decided = []
+
+        def run(name, started):
+            try:
+                value, error = attempt(name), None
+            except Exception as e:
+                value, error = None, e
+            with lock:
+                if not decided:
+                    outcomes.put((name, started, value, error))
+                    return
+            late(name, started, value, error)  # Lost the race - the answer is dropped
+
+        def launch(name):
+            started = self._start(name)
+            # Carry the caller's context (e.g. the request being measured) into the thread
+            threading.Thread(target=contextvars.copy_context().run, args=(run, name, started), daemon=True).start()
+            return time.monotonic() + self.hedge_delay(name)
+
+        primary = self._admit(pending)
+        if primary is None:
+            return None, None, None, None
+        hedge_at = launch(primary)
+        running, hedged, hedge_name, last_error, winner = 1, False, None, None, None
+        while running:
+            timeout = None if hedged or not (pending or spares) else max(0.0, hedge_at - time.monotonic())
+            try:
+                name, started, value, error = outcomes.get(timeout=timeout)
+            except queue.Empty:
+                hedged = True  # At most one hedge per request
+                if self._can_hedge(pending, spares) and self.hedge_budget.spend():
+                    hedge_name = self._hedge_target(pending, spares)
+                    if hedge_name:
+                        launch(hedge_name)
+                        running += 1
+                continue
+
+            running -= 1
+            if value:
+                winner = (name, started, value, None)
+                break
+            self._settle(name, started, None, error)
+            last_error = error or last_error
+            failover = self._admit(pending) if not running else None
+            if failover:
+                hedge_at = launch(failover)
+                running = 1
+
+        with lock:
+            decided.append(True)
+            leftovers = []
+            while not outcomes.empty():
+                leftovers.append(outcomes.get())
+        for leftover in leftovers:
+            late(*leftover)
+
+        if winner is None:
+            return None, None, None, last_error
+        if winner[0] == hedge_name:
+            self.hedge_budget.record_win()
+        return winner
+
+    async def _race_async(self, names, hedge_names, attempt, late=None):
+        """_race() for coroutine ``attempt``s; calls that lose the race are cancelled"""
+        late = late or self._settle
+        pending, spares = list(names), self._spares(names, hedge_names)
+        tasks = {}
+
+        def launch(name):
+            started = self._start(name)
+            tasks[asyncio.ensure_future(attempt(name))] = (name, started)
+            return time.monotonic() + self.hedge_delay(name)
+
+        primary = self._admit(pending)
+        if primary is None:
+            return None, None, None, None
+        hedge_at = launch(primary)
+        hedged, hedge_name, last_error, winner = False, None, None, None
+        try:
+            while tasks and winner is None:
+                timeout = None if hedged or not (pending or spares) else max(0.0, hedge_at - time.monotonic())
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if self._can_hedge(pending, spares) and self.hedge_budget.spend():
+                        hedge_name = self._hedge_target(pending, spares)
+                        if hedge_name:
+                            launch(hedge_name)
+                    continue
+
+                for task in done:
+                    name, started = tasks.pop(task)
+                    error = task.exception()
+                    value = None if error else task.result()
+                    if value and winner is None:
+                        winner = (name, started, value, None)
+                    elif value:
+                        late(name, started, value, None)
+                    else:
+                        self._settle(name, started, None, error)
+                        last_error = error or last_error
+                failover = self._admit(pending) if not tasks and winner is None else None
+                if failover:
+                    hedge_at = launch(failover)
+        finally:
+            for task, (name, started) in tasks.items():
+                task.cancel()
+                self._finish(name, started, None)  # Cancelled before it finished
+
+        if winner is None:
+            return None, None, None, last_error
+        if winner[0] == hedge_name:
+            self.hedge_budget.record_win()
+        return winner
+
+    def _hedged_stream(self, names, hedge_names, factory):
+        """stream() with the first token raced between providers"""
+        def first(name):
+            tokens = iter(factory(name))
+            for token in tokens:
+                return token, tokens
+            return None
+
+        def late(name, started, value, error):
+            if not value:
+                return self._settle(name, started, None, error)
+            self._first_token(name, started)
+            self._finish(name, started, None)
+            value[1].close()
+
+        name, started, value, error = self._race(names, hedge_names, first, late)
+        if value is None:
+            if error is not None:
+                raise error
+            return
+
+        token, tokens = value
+        self._first_token(name, started)
+        try:
+            yield name, token
+            for token in tokens:
+                yield name, token
+        except GeneratorExit:
+            self._finish(name, started, None)
+            tokens.close()
+            raise
+        except Exception as e:
+            self._finish(name, started, None if isinstance(e, RateLimitWait) else False, e)
+            raise
+        self._finish(name, started, True)
+
+    async def _hedged_stream_async(self, names, hedge_names, factory):
+        """stream_async() with the first token raced between providers"""
+        async def first(name):
+            tokens = factory(name)
+            async for token in tokens:
+                return token, tokens
+            return None
+
+        def late(name, started, value, error):
+            if not value:
+                return self._settle(name, started, None, error)
+            self._first_token(name, started)
+            self._finish(name, started, None)
+            asyncio.ensure_future(value[1].aclose())
+
+        name, started, value, error = await self._race_async(names, hedge_names, first, late)
+        if value is None:
+            if error is not None:
+                raise error
+            return
+
+        token, tokens = value
+        self._first_token(name, started)
+        try:
+            yield name, token
+            async for token in tokens:
+                yield name, token
+        except GeneratorExit:
+            self._finish(name, started, None)
+            await tokens.aclose()
+            raise
+        except Exception as e:
+            self._finish(name, started, None if isinstance(e, RateLimitWait) else False, e)
+            raise
+        self._finish(name, started, True)
+
+    def _settle(self, name, started, result, error):
+        """Record a finished call, or a stream that ended before its first token"""
+        if isinstance(error, RateLimitWait):
+            self._finish(name, started, None)  # Out of quota, not unhealthy
+        elif error is not None:
+            self._finish(name, started, False, error)
+        elif result:
+            self._first_token(name, started)  # A whole answer arrives at once
+            self._finish(name, started, True)
+        else:
+            self._finish(name, started, False, 'empty response')
+
+    def _first_token(self, name, started):
+        """Record how long ``name`` took to produce its first token"""
+        with self._lock:
+            self._providers[name]['first_tokens'].append(time.perf_counter() - started)
+
+    def _start(self, name):
+        """Count a request as in flight and return its start time"""
+        with self._lock:
+            provider = self._providers[name]
+            provider['in_flight'] += 1
+            provider['requests'] += 1
+        return time.perf_counter()
+
+    def _finish(self, name, started, ok, error=None):
+        """Record a finished request; ``ok=None`` records no outcome (e.g. skipped for quota)"""
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            provider = self._providers[name]
+            provider['in_flight'] -= 1
+            if ok is not None:
+                provider['outcomes'].append(1 if ok else 0)
+            if ok:
+                provider['latencies'].append(elapsed)
+            elif ok is not None:
+                provider['failures'] += 1
+                provider['last_error'] = str(error)[:200] if error else None
+        if ok is None:
+            self.health_monitor.release(name)  # Frees a half-open trial that never got a verdict
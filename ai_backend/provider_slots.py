@@ -0,0 +1,103 @@
+"""
+Provider Slots - Per-provider limits on concurrent calls
+Every provider call holds one of its provider's slots, whichever route, batch
+or hedge made it, so a single-slot local Ollama never has more than one
+request on it while cloud providers get their own, larger limits
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+
+class ProviderSlots:
+    """A semaphore per provider, shared by worker threads and the event loop.
+
+    Threads block on the semaphore; coroutines take a free slot directly or
+    wait for one on a helper thread, so the event loop never blocks. Providers
+    without a configured limit are not throttled.
+    """
+
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self._slots = {name: threading.BoundedSemaphore(limit) for name, limit in self.limits.items()}
+        self._lock = threading.Lock()
+        self._in_use = dict.fromkeys(self.limits, 0)
+        self._waiting = dict.fromkeys(self.limits, 0)
+        self._waits = dict.fromkeys(self.limits, 0)
+        self._wait_seconds = dict.fromkeys(self.limits, 0.0)
+
+    @contextmanager
+    def hold(self, name):
+        """Hold one of ``name``'s slots for the ``with`` block, waiting for one if needed"""
+        slot = self._slots.get(name)
+        if slot is None:
+            yield
+            return
+        if not slot.acquire(blocking=False):
+            started = self._begin_wait(name)
+            try:
+                slot.acquire()
+            finally:
+                self._end_wait(name, started)
+        self._taken(name, 1)
+        try:
+            yield
+        finally:
+            self._taken(name, -1)
+            slot.release()
+
+    @asynccontextmanager
+    async def hold_async(self, name):
+        """hold() for coroutines"""
+        slot = self._slots.get(name)
+        if slot is None:
+            yield
+            return
+        if not slot.acquire(blocking=False):
+            started = self._begin_wait(name)
+            waiter = asyncio.ensure_future(asyncio.to_thread(slot.acquire))
+            try:
+                await asyncio.shield(waiter)
+            except asyncio.CancelledError:
+                # The helper thread still gets the slot - hand it straight back
+                waiter.add_done_callback(lambda _: slot.release())
+                raise
+            finally:
+                self._end_wait(name, started)
+        self._taken(name, 1)
+        try:
+            yield
+        finally:
+            self._taken(name, -1)
+            slot.release()
+
+    def stats(self):
+        """Limit, slots in use and waits per provider"""
+        with self._lock:
+            return {
+                name: {
+                    'limit': limit,
+                    'in_use': self._in_use[name],
+                    'waiting': self._waiting[name],
+                    'waits': self._waits[name],
+                    'wait_seconds': round(self._wait_seconds[name], 3)
+                }
+                for name, limit in self.limits.items()
+            }
+
+    def _begin_wait(self, name):
+        with self._lock:
+            self._waiting[name] += 1
+            self._waits[name] += 1
+        return time.perf_counter()
+
+    def _end_wait(self, name, started):
+        with self._lock:
+            self._waiting[name] -= 1
+            self._wait_seconds[name] += time.perf_counter() - started
+
+    def _taken(self, name, delta):
+        with self._lock:
+            self._in_use[name] += delta
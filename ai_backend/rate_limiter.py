@@ -0,0 +1,339 @@
+"""
+Rate Limiter - Client-side token buckets per provider
+Requests and tokens are reserved before each call, so a call that would go over
+the provider's budget waits its turn instead of coming back as a 429.
+Buckets are kept in sync with the provider's rate-limit headers and 429 messages.
+"""
+
+import asyncio
+import math
+import re
+import threading
+import time
+
+import metrics
+from provider_health import is_rate_limit_error, parse_wait_seconds
+
+CHARS_PER_TOKEN = 4
+
+# Budget named in a 429 message -> bucket it drains
+KIND_BUCKETS = {'RPM': 'requests', 'TPM': 'tokens', 'RPD': 'requests_per_day', 'TPD': 'tokens'}
+
+
+def estimate_request_tokens(messages, max_tokens):
+    """Tokens a chat completion may count against a TPM budget (prompt estimate + max output)"""
+    chars = sum(len(str(message.get('content', ''))) for message in messages or [])
+    return chars // CHARS_PER_TOKEN + (max_tokens or 0)
+
+
+def request_tokens(kwargs):
+    """estimate_request_tokens for chat.completions.create keyword arguments.
+
+    The output cap is ``max_completion_tokens`` (newer clients, Groq) or ``max_tokens``.
+    """
+    max_tokens = kwargs.get('max_completion_tokens') or kwargs.get('max_tokens')
+    return estimate_request_tokens(kwargs.get('messages'), max_tokens)
+
+
+def parse_rate_limit_error(error_str):
+    """Pull the budget kind, limit, usage and wait hint out of a provider 429 message"""
+    info = {}
+    kind_match = re.search(r'\((RPM|TPM|RPD|TPD)\)', error_str)
+    limit_match = re.search(r'Limit (\d+)', error_str)
+    used_match = re.search(r'Used (\d+)', error_str)
+    requested_match = re.search(r'Requested (\d+)', error_str)
+    wait_match = re.search(r'try again in ((?:\d+(?:\.\d+)?\s*(?:ms|h|m|s))+)', error_str)
+
+    if kind_match:
+        info['kind'] = kind_match.group(1)
+    if limit_match:
+        info['limit'] = int(limit_match.group(1))
+    if used_match:
+        info['used'] = int(used_match.group(1))
+    if requested_match:
+        info['requested'] = int(requested_match.group(1))
+    if wait_match:
+        info['wait_seconds'] = parse_wait_seconds(wait_match.group(1))
+    return info
+
+
+class RateLimitWait(Exception):
+    """Raised when a call would have to wait longer than the limiter's ``max_wait``"""
+
+    def __init__(self, provider, wait_seconds):
+        self.wait_seconds = wait_seconds
+        # Worded like a provider 429 (with "rate_limit" and a wait hint) so handlers that
+        # check is_rate_limit_error and parse_rate_limit_error treat both alike
+        super().__init__(
+            f"Client rate_limit budget for {provider} exhausted. Please try again in {math.ceil(wait_seconds)}s."
+        )
+
+
+class TokenBucket:
+    """Continuously refilling budget of ``capacity`` units per ``period`` seconds.
+
+    Reservations may take the level below zero; the deficit is how long the
+    next caller has to wait, which queues callers in arrival order.
+    """
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.period = period
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self):
+        """Units regained per second"""
+        return self.capacity / self.period
+
+    def refill(self, now):
+        """Add what has been regained since the last update"""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount):
+        """Seconds until ``amount`` would be available (bucket already refilled)"""
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount):
+        """Spend ``amount`` (may go negative)"""
+        self.level -= amount
+
+    def give_back(self, amount):
+        """Return over-reserved units"""
+        self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, remaining, limit=None):
+        """Adopt the provider's view of the budget"""
+        if limit:
+            self.capacity = float(limit)
+        self.level = min(self.level, float(remaining))
+
+    def pause(self, seconds, amount=1.0):
+        """Make ``amount`` available only after ``seconds``"""
+        self.level = min(self.level, amount - seconds * self.rate)
+
+
+class ProviderRateLimiter:
+    """Request and token budgets for one provider.
+
+    ``header_buckets`` maps the ``requests``/``tokens`` rate-limit headers to the
+    bucket they describe (Groq reports requests per day, OpenAI per minute).
+    """
+
+    def __init__(self, provider, requests_per_minute, tokens_per_minute=None, requests_per_day=None,
+                 max_wait=30.0, header_buckets=None):
+        self.provider = provider
+        self.max_wait = max_wait
+        self.header_buckets = header_buckets or {'requests': 'requests', 'tokens': 'tokens'}
+        self._lock = threading.Lock()
+        self._buckets = {'requests': TokenBucket(requests_per_minute)}
+        if tokens_per_minute:
+            self._buckets['tokens'] = TokenBucket(tokens_per_minute)
+        if requests_per_day:
+            self._buckets['requests_per_day'] = TokenBucket(requests_per_day, period=86400.0)
+
+        self._granted = 0
+        self._delayed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_observed_wait = 0.0
+        self._rate_limit_errors = 0
+
+    def reserve(self, tokens):
+        """Reserve one request and ``tokens`` tokens; returns the seconds to wait before calling.
+
+        Raises RateLimitWait, without reserving anything, when the wait would exceed ``max_wait``.
+        """
+        with self._lock:
+            now = time.monotonic()
+            amounts = self._amounts(tokens)
+            for name in amounts:
+                self._buckets[name].refill(now)
+            wait = max(self._buckets[name].wait_for(amount) for name, amount in amounts.items())
+
+            if wait > self.max_wait:
+                self._rejected += 1
+                raise RateLimitWait(self.provider, wait)
+
+            for name, amount in amounts.items():
+                self._buckets[name].take(amount)
+            self._granted += 1
+            if wait > 0:
+                self._delayed += 1
+                self._total_wait += wait
+                self._max_observed_wait = max(self._max_observed_wait, wait)
+            return wait
+
+    def estimated_wait(self, tokens=0):
+        """Seconds a call for ``tokens`` tokens would wait right now (nothing is reserved)"""
+        with self._lock:
+            now = time.monotonic()
+            amounts = self._amounts(tokens)
+            for name in amounts:
+                self._buckets[name].refill(now)
+            return max(self._buckets[name].wait_for(amount) for name, amount in amounts.items())
+
+    def acquire(self, tokens):
+        """Reserve and sleep until the call may go out"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens):
+        """Reserve and wait without blocking the event loop"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record_usage(self, reserved_tokens, used_tokens):
+        """Correct the token bucket once the real usage is known"""
+        if used_tokens is None or 'tokens' not in self._buckets:
+            return
+        with self._lock:
+            self._buckets['tokens'].give_back(reserved_tokens - used_tokens)
+
+    def update_from_headers(self, headers):
+        """Sync buckets with x-ratelimit-{limit,remaining,reset}-{requests,tokens} headers"""
+        with self._lock:
+            now = time.monotonic()
+            for kind, name in self.header_buckets.items():
+                bucket = self._buckets.get(name)
+                remaining = headers.get(f'x-ratelimit-remaining-{kind}')
+                if bucket is None or remaining is None:
+                    continue
+                try:
+                    remaining = float(remaining)
+                    limit = float(headers.get(f'x-ratelimit-limit-{kind}') or 0)
+                except ValueError:
+                    continue
+                bucket.refill(now)
+                bucket.sync(remaining, limit)
+                reset = parse_wait_seconds(headers.get(f'x-ratelimit-reset-{kind}'))
+                if remaining <= 0 and reset:
+                    bucket.pause(reset, 0.0)
+
+    def record_rate_limit(self, error_str):
+        """Drain the budget named in a 429 message; returns the provider's wait hint in seconds"""
+        info = parse_rate_limit_error(error_str)
+        kind = info.get('kind')
+        wait = info.get('wait_seconds') or 1.0
+
+        with self._lock:
+            self._rate_limit_errors += 1
+            bucket = self._buckets.get(KIND_BUCKETS.get(kind)) or self._buckets['requests']
+            bucket.refill(time.monotonic())
+            if kind in ('RPM', 'TPM') and 'limit' in info:
+                bucket.capacity = float(info['limit'])
+            # The provider's hint is when the rejected request would have fit
+            amount = info.get('requested', 1) if bucket is self._buckets.get('tokens') else 1
+            bucket.pause(wait, amount)
+        return wait
+
+    def stats(self):
+        """Bucket levels and how often calls were delayed or rejected"""
+        with self._lock:
+            now = time.monotonic()
+            buckets = {}
+            for name, bucket in self._buckets.items():
+                bucket.refill(now)
+                buckets[name] = {
+                    'capacity': bucket.capacity,
+                    'available': round(bucket.level, 1),
+                    'period_seconds': bucket.period
+                }
+            return {
+                'buckets': buckets,
+                'granted': self._granted,
+                'delayed': self._delayed,
+                'rejected': self._rejected,
+                'average_wait_seconds': round(self._total_wait / self._delayed, 3) if self._delayed else 0.0,
+                'max_wait_seconds': round(self._max_observed_wait, 3),
+                'rate_limit_errors': self._rate_limit_errors,
+                'max_wait': self.max_wait
+            }
+
+    def _amounts(self, tokens):
+        """Units to take from each bucket for one call"""
+        amounts = {'requests': 1}
+        if 'tokens' in self._buckets:
+            # A single call larger than the whole budget could never be granted
+            amounts['tokens'] = min(tokens, self._buckets['tokens'].capacity)
+        if 'requests_per_day' in self._buckets:
+            amounts['requests_per_day'] = 1
+        return amounts
+
+
+def limited_completion(limiter, create, **kwargs):
+    """Call ``create`` (a client's ``chat.completions.with_raw_response.create``) within budget.
+
+    Waits for the request and token budget first, syncs the buckets from the
+    response headers, and after a 429 retries once if the provider's wait
+    hint fits in ``max_wait``. Returns the parsed completion (or stream).
+    """
+    tokens = request_tokens(kwargs)
+    model = kwargs.get('model')
+    for attempt in range(2):
+        try:
+            limiter.acquire(tokens)
+        except RateLimitWait:
+            metrics.record_rate_limit(limiter.provider, model, source='client')
+            raise
+        started = time.perf_counter()
+        try:
+            raw = create(**kwargs)
+        except Exception as e:
+            if not _after_error(limiter, model, started, e, attempt):
+                raise
+            continue
+
+        return _after_response(limiter, model, started, tokens, raw)
+
+
+async def limited_completion_async(limiter, create, **kwargs):
+    """Async variant of limited_completion for ``AsyncOpenAI`` clients"""
+    tokens = request_tokens(kwargs)
+    model = kwargs.get('model')
+    for attempt in range(2):
+        try:
+            await limiter.acquire_async(tokens)
+        except RateLimitWait:
+            metrics.record_rate_limit(limiter.provider, model, source='client')
+            raise
+        started = time.perf_counter()
+        try:
+            raw = await create(**kwargs)
+        except Exception as e:
+            if not _after_error(limiter, model, started, e, attempt):
+                raise
+            continue
+
+        return _after_response(limiter, model, started, tokens, raw)
+
+
+def _after_error(limiter, model, started, error, attempt):
+    """Record a failed call; True when it was a 429 worth retrying"""
+    elapsed = time.perf_counter() - started
+    if not is_rate_limit_error(str(error)):
+        metrics.record_upstream(limiter.provider, model, elapsed, outcome='error')
+        return False
+
+    metrics.record_upstream(limiter.provider, model, elapsed, outcome='rate_limited')
+    metrics.record_rate_limit(limiter.provider, model)
+    wait = limiter.record_rate_limit(str(error))
+    return not attempt and wait <= limiter.max_wait
+
+
+def _after_response(limiter, model, started, tokens, raw):
+    """Sync the buckets and metrics from a successful response; returns the parsed completion"""
+    limiter.update_from_headers(raw.headers)
+    completion = raw.parse()
+    usage = getattr(completion, 'usage', None)  # Streams report no usage
+    limiter.record_usage(tokens, getattr(usage, 'total_tokens', None))
+    metrics.record_upstream(
+        limiter.provider, model, time.perf_counter() - started,
+        prompt_tokens=getattr(usage, 'prompt_tokens', None),
+        completion_tokens=getattr(usage, 'completion_tokens', None)
+    )
+    return completion
@@ -0,0 +1,194 @@
+"""
+Response Cache - In-process TTL + LRU cache for LLM responses
+Bounded by entry count and approximate memory size, with hit/miss counters.
+An optional ResponseStore behind it keeps responses across restarts.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(text):
+    """Collapse whitespace and case so trivially different prompts share a key"""
+    return re.sub(r'\s+', ' ', str(text)).strip().casefold()
+
+
+def normalize_payload(value, precision=1):
+    """Round floats and sort keys so near-identical payloads share a key"""
+    if isinstance(value, float):
+        return round(value, precision)
+    if isinstance(value, dict):
+        return {str(k): normalize_payload(v, precision) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [normalize_payload(v, precision) for v in value]
+    return value
+
+
+def make_cache_key(prompt, model, mode, **params):
+    """Hash the normalized prompt, model, mode and sampling parameters into a key"""
+    canonical = json.dumps(
+        {'prompt': prompt, 'model': model, 'mode': mode, 'params': params},
+        sort_keys=True,
+        separators=(',', ':'),
+        default=str
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def cache_bypassed(headers):
+    """Check the per-request bypass headers (X-Cache-Bypass or Cache-Control: no-cache)"""
+    bypass = headers.get('X-Cache-Bypass', '').strip().lower()
+    cache_control = headers.get('Cache-Control', '').lower()
+    return bypass in ('1', 'true', 'yes') or 'no-cache' in cache_control or 'no-store' in cache_control
+
+
+class ResponseCache:
+    def __init__(self, max_entries=512, max_bytes=8 * 1024 * 1024, ttl_seconds=300.0, store=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.store = store  # Optional ResponseStore: written through, read on memory misses
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, size, value), oldest first
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._store_hits = 0
+        self._expirations = 0
+        self._evictions = 0
+        self._store_errors = 0
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or expired entry"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, size, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                self._remove(key)
+                self._expirations += 1
+
+        # The store is read outside the lock; a hit is promoted back into memory
+        stored = None
+        if self.store is not None:
+            try:
+                stored = self.store.get(key)
+            except sqlite3.Error as e:
+                self._store_failed('read', e)
+        if stored is None:
+            with self._lock:
+                self._misses += 1
+            return None
+        value, ttl_left = stored
+        self._set_memory(key, value, ttl_left)
+        with self._lock:
+            self._hits += 1
+            self._store_hits += 1
+        return value
+
+    def set(self, key, value, ttl_seconds=None):
+        """Store a JSON-serializable value, evicting least recently used entries to fit"""
+        ttl_seconds = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        if self.store is not None:
+            try:
+                self.store.set(key, value, ttl_seconds)
+            except Exception as e:
+                self._store_failed('write', e)
+        return self._set_memory(key, value, ttl_seconds)
+
+    def warm_up(self, limit):
+        """Load the store's ``limit`` most hit live entries into memory; returns how many were loaded"""
+        if self.store is None or limit <= 0:
+            return 0
+        try:
+            hottest = self.store.hottest(limit)
+        except sqlite3.Error as e:
+            self._store_failed('warm-up', e)
+            return 0
+        loaded = 0
+        for key, value, ttl_left in hottest:
+            loaded += bool(self._set_memory(key, value, ttl_left))
+        return loaded
+
+    def _set_memory(self, key, value, ttl_seconds):
+        """Put a value in the in-memory LRU only"""
+        size = len(json.dumps(value, default=str).encode('utf-8'))
+        if size > self.max_bytes:
+            return False
+
+        expires_at = time.monotonic() + ttl_seconds
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (expires_at, size, value)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+        return True
+
+    def invalidate(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+        if self.store is not None:
+            try:
+                self.store.delete(key)
+            except sqlite3.Error as e:
+                self._store_failed('delete', e)
+
+    def clear(self):
+        """Drop every in-memory entry (counters and the store are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Counters and occupancy for monitoring"""
+        store = None
+        if self.store is not None:
+            try:
+                store = self.store.stats()
+            except sqlite3.Error as e:
+                store = {'error': str(e)}
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'expirations': self._expirations,
+                'evictions': self._evictions,
+                'store_hits': self._store_hits,
+                'store_errors': self._store_errors,
+                'store': store
+            }
+
+    def _store_failed(self, action, error):
+        """Count and log a store error; the in-memory cache carries on without it"""
+        with self._lock:
+            self._store_errors += 1
+        print(f"Response store {action} failed: {error}")
+
+    def _remove(self, key):
+        """Remove an entry and release its size (caller holds the lock)"""
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
@@ -0,0 +1,209 @@
+"""
+Response Store - SQLite-backed store for completed LLM responses
+Sits behind the in-memory ResponseCache so answers survive restarts. WAL mode
+lets request threads read while one writer commits; the file is kept under a
+size budget by dropping expired and then least-used entries.
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_hit REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires_at);
+CREATE INDEX IF NOT EXISTS responses_hot ON responses (hits, last_hit);
+"""
+
+
+class ResponseStore:
+    """Responses keyed by cache key, with a wall-clock TTL so expiry holds across restarts.
+
+    Reads use a pool of up to ``max_readers`` connections; writes go through one
+    connection under a lock. Hit counts are batched in memory and written with
+    the next write or compaction, so reads never take the write lock. Every
+    ``compact_every`` writes, expired rows are removed and, if the store is
+    over ``max_bytes``, the least-hit rows are dropped down to ``low_water``
+    of the budget.
+    """
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, low_water=0.8, compact_every=64, max_readers=8):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.compact_every = compact_every
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        # auto_vacuum only takes effect before the first table is created
+        self._writer.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        self._writer.execute('PRAGMA journal_mode=WAL')
+        self._writer.executescript(SCHEMA)
+        self._readers = queue.LifoQueue()
+        self._reader_slots = threading.Semaphore(max_readers)
+        self._pending_hits = {}  # key -> (hits, last hit time) not yet written
+        self._hits_lock = threading.Lock()
+        self._writes = 0
+        self._hits = 0
+        self._misses = 0
+        self._compactions = 0
+        self._compacted = 0
+        self.compact()
+
+    def get(self, key):
+        """``(value, seconds left)`` for a live entry, or None"""
+        now = time.time()
+        with self._reader() as conn:
+            row = conn.execute('SELECT value, expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] <= now:
+            with self._hits_lock:
+                self._misses += 1
+            return None
+
+        with self._hits_lock:
+            self._hits += 1
+            hits, _ = self._pending_hits.get(key, (0, now))
+            self._pending_hits[key] = (hits + 1, now)
+        return json.loads(row[0]), row[1] - now
+
+    def set(self, key, value, ttl_seconds):
+        """Store a JSON-serializable value for ``ttl_seconds``"""
+        data = json.dumps(value, default=str)
+        now = time.time()
+        with self._write_lock:
+            self._flush_hits()
+            self._writer.execute(
+                'INSERT OR REPLACE INTO responses (key, value, size, created_at, expires_at, last_hit, hits) '
+                'VALUES (?, ?, ?, ?, ?, ?, 0)',
+                (key, data, len(data), now, now + ttl_seconds, now)
+            )
+            self._writer.commit()
+            self._writes += 1
+            due = self._writes % self.compact_every == 0
+        if due:
+            self.compact()
+
+    def delete(self, key):
+        """Drop one entry"""
+        with self._write_lock:
+            self._writer.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self._writer.commit()
+
+    def hottest(self, limit):
+        """Up to ``limit`` live ``(key, value, seconds left)``, most hit first"""
+        now = time.time()
+        with self._reader() as conn:
+            rows = conn.execute(
+                'SELECT key, value, expires_at FROM responses WHERE expires_at > ? '
+                'ORDER BY hits DESC, last_hit DESC LIMIT ?',
+                (now, limit)
+            ).fetchall()
+        return [(key, json.loads(value), expires_at - now) for key, value, expires_at in rows]
+
+    def compact(self):
+        """Remove expired entries, then the least-hit ones while over ``max_bytes``; returns rows removed"""
+        now = time.time()
+        with self._write_lock:
+            self._flush_hits()
+            removed = self._writer.execute('DELETE FROM responses WHERE expires_at <= ?', (now,)).rowcount
+            total = self._writer.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total > self.max_bytes:
+                target = total - self.max_bytes * self.low_water
+                victims, freed = [], 0
+                cursor = self._writer.execute('SELECT key, size FROM responses ORDER BY hits, last_hit')
+                for key, size in cursor:
+                    if freed >= target:
+                        break
+                    victims.append((key,))
+                    freed += size
+                cursor.close()
+                self._writer.executemany('DELETE FROM responses WHERE key = ?', victims)
+                removed += len(victims)
+            self._writer.commit()
+            if removed:
+                self._writer.execute('PRAGMA incremental_vacuum')
+            self._compactions += 1
+            self._compacted += removed
+        return removed
+
+    def stats(self):
+        """Row count, stored bytes and hit/compaction counters"""
+        with self._reader() as conn:
+            entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        with self._hits_lock:
+            lookups = self._hits + self._misses
+            return {
+                'path': self.path,
+                'entries': entries,
+                'bytes': size,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'compactions': self._compactions,
+                'compacted_entries': self._compacted
+            }
+
+    def close(self):
+        """Write pending hit counts and close every connection"""
+        with self._write_lock:
+            self._flush_hits()
+            self._writer.commit()
+            self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+        conn.execute('PRAGMA synchronous=NORMAL')  # Durable across crashes in WAL mode, without an fsync per commit
+        return conn
+
+    def _reader(self):
+        return _PooledConnection(self)
+
+    def _flush_hits(self):
+        """Write batched hit counts (caller holds the write lock; the caller commits)"""
+        with self._hits_lock:
+            pending, self._pending_hits = self._pending_hits, {}
+        if pending:
+            self._writer.executemany(
+                'UPDATE responses SET hits = hits + ?, last_hit = MAX(last_hit, ?) WHERE key = ?',
+                [(hits, last_hit, key) for key, (hits, last_hit) in pending.items()]
+            )
+
+
+class _PooledConnection:
+    """Borrow a reader connection for a ``with`` block"""
+
+    def __init__(self, store):
+        self.store = store
+        self.conn = None
+
+    def __enter__(self):
+        self.store._reader_slots.acquire()
+        try:
+            self.conn = self.store._readers.get_nowait()
+        except queue.Empty:
+            try:
+                self.conn = self.store._connect()
+            except Exception:
+                self.store._reader_slots.release()
+                raise
+        return self.conn
+
+    def __exit__(self, *exc):
+        self.store._readers.put(self.conn)
+        self.store._reader_slots.release()
+        return False
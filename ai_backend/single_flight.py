@@ -0,0 +1,222 @@
+"""
+Single Flight - Coalesce identical concurrent provider calls
+The first caller for a key runs the call; callers that arrive while it is in
+flight wait for and share its result (or replay its token stream)
+"""
+
+import asyncio
+import contextvars
+import threading
+
+
+class _Stats:
+    """Counters shared by the thread and asyncio variants"""
+
+    def __init__(self):
+        self.leader_calls = 0
+        self.coalesced_calls = 0
+        self.leader_streams = 0
+        self.coalesced_streams = 0
+
+    def snapshot(self, in_flight):
+        """Counters as a dict, with the number of calls currently in flight"""
+        return {
+            'in_flight': in_flight,
+            'leader_calls': self.leader_calls,
+            'coalesced_calls': self.coalesced_calls,
+            'leader_streams': self.leader_streams,
+            'coalesced_streams': self.coalesced_streams,
+            'calls_saved': self.coalesced_calls + self.coalesced_streams
+        }
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _StreamCall:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.chunks = []
+        self.finished = False
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-based coalescing for the Flask backends"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self._stats = _Stats()
+
+    def do(self, key, func):
+        """Run ``func()`` once per key at a time; concurrent callers get the same result or exception"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats.leader_calls += 1
+            else:
+                self._stats.coalesced_calls += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stream(self, key, func):
+        """Iterate a token stream shared by every concurrent caller with the same key.
+
+        The upstream iterator from ``func()`` is consumed on a background thread,
+        so one client disconnecting does not cut the stream off for the others.
+        Callers that join late replay the tokens already received.
+        """
+        with self._lock:
+            call = self._streams.get(key)
+            if call is None:
+                call = self._streams[key] = _StreamCall()
+                self._stats.leader_streams += 1
+                # The pump runs in the leader's context so its provider calls are attributed to it
+                threading.Thread(
+                    target=contextvars.copy_context().run, args=(self._pump, key, call, func), daemon=True
+                ).start()
+            else:
+                self._stats.coalesced_streams += 1
+        return self._replay(call)
+
+    def stats(self):
+        """Leader and coalesced call counts"""
+        with self._lock:
+            return self._stats.snapshot(len(self._calls) + len(self._streams))
+
+    def _pump(self, key, call, func):
+        """Copy the upstream stream into the shared buffer"""
+        try:
+            for chunk in func():
+                with call.condition:
+                    call.chunks.append(chunk)
+                    call.condition.notify_all()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                if self._streams.get(key) is call:
+                    del self._streams[key]
+            with call.condition:
+                call.finished = True
+                call.condition.notify_all()
+
+    def _replay(self, call):
+        """Yield buffered chunks from the start, then live ones until the stream ends"""
+        index = 0
+        while True:
+            with call.condition:
+                call.condition.wait_for(lambda: index < len(call.chunks) or call.finished)
+                chunks = call.chunks[index:]
+                finished = call.finished
+            yield from chunks
+            index += len(chunks)
+            if finished:
+                if call.error is not None:
+                    raise call.error
+                return
+
+
+class _AsyncStreamCall:
+    def __init__(self):
+        self.condition = asyncio.Condition()
+        self.chunks = []
+        self.finished = False
+        self.error = None
+
+
+class AsyncSingleFlight:
+    """asyncio coalescing for the ASGI backend (use from a single event loop)"""
+
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+        self._stats = _Stats()
+
+    async def do(self, key, func):
+        """Await ``func()`` once per key at a time; concurrent callers share the task"""
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(func())
+            task.add_done_callback(lambda done: self._finish_call(key, done))
+            self._stats.leader_calls += 1
+        else:
+            self._stats.coalesced_calls += 1
+        # A waiter that is cancelled (client went away) must not cancel the shared call
+        return await asyncio.shield(task)
+
+    def stream(self, key, func):
+        """Async-iterate a token stream shared by every concurrent caller with the same key"""
+        call = self._streams.get(key)
+        if call is None:
+            call = self._streams[key] = _AsyncStreamCall()
+            self._stats.leader_streams += 1
+            asyncio.ensure_future(self._pump(key, call, func))
+        else:
+            self._stats.coalesced_streams += 1
+        return self._replay(call)
+
+    def stats(self):
+        """Leader and coalesced call counts"""
+        return self._stats.snapshot(len(self._calls) + len(self._streams))
+
+    def _finish_call(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved even if every waiter has gone
+
+    async def _pump(self, key, call, func):
+        """Copy the upstream stream into the shared buffer"""
+        try:
+            async for chunk in func():
+                async with call.condition:
+                    call.chunks.append(chunk)
+                    call.condition.notify_all()
+        except Exception as e:
+            call.error = e
+        finally:
+            if self._streams.get(key) is call:
+                del self._streams[key]
+            async with call.condition:
+                call.finished = True
+                call.condition.notify_all()
+
+    async def _replay(self, call):
+        """Yield buffered chunks from the start, then live ones until the stream ends"""
+        index = 0
+        while True:
+            async with call.condition:
+                await call.condition.wait_for(lambda: index < len(call.chunks) or call.finished)
+                chunks = call.chunks[index:]
+                finished = call.finished
+            for chunk in chunks:
+                yield chunk
+            index += len(chunks)
+            if finished:
+                if call.error is not None:
+                    raise call.error
+                return
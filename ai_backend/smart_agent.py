@@ -8,6 +8,22 @@ import random
 import time
 from datetime import datetime
 from groq import Groq
+from offline_intents import IntentMatcher
+
+# Short offline answers for general questions, in priority order
+OFFLINE_TOPICS = {
+    "predictive": "Predictive maintenance uses sensors and data analytics to predict equipment failures before they occur.",
+    "iot": "IoT sensors enable real-time monitoring of industrial equipment through wireless connectivity.",
+    "digital twin": "Digital twins are virtual replicas of physical systems for simulation and optimization.",
+    "maintenance": "Preventive maintenance scheduling reduces unexpected downtime and extends equipment life."
+}
+
+offline_intents = IntentMatcher(OFFLINE_TOPICS, {
+    "predictive": ["predictive maintenance", "condition monitoring", "failure prediction"],
+    "iot": ["iiot", "internet of things", "sensors"],
+    "digital twin": ["digital twins", "virtual replica"],
+    "maintenance": ["preventive maintenance", "repair", "service", "lubrication", "inspection"]
+})
 
 class SmartAIAgent:
     def __init__(self):
@@ -149,16 +165,9 @@ Note: This is offline analysis. For detailed AI insights, API quota needs to res
     
     def handle_general_offline(self, prompt):
         """Handle general queries in offline mode"""
-        keywords = {
-            "predictive": "Predictive maintenance uses sensors and data analytics to predict equipment failures before they occur.",
-            "iot": "IoT sensors enable real-time monitoring of industrial equipment through wireless connectivity.",
-            "digital twin": "Digital twins are virtual replicas of physical systems for simulation and optimization.",
-            "maintenance": "Preventive maintenance scheduling reduces unexpected downtime and extends equipment life."
-        }
-        
-        for keyword, response in keywords.items():
-            if keyword in prompt.lower():
-                return f"🔄 OFFLINE RESPONSE:\\n\\n{response}\\n\\nFor detailed analysis, wait for API reset or use online mode."
+        topic = offline_intents.match(prompt)
+        if topic:
+            return f"🔄 OFFLINE RESPONSE:\\n\\n{OFFLINE_TOPICS[topic]}\\n\\nFor detailed analysis, wait for API reset or use online mode."
         
         return """🔄 OFFLINE MODE ACTIVE
 
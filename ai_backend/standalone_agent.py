@@ -4,10 +4,10 @@ Standalone AI Agent for 3D Dashboard Digital Twin
 Runs without Flask - pure AI agent for industrial monitoring
 """
 
-import json
 import time
 from datetime import datetime
 from lstm_memory_agent import LSTMMemoryAgent
+from telemetry_encoder import encode_telemetry
 import random
 from groq import Groq
 
@@ -117,12 +117,7 @@ Factory Status:
 - High risk machines: {len(high_risk_machines)}
 
 Recent telemetry data:
-{json.dumps([{
-    'machine': m['name'], 
-    'temp': m['telemetry']['temperature'],
-    'vibration': m['telemetry']['vibration'],
-    'pressure': m['telemetry']['pressure']
-} for m in machine_data[:3]], indent=2)}
+{encode_telemetry(machine_data, token_budget=400)['text']}
 
 LSTM Memory Analysis:
 - Data points processed: {lstm_analysis['memory_insights']['total_data_points']}
@@ -0,0 +1,93 @@
+"""
+Telemetry Encoder - Token-budget-aware telemetry tables for analysis prompts
+Writes one compact row per machine, worst machines first, and stops at the
+token budget with a one-line summary of the machines that were left out
+"""
+
+from fleet_delta import summarize_machines
+from lstm_memory_agent import METRIC_LIMITS
+
+CHARS_PER_TOKEN = 4  # rough average for English text and numbers
+DEFAULT_TOKEN_BUDGET = 600
+
+# (field, column header, decimals)
+COLUMNS = (
+    ('temperature', 'temp', 1),
+    ('vibration', 'vib', 1),
+    ('pressure', 'pres', 2),
+    ('load', 'load', 0),
+    ('motorSpeed', 'rpm', 0),
+    ('oilLevel', 'oil', 0),
+    ('humidity', 'hum', 0),
+    ('noiseLevel', 'noise', 0)
+)
+UNITS = "temp °C, vib mm/s, pres bar, load %, rpm, oil %, hum %, noise dB"
+
+STATUS_WEIGHTS = {'critical': 3.0, 'warning': 1.0, 'offline': 0.5}
+
+
+def estimate_tokens(text):
+    """Approximate token count without a tokenizer"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def severity_score(machine):
+    """How far a machine is past its limits; 0 for a healthy machine"""
+    telemetry = machine.get('telemetry', machine)
+    score = STATUS_WEIGHTS.get(machine.get('status'), 0.0)
+    for metric, (warning, critical, direction) in METRIC_LIMITS.items():
+        value = telemetry.get(metric)
+        if not isinstance(value, (int, float)):
+            continue
+        # Distance past the warning limit, in units of the warning-to-critical gap
+        excess = direction * (value - warning) / abs(critical - warning)
+        if excess > 0:
+            score += 1.0 + excess
+    return score
+
+
+def _format_row(machine):
+    """Pipe-separated row: name, status, then the COLUMNS readings"""
+    telemetry = machine.get('telemetry', machine)
+    cells = [str(machine.get('name', machine.get('id'))).replace('|', '/'), str(machine.get('status', '-'))]
+    for field, _, decimals in COLUMNS:
+        value = telemetry.get(field)
+        cells.append(f"{value:.{decimals}f}" if isinstance(value, (int, float)) else '-')
+    return '|'.join(cells)
+
+
+def encode_telemetry(machine_data, token_budget=DEFAULT_TOKEN_BUDGET):
+    """Encode machines as a dense table that fits ``token_budget`` tokens.
+
+    Returns a dict with the prompt ``text``, the number of machines
+    ``included`` and ``omitted``, and the ``estimated_tokens`` used.
+    """
+    ranked = sorted(machine_data, key=severity_score, reverse=True)
+    header = '\n'.join([
+        f"{len(ranked)} machines, most severe first ({UNITS})",
+        '|'.join(['name', 'status'] + [column for _, column, _ in COLUMNS])
+    ])
+
+    # Leave room for the omitted-machines line, which is at most a couple of dozen tokens
+    remaining = token_budget - estimate_tokens(header) - 40
+    rows = []
+    for machine in ranked:
+        row = _format_row(machine)
+        cost = estimate_tokens(row) + 1
+        if cost > remaining:
+            break
+        rows.append(row)
+        remaining -= cost
+
+    omitted = ranked[len(rows):]
+    lines = [header] + rows
+    if omitted:
+        lines.append(f"omitted {len(omitted)} lower-severity machines: {summarize_machines(omitted)}")
+    text = '\n'.join(lines)
+
+    return {
+        'text': text,
+        'included': len(rows),
+        'omitted': len(omitted),
+        'estimated_tokens': estimate_tokens(text)
+    }
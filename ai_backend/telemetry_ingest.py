@@ -0,0 +1,297 @@
+"""
+Telemetry Ingest - Streaming parser for bulk NDJSON / MessagePack telemetry
+The request body is read in chunks and decoded a few thousand records at a
+time, so a large upload never becomes one big object. Each batch is checked
+against the TelemetryData fields column by column and appended to a
+TelemetryStore; only batches with a bad record fall back to per-record checks.
+
+One record per sample:
+    {"machine_id": "M-001", "timestamp": 1718000000.5, "temperature": 71.2, "vibration": 3.1, ...}
+``timestamp`` (Unix seconds) is optional and defaults to the time of receipt.
+MessagePack bodies are a sequence of such maps, or of arrays of them.
+"""
+
+import json
+import time
+from itertools import repeat
+
+import numpy as np
+
+from lstm_memory_agent import METRICS
+
+try:
+    import msgpack
+except ImportError:  # MessagePack bodies are refused when msgpack is not installed
+    msgpack = None
+
+NDJSON = 'ndjson'
+MSGPACK = 'msgpack'
+CONTENT_TYPES = {
+    'application/x-ndjson': NDJSON,
+    'application/ndjson': NDJSON,
+    'application/jsonl': NDJSON,
+    'application/json-seq': NDJSON,
+    'application/msgpack': MSGPACK,
+    'application/x-msgpack': MSGPACK,
+    'application/vnd.msgpack': MSGPACK
+}
+
+FIELDS = frozenset(METRICS) | {'machine_id', 'timestamp'}
+BATCH_RECORDS = 4096  # Records decoded and validated together
+CHUNK_BYTES = 64 * 1024
+MAX_REPORTED_ERRORS = 20
+_NUMBER_TYPES = frozenset({int, float})
+_OPTIONAL_NUMBER_TYPES = frozenset({int, float, type(None)})
+
+
+class BodyTooLarge(Exception):
+    """Raised while reading a body longer than the ingest limit"""
+
+
+class UnsupportedBody(Exception):
+    """Raised for a body format this server cannot decode"""
+
+
+class _Undecodable:
+    """Placeholder for an NDJSON line that is not valid JSON"""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def body_format(mimetype):
+    """NDJSON or MSGPACK for a request Content-Type, None when unsupported"""
+    return CONTENT_TYPES.get((mimetype or '').lower())
+
+
+def read_chunks(stream, chunk_bytes=CHUNK_BYTES, max_bytes=None):
+    """Chunks of a file-like body; raises BodyTooLarge past ``max_bytes``"""
+    total = 0
+    while True:
+        chunk = stream.read(chunk_bytes)
+        if not chunk:
+            return
+        total += len(chunk)
+        if max_bytes is not None and total > max_bytes:
+            raise BodyTooLarge(f"Body exceeds {max_bytes} bytes")
+        yield chunk
+
+
+class IngestResult:
+    """Counts, first errors and each machine's newest sample for one upload"""
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0  # Valid samples the store refused (machine limit)
+        self.errors = []
+        self.latest = {}  # machine id -> (timestamp, values row)
+        self.records = 0  # Records seen, valid or not
+
+    def error(self, record, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'record': record, 'error': message})
+
+    def latest_machines(self):
+        """Newest sample per machine as records shaped like /api/analyze machines"""
+        machines = []
+        for machine_id, (timestamp, row) in self.latest.items():
+            machine = {'id': machine_id, 'timestamp': timestamp}
+            machine.update((metric, float(value)) for metric, value in zip(METRICS, row) if value == value)
+            machines.append(machine)
+        return machines
+
+    def payload(self, seconds):
+        return {
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'dropped': self.dropped,
+            'machines': len(self.latest),
+            'errors': self.errors,
+            'seconds': round(seconds, 4),
+            'samples_per_second': round(self.records / seconds) if seconds > 0 else None
+        }
+
+
+def ingest(chunks, body_type, store, received_at=None, detector=None):
+    """Parse an NDJSON or MessagePack body from ``chunks`` into ``store``; returns an IngestResult.
+
+    With an EWMADetector as ``detector``, every stored sample also updates its baselines.
+    """
+    result = IngestResult()
+    received_at = time.time() if received_at is None else received_at
+    batches = _ndjson_batches(chunks, result) if body_type == NDJSON else _msgpack_batches(chunks, result)
+    for first, records in batches:
+        _store_batch(records, first, received_at, store, result, detector)
+    return result
+
+
+def _ndjson_batches(chunks, result):
+    """``(first record number, records)`` batches from NDJSON chunks; undecodable lines become errors"""
+    lines, rest = [], b''
+    for chunk in chunks:
+        parts = (rest + chunk).split(b'\n')
+        rest = parts.pop()
+        lines.extend(filter(bytes.strip, parts))  # Blank lines are skipped
+        while len(lines) >= BATCH_RECORDS:
+            yield _decode_lines(lines[:BATCH_RECORDS], result)
+            del lines[:BATCH_RECORDS]
+    if rest.strip():
+        lines.append(rest)
+    if lines:
+        yield _decode_lines(lines, result)
+
+
+def _decode_lines(lines, result):
+    first = result.records
+    result.records += len(lines)
+    try:
+        # One C-level decode for the whole batch
+        return first, json.loads(b'[' + b','.join(lines) + b']')
+    except ValueError:
+        pass
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError as e:
+            records.append(_Undecodable(f"Invalid JSON: {e}"))
+    return first, records
+
+
+def _msgpack_batches(chunks, result):
+    """``(first record number, records)`` batches from a MessagePack stream"""
+    if msgpack is None:
+        raise UnsupportedBody("MessagePack support needs the msgpack package")
+    unpacker = msgpack.Unpacker(raw=False, strict_map_key=False, max_buffer_size=16 * 1024 * 1024)
+    records, fed = [], 0
+    try:
+        for chunk in chunks:
+            unpacker.feed(chunk)
+            fed += len(chunk)
+            for item in unpacker:
+                if type(item) is list:
+                    records.extend(item)
+                else:
+                    records.append(item)
+                while len(records) >= BATCH_RECORDS:
+                    first = result.records
+                    result.records += BATCH_RECORDS
+                    yield first, records[:BATCH_RECORDS]
+                    del records[:BATCH_RECORDS]
+    except (msgpack.BufferFull, ValueError) as e:  # FormatError, StackError and ExtraData are ValueErrors
+        result.error(result.records + len(records), f"Invalid MessagePack: {e}")
+    else:
+        if unpacker.tell() < fed:
+            # The unpacker just waits for more data, so a cut-off last item has to be spotted here
+            result.error(result.records + len(records), f"Invalid MessagePack: body truncated after {unpacker.tell()} of {fed} bytes")
+    if records:
+        first = result.records
+        result.records += len(records)
+        yield first, records
+
+
+def _store_batch(records, first, received_at, store, result, detector):
+    numbers = None  # Record number per row, when rows were filtered
+    columns = _columns(records) if _well_formed(records) else None
+    if columns is None:
+        records, numbers = _valid_records(records, first, result)
+        if not records:
+            return
+        columns = _columns(records)
+
+    machine_ids, timestamps, values = columns
+    empty = np.isnan(values).all(axis=1)
+    if empty.any():
+        # Every metric missing - nothing to store
+        for index in np.flatnonzero(empty):
+            result.error(numbers[index] if numbers else first + int(index), "No telemetry fields")
+        keep = ~empty
+        machine_ids = [machine_id for machine_id, kept in zip(machine_ids, keep) if kept]
+        timestamps, values = timestamps[keep], values[keep]
+    if not machine_ids:
+        return
+
+    sent = timestamps  # The detector only orders samples by timestamps the client sent
+    timestamps = np.where(np.isnan(timestamps), received_at, timestamps)
+    stored = store.append(machine_ids, timestamps, values)
+    result.accepted += stored
+    result.dropped += len(machine_ids) - stored
+    if stored < len(machine_ids):
+        # Samples for machines past the store's limit are neither scored nor reported
+        keep = store.tracked(machine_ids)
+        machine_ids = [machine_id for machine_id, kept in zip(machine_ids, keep) if kept]
+        sent, timestamps, values = sent[keep], timestamps[keep], values[keep]
+    if detector is not None:
+        detector.update(machine_ids, values, sent)
+
+    # Newest sample per machine: dict() keeps each machine's last index
+    for machine_id, index in dict(zip(machine_ids, range(len(machine_ids)))).items():
+        previous = result.latest.get(machine_id)
+        if previous is None or timestamps[index] >= previous[0]:
+            result.latest[machine_id] = (float(timestamps[index]), values[index])
+
+
+def _well_formed(records):
+    """Batch-wide check that every record is a map of known fields with a string machine_id"""
+    if set(map(type, records)) != {dict} or not all(map(FIELDS.issuperset, records)):
+        return False
+    machine_ids = list(map(dict.get, records, repeat('machine_id')))
+    return set(map(type, machine_ids)) == {str} and all(machine_ids)
+
+
+def _columns(records):
+    """``(machine ids, timestamps, values)`` for well-formed records, or None when a value has the wrong type"""
+    machine_ids = list(map(dict.get, records, repeat('machine_id')))
+    timestamps = _numeric_column(list(map(dict.get, records, repeat('timestamp'))))
+    if timestamps is None:
+        return None
+    values = np.empty((len(records), len(METRICS)), dtype=np.float32)
+    for column, metric in enumerate(METRICS):
+        numbers = _numeric_column(list(map(dict.get, records, repeat(metric))))
+        if numbers is None:
+            return None
+        values[:, column] = numbers
+    return machine_ids, timestamps, values
+
+
+def _numeric_column(items):
+    """Float64 array with NaN for missing entries; None if any entry is not a number (bools included)"""
+    types = set(map(type, items))
+    if not types <= _OPTIONAL_NUMBER_TYPES:
+        return None
+    if type(None) in types:
+        items = [np.nan if item is None else item for item in items]
+    column = np.array(items, dtype=np.float64)
+    column[~np.isfinite(column)] = np.nan  # inf is treated as a missing reading
+    return column
+
+
+def _valid_records(records, first, result):
+    """Records that pass validate_record and their record numbers; the rest are reported"""
+    valid, numbers = [], []
+    for number, record in enumerate(records, first):
+        error = record.message if isinstance(record, _Undecodable) else validate_record(record)
+        if error:
+            result.error(number, error)
+        else:
+            valid.append(record)
+            numbers.append(number)
+    return valid, numbers
+
+
+def validate_record(record):
+    """Why ``record`` is not a valid telemetry sample, or None"""
+    if type(record) is not dict:
+        return "Record must be an object"
+    unknown = record.keys() - FIELDS
+    if unknown:
+        return f"Unknown fields: {', '.join(sorted(map(str, unknown)))}"
+    if type(record.get('machine_id')) is not str or not record['machine_id']:
+        return "machine_id must be a non-empty string"
+    for field in ('timestamp',) + METRICS:
+        value = record.get(field)
+        if value is not None and type(value) not in _NUMBER_TYPES:
+            return f"{field} must be a number"
+    return None
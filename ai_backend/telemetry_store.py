@@ -0,0 +1,138 @@
+"""
+Telemetry Store - In-memory columnar store for ingested sensor samples
+One NumPy column per TelemetryData field plus timestamp and machine, used as a
+fixed-size ring: appends are slice copies and memory never grows past
+``capacity`` samples, the oldest being overwritten first
+"""
+
+import threading
+
+import numpy as np
+
+from lstm_memory_agent import METRICS
+
+
+class TelemetryStore:
+    """Columnar telemetry samples.
+
+    Machine IDs are dictionary-encoded to int32; at most ``max_machines``
+    distinct machines are tracked and samples for further new machines are
+    dropped. Metric values are float32 with NaN for missing readings.
+    """
+
+    def __init__(self, capacity=1_000_000, max_machines=100_000):
+        self.capacity = capacity
+        self.max_machines = max_machines
+        self._lock = threading.Lock()
+        # np.empty leaves pages untouched until written, so an idle store costs little memory
+        self._timestamps = np.empty(capacity, dtype=np.float64)
+        self._machines = np.empty(capacity, dtype=np.int32)
+        self._values = np.empty((capacity, len(METRICS)), dtype=np.float32)
+        self._machine_index = {}  # machine id -> code
+        self._machine_ids = []
+        self._next = 0  # Slot the next sample goes to
+        self._size = 0
+        self._appended = 0
+        self._dropped = 0
+
+    def append(self, machine_ids, timestamps, values):
+        """Append samples given as a list of machine IDs, a timestamp array and an (n, len(METRICS)) array.
+
+        Returns how many were stored; samples for machines past ``max_machines`` are dropped.
+        """
+        with self._lock:
+            codes = list(map(self._machine_index.get, machine_ids))
+            if None in codes:
+                codes = [self._code(machine_id) if code is None else code for machine_id, code in zip(machine_ids, codes)]
+            codes = np.array(codes, dtype=np.int32)
+            if (codes < 0).any():
+                keep = codes >= 0
+                self._dropped += int((~keep).sum())
+                codes, timestamps, values = codes[keep], timestamps[keep], values[keep]
+
+            count = len(codes)
+            if count > self.capacity:
+                # Only the newest ``capacity`` samples would survive anyway
+                codes, timestamps, values = codes[-self.capacity:], timestamps[-self.capacity:], values[-self.capacity:]
+            written = 0
+            while written < len(codes):
+                end = min(self._next + len(codes) - written, self.capacity)
+                span = end - self._next
+                self._timestamps[self._next:end] = timestamps[written:written + span]
+                self._machines[self._next:end] = codes[written:written + span]
+                self._values[self._next:end] = values[written:written + span]
+                written += span
+                self._next = end % self.capacity
+            self._size = min(self._size + written, self.capacity)
+            self._appended += written
+            return count
+
+    def tracked(self, machine_ids):
+        """Boolean mask of the machines whose samples the store keeps"""
+        with self._lock:
+            return np.array([machine_id in self._machine_index for machine_id in machine_ids], dtype=bool)
+
+    def series(self, metric, machine_id=None, start=None, end=None):
+        """``(timestamps, values)`` of one metric in time order, optionally for one machine and time range.
+
+        Missing readings are left out. Returns copies, safe to use after the lock is released.
+        """
+        column = METRICS.index(metric)
+        with self._lock:
+            if machine_id is not None and machine_id not in self._machine_index:
+                return np.empty(0), np.empty(0, dtype=np.float32)
+            timestamps = self._ordered(self._timestamps)
+            values = self._ordered(self._values[:, column])
+            mask = ~np.isnan(values)
+            if machine_id is not None:
+                mask &= self._ordered(self._machines) == self._machine_index[machine_id]
+
+        if start is not None:
+            mask &= timestamps >= start
+        if end is not None:
+            mask &= timestamps <= end
+        timestamps, values = timestamps[mask], values[mask]
+        if len(timestamps) > 1 and (np.diff(timestamps) < 0).any():
+            # Senders' clocks and batches can interleave; stable keeps arrival order for equal times
+            order = np.argsort(timestamps, kind='stable')
+            timestamps, values = timestamps[order], values[order]
+        return timestamps, values
+
+    def __contains__(self, machine_id):
+        with self._lock:
+            return machine_id in self._machine_index
+
+    def machines(self):
+        """IDs of every machine with stored samples, in first-seen order"""
+        with self._lock:
+            return list(self._machine_ids)
+
+    def stats(self):
+        """Occupancy and counters"""
+        with self._lock:
+            return {
+                'samples': self._size,
+                'capacity': self.capacity,
+                'machines': len(self._machine_ids),
+                'max_machines': self.max_machines,
+                'appended': self._appended,
+                'dropped': self._dropped,
+                'bytes': int(self._timestamps.nbytes + self._machines.nbytes + self._values.nbytes),
+                'oldest_timestamp': float(self._timestamps[self._next if self._size == self.capacity else 0]) if self._size else None
+            }
+
+    def _code(self, machine_id):
+        """Dictionary code for a machine, -1 when the machine limit is reached (caller holds the lock)"""
+        code = self._machine_index.get(machine_id)
+        if code is None:
+            if len(self._machine_ids) >= self.max_machines:
+                return -1
+            code = self._machine_index[machine_id] = len(self._machine_ids)
+            self._machine_ids.append(machine_id)
+        return code
+
+    def _ordered(self, column):
+        """Stored part of a column, oldest sample first (caller holds the lock)"""
+        if self._size < self.capacity:
+            return column[:self._size].copy()
+        return np.concatenate([column[self._next:], column[:self._next]])
@@ -0,0 +1,11 @@
+"""
+Shared pytest setup - the backend modules import each other as top-level
+modules, so ai_backend/ goes on sys.path; response persistence is disabled so
+importing hybrid_backend never touches a SQLite file
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('RESPONSE_STORE_PATH', '')
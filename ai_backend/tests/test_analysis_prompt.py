@@ -0,0 +1,60 @@
+import random
+import threading
+
+import hybrid_backend
+from hybrid_backend import OLLAMA_PROMPT_CHARS, OLLAMA_PROMPT_TOKENS, analysis_prompts, build_analysis_prompt, build_ollama_messages
+
+
+def fleet(size, seed=0):
+    rng = random.Random(seed)
+    return [
+        {'id': f'M-{i}', 'name': f'Machine {i}', 'status': rng.choice(['normal', 'warning', 'critical']),
+         'temperature': rng.uniform(50, 100), 'vibration': rng.uniform(1, 50),
+         'pressure': rng.uniform(1, 11), 'load': rng.uniform(10, 100)}
+        for i in range(size)
+    ]
+
+
+def test_ollama_prompt_fits_without_truncation():
+    flagged = '\n'.join(f'- Machine {i} temperature 9{i} (z=+4.0, usual 60 ± 1)' for i in range(8))
+    prompt = build_analysis_prompt(fleet(60), flagged, OLLAMA_PROMPT_TOKENS)
+
+    assert len(prompt) <= OLLAMA_PROMPT_CHARS
+    assert build_ollama_messages(prompt, 'system')[1]['content'] == prompt
+    assert 'omitted ' in prompt and 'lower-severity machines' in prompt
+    assert '- and 3 more' in prompt
+    assert prompt.rstrip().endswith('(critical/high/medium/low).')
+
+
+def test_unlimited_providers_keep_full_prompt():
+    machines = fleet(10)
+    prompts = analysis_prompts(['groq', 'openai', 'ollama'], lambda limit: build_analysis_prompt(machines, None, limit))
+
+    assert prompts['groq'] is prompts['openai']
+    assert prompts['groq'] == build_analysis_prompt(machines)
+    assert hybrid_backend.ANALYSIS_INSTRUCTIONS in prompts['groq']
+    assert hybrid_backend.ANALYSIS_INSTRUCTIONS not in prompts['ollama']
+
+
+def test_online_analysis_hedges_into_ollama_with_its_own_prompt(monkeypatch):
+    release, prompts = threading.Event(), {}
+
+    def ask(name, prompt, system_prompt, **kwargs):
+        prompts[name] = prompt
+        if name != 'ollama':
+            release.wait(5)  # Slow cloud answer
+        return f'analysis from {name}'
+
+    monkeypatch.setattr(hybrid_backend, 'ask_provider', ask)
+    monkeypatch.setattr(hybrid_backend.router, 'order', lambda names: [name for name in names if name in ('openrouter', 'ollama')])
+    monkeypatch.setattr(hybrid_backend.router, 'hedge_delay', lambda name: 0.05)
+    monkeypatch.setattr(hybrid_backend.health_monitor, 'allow_request', lambda name: True)
+    monkeypatch.setattr(hybrid_backend.router.hedge_budget, 'spend', lambda: True)
+
+    try:
+        payload, status, _ = hybrid_backend.run_analysis({'machines': fleet(40, seed=1)}, 'online', bypass_cache=True)
+    finally:
+        release.set()
+
+    assert status == 200 and payload['provider'] == hybrid_backend.PROVIDERS['ollama']['label']
+    assert len(prompts['ollama']) <= OLLAMA_PROMPT_CHARS < len(prompts['openrouter'])
@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+
+from anomaly_detector import EWMADetector
+from bench_anomaly_detector import ScalarEWMA
+from lstm_memory_agent import METRICS
+from telemetry_ingest import NDJSON, ingest
+from telemetry_store import TelemetryStore
+
+
+def test_matches_per_sample_reference():
+    rng = np.random.default_rng(3)
+    machine_ids = [f'M-{i}' for i in range(50)] * 2  # Two readings per machine in each batch
+    scalar, vectorized = ScalarEWMA(), EWMADetector()
+    for _ in range(15):
+        values = rng.uniform(20, 100, (len(machine_ids), len(METRICS)))
+        values[rng.random(values.shape) < 0.05] = np.nan
+        assert np.allclose(vectorized.update(machine_ids, values), scalar.update(machine_ids, values), equal_nan=True)
+
+
+def test_spike_flagged_after_warmup():
+    detector = EWMADetector(warmup=5)
+    for n in range(10):
+        detector.update_records([{'id': 'press', 'telemetry': {'temperature': 60.0 + n % 2 * 0.5}}])
+    detector.update_records([{'id': 'press', 'telemetry': {'temperature': 90.0}}])
+
+    [anomaly] = detector.anomalies()
+    assert anomaly['machine_id'] == 'press' and anomaly['metric'] == 'temperature' and anomaly['z'] > 3
+
+
+def test_repeated_snapshot_is_not_absorbed():
+    detector = EWMADetector()
+    snapshot = [{'id': 'press', 'telemetry': {'temperature': 60.0}}, {'id': 'lathe', 'telemetry': {'temperature': 70.0}}]
+    for _ in range(5):
+        detector.update_records(snapshot)
+    assert detector.stats()['updates'] == 2 and detector.stats()['repeats'] == 8
+
+    detector.update_records([{'id': 'press', 'telemetry': {'temperature': 61.0}}])
+    assert detector.stats()['updates'] == 3
+
+
+def test_older_timestamps_are_skipped():
+    detector = EWMADetector()
+    values = np.full((1, len(METRICS)), 60.0)
+    detector.update(['press'], values, [100.0])
+    detector.update(['press'], values + 1, [100.0])
+    detector.update(['press'], values + 2, [50.0])
+    detector.update(['press'], values, [101.0])  # Same readings, but a later sample
+    assert detector.stats()['updates'] == 2
+
+
+def test_ingest_skips_samples_the_store_dropped():
+    store, detector = TelemetryStore(capacity=100, max_machines=1), EWMADetector()
+    body = '\n'.join(json.dumps({'machine_id': key, 'timestamp': 1000 + n, 'temperature': 60.0})
+                     for n, key in enumerate(['press', 'lathe', 'press'])).encode()
+
+    result = ingest([body], NDJSON, store, detector=detector)
+    assert (result.accepted, result.dropped) == (2, 1)
+    assert detector.stats()['machines'] == 1 and detector.stats()['updates'] == 2
+    assert list(result.latest) == ['press']
+
+
+def test_ingest_without_timestamps_absorbs_every_new_reading():
+    detector = EWMADetector()
+    body = '\n'.join(json.dumps({'machine_id': 'press', 'temperature': 60.0 + n}) for n in range(5)).encode()
+
+    ingest([body], NDJSON, TelemetryStore(capacity=100), detector=detector)
+    assert detector.stats()['updates'] == 5
+
+
+def test_full_detector_recycles_a_row_per_new_machine():
+    detector = EWMADetector(max_machines=2)
+    values = np.full((2, len(METRICS)), 60.0)
+    detector.update(['a', 'b'], values)
+    detector.update(['c', 'e'], values + [[1.0], [30.0]])
+
+    assert sorted(detector._rows) == ['c', 'e'] and len(set(detector._rows.values())) == 2
+    assert detector._last[detector._rows['c'], 0] == 61.0
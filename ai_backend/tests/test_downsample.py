@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from downsample import downsample_points, lttb
+
+
+def lttb_reference(x, y, threshold):
+    """Textbook per-point LTTB (Steinarsson, 2013), bucket bounds in exact integer arithmetic"""
+    n, buckets = len(x), threshold - 2
+    edge = lambda i: i * (n - 2) // buckets + 1
+    kept, a = [0], 0
+    for i in range(buckets):
+        start, end = edge(i), edge(i + 1)
+        next_start, next_end = end, min(edge(i + 2), n)
+        avg_x = sum(x[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(y[next_start:next_end]) / (next_end - next_start)
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+    kept.append(n - 1)
+    return kept
+
+
+@pytest.mark.parametrize('n, threshold', [(1000, 50), (1000, 3), (1000, 999), (101, 12), (10, 4)])
+def test_matches_reference(n, threshold):
+    rng = np.random.default_rng(n + threshold)
+    x = np.arange(n, dtype=np.float64)
+    y = np.cumsum(rng.normal(size=n))
+
+    assert lttb(x, y, threshold).tolist() == lttb_reference(x.tolist(), y.tolist(), threshold)
+
+
+@pytest.mark.parametrize('threshold', [10, 11, 500, 2, 0])
+def test_small_series_and_thresholds_keep_everything(threshold):
+    x = np.arange(10.0)
+    assert lttb(x, x ** 2, threshold).tolist() == list(range(10))
+
+
+def test_threshold_three_keeps_the_extreme_point():
+    y = np.zeros(100)
+    y[37] = 5.0
+    assert lttb(np.arange(100.0), y, 3).tolist() == [0, 37, 99]
+
+
+def test_kept_points_are_increasing_and_bounded_per_bucket():
+    x = 1.7e9 + np.arange(10_000) * 0.5  # Epoch timestamps keep their precision
+    y = np.sin(np.arange(10_000) / 50)
+    kept = lttb(x, y, 200)
+
+    assert len(kept) == 200 and kept[0] == 0 and kept[-1] == 9999
+    assert (np.diff(kept) > 0).all()
+    points = downsample_points(x, y, 200)
+    assert len(points) == 200 and points[-1] == [round(x[-1], 3), round(y[-1], 3)]
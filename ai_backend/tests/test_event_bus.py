@@ -0,0 +1,72 @@
+import pytest
+
+from event_bus import EventBus, TooManySubscribers
+
+
+def test_subscribers_get_published_events_in_order():
+    bus = EventBus()
+    subscription = bus.subscribe(events=['alert'])
+    bus.publish('alert', {'machine': 'M-1'})
+    bus.publish('mode', {'mode': 'offline'})
+    bus.publish('alert', {'machine': 'M-2'})
+
+    items = subscription.next(timeout=0)
+    assert [(event, data['machine']) for _, event, data, _ in items] == [('alert', 'M-1'), ('alert', 'M-2')]
+    assert subscription.next(timeout=0) == []
+
+
+def test_reconnect_replays_events_after_last_id():
+    bus = EventBus(history=8)
+    first = bus.publish('mode', 'online')
+    bus.publish('mode', 'offline')
+
+    items = bus.subscribe(last_event_id=first).next(timeout=0)
+    assert [data for _, _, data, _ in items] == ['offline']
+
+
+def test_slow_subscriber_gets_lagged_marker_first():
+    bus = EventBus(max_pending=2)
+    subscription = bus.subscribe()
+    for n in range(5):
+        bus.publish('job', n)
+
+    items = subscription.next(timeout=0)
+    assert items[0][1] == 'lagged' and items[0][2] == {'dropped': 3}
+    assert [data for _, _, data, _ in items[1:]] == [3, 4]
+
+
+def test_subscriber_limit():
+    bus = EventBus(max_subscribers=1)
+    subscription = bus.subscribe()
+    with pytest.raises(TooManySubscribers):
+        bus.subscribe()
+    subscription.close()
+    bus.subscribe()
+
+
+@pytest.mark.parametrize('server', ['flask', 'asgi'])
+def test_synchronous_analysis_publishes_alert_and_analysis_events(monkeypatch, server):
+    hybrid = pytest.importorskip('hybrid_backend')
+    monkeypatch.setattr(hybrid.router, 'order', lambda names: [])  # No provider: offline fallback analysis
+    if server == 'asgi':
+        testclient = pytest.importorskip('starlette.testclient')
+        hybrid_asgi = pytest.importorskip('hybrid_asgi')
+        client = testclient.TestClient(hybrid_asgi.app)
+    else:
+        client = hybrid.app.test_client()
+    subscription = hybrid.event_bus.subscribe(events=['alert', 'analysis'])
+    machine = {'id': f'EVT-{server}', 'name': f'Press {server}', 'temperature': 99.0, 'status': 'critical'}
+
+    try:
+        response = client.post('/api/analyze', json={'machines': [machine], 'request_id': f'req-{server}'})
+        items = subscription.next(timeout=1)
+    finally:
+        subscription.close()
+
+    assert response.status_code == 200
+    events = {event: data for _, event, data, _ in items}
+    assert events['alert']['machine_id'] == machine['id']
+    assert events['analysis']['analysis']['machines_analyzed'] == 1
+    # The poster recognises its own analysis in the stream by the echoed request_id
+    body = response.get_json() if server == 'flask' else response.json()
+    assert events['analysis']['request_id'] == body['request_id'] == f'req-{server}'
@@ -0,0 +1,53 @@
+from fleet_delta import FleetDeltaTracker
+from hybrid_backend import OLLAMA_PROMPT_CHARS, OLLAMA_PROMPT_TOKENS, build_incremental_analysis_prompt
+
+
+def machine(key, temperature, status='normal'):
+    return {'id': key, 'name': f'Machine {key}', 'status': status, 'temperature': temperature, 'vibration': 3.0, 'pressure': 5.0}
+
+
+def payload(text):
+    return {'analysis': {'maintenance_insights': text}}
+
+
+def analyze(tracker, machines):
+    """diff and commit the way complete_analysis does, returning the changed machine ids"""
+    delta = tracker.diff('fleet', machines, 'online')
+    tracker.commit('fleet', machines, 'online', payload('ok'), delta)
+    return [change['machine']['id'] for change in delta['changed']]
+
+
+def test_slow_drift_of_unchanged_machine_adds_up():
+    tracker = FleetDeltaTracker()
+    analyze(tracker, [machine('A', 60.0), machine('B', 60.0)])
+
+    # A moves 1.5°C per snapshot, under the 2°C tolerance each time
+    assert analyze(tracker, [machine('A', 61.5), machine('B', 70.0)]) == ['B']
+    assert analyze(tracker, [machine('A', 63.0), machine('B', 70.0)]) == ['A']
+    assert analyze(tracker, [machine('A', 64.5), machine('B', 70.0)]) == []
+
+
+def test_removed_machine_leaves_baseline():
+    tracker = FleetDeltaTracker()
+    analyze(tracker, [machine('A', 60.0), machine('B', 60.0)])
+    analyze(tracker, [machine('A', 60.0)])
+
+    delta = tracker.diff('fleet', [machine('A', 60.0), machine('B', 60.0)], 'online')
+    assert delta['removed'] == [] and delta['changed'][0]['reasons'] == ["new machine"]
+
+
+def test_incremental_prompt_puts_delta_first_and_fits_limit():
+    tracker = FleetDeltaTracker()
+    machines = [machine(str(i), 60.0) for i in range(50)]
+    tracker.commit('fleet', machines, 'online', payload('PREVIOUS ' * 400))
+    delta = tracker.diff('fleet', [machine(str(i), 90.0, 'critical') for i in range(50)], 'online')
+
+    prompt = build_incremental_analysis_prompt(delta, token_limit=OLLAMA_PROMPT_TOKENS)
+    assert len(prompt) <= OLLAMA_PROMPT_CHARS
+    assert prompt.index('Machines Changed') < prompt.index('Previous Assessment')
+    assert 'more' in prompt and prompt.rstrip().endswith('(critical/high/medium/low).')
+
+    small = tracker.diff('fleet', [machine('0', 90.0)] + machines[1:], 'online')
+    prompt = build_incremental_analysis_prompt(small, token_limit=OLLAMA_PROMPT_TOKENS)
+    assert len(prompt) <= OLLAMA_PROMPT_CHARS and 'PREVIOUS PREVIOUS' in prompt
+    assert 'PREVIOUS ' * 150 in build_incremental_analysis_prompt(small)
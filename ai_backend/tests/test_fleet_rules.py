@@ -0,0 +1,27 @@
+import pytest
+
+from bench_fleet_rules import analyze_scalar, generate_fleet
+from fleet_rules import FleetSnapshot, evaluate_fleet
+
+
+@pytest.mark.parametrize('spread, integers', [(1.0, False), (0.2, False), (1.0, True)])
+def test_matches_per_machine_loop(spread, integers):
+    records = generate_fleet(2000, spread, seed=7, integers=integers)
+    assert evaluate_fleet(FleetSnapshot.from_records(records)) == analyze_scalar(records)
+
+
+def test_int_readings_keep_their_format():
+    records = [
+        {'name': 'Press', 'temperature': 95, 'vibration': 41.5, 'pressure': 9, 'status': 'normal'},
+        {'name': 'Lathe', 'temperature': 95.0, 'vibration': 42, 'pressure': 10.5, 'status': 'critical'}
+    ]
+    analysis = evaluate_fleet(FleetSnapshot.from_records(records))
+
+    assert analysis == analyze_scalar(records)
+    assert "Press: Critical temperature (95°C)" in analysis['critical_issues']
+    assert "Lathe: Critical temperature (95.0°C)" in analysis['critical_issues']
+
+
+def test_missing_readings_raise_nothing():
+    records = [{'name': 'Idle', 'temperature': None, 'vibration': 45, 'pressure': None, 'status': 'normal'}]
+    assert evaluate_fleet(FleetSnapshot.from_records(records))['critical_issues'] == ["Idle: Excessive vibration (45 mm/s)"]
@@ -0,0 +1,30 @@
+import hybrid_backend
+from job_queue import DONE, FAILED, JobQueue
+
+
+def test_exception_marks_job_failed():
+    jobs = JobQueue(workers=1)
+    job = jobs.submit(lambda: 1 / 0)
+
+    view = jobs.get(job['job_id'], wait=5)
+    assert view['status'] == FAILED and 'division' in view['error']
+    assert jobs.stats()['failed'] == 1
+
+
+def test_finished_jobs_capped():
+    jobs = JobQueue(workers=1, max_finished=3)
+    ids = [jobs.submit(lambda n=n: n)['job_id'] for n in range(6)]
+    assert jobs.get(ids[-1], wait=5)['status'] == DONE
+
+    assert [jobs.get(job_id) is not None for job_id in ids] == [False] * 3 + [True] * 3
+    assert jobs.stats()['evicted'] == 3 and jobs.stats()['retained'] == 3
+
+
+def test_failed_analysis_job_is_failed(monkeypatch):
+    monkeypatch.setattr(hybrid_backend, 'run_analysis', lambda *args, **kwargs: ({'success': False, 'error': 'provider exploded'}, 500, None))
+    jobs = JobQueue(workers=1)
+    job = jobs.submit(hybrid_backend.run_analysis_job, {'machines': []}, 'online', False, None)
+
+    view = jobs.get(job['job_id'], wait=5)
+    assert view['status'] == FAILED and view['error'] == 'provider exploded'
+    assert jobs.stats()['failed'] == 1
@@ -0,0 +1,22 @@
+import time
+
+from provider_health import ProviderHealthMonitor
+
+
+def test_only_committed_transitions_are_announced():
+    monitor = ProviderHealthMonitor()
+    monitor.register('ollama', probe=lambda: True, retry_interval=0.05)
+    events = []
+    monitor.on_change(lambda name, state: events.append(state['available']))
+
+    monitor.mark_failure('ollama', 'connection refused', source='probe')
+    time.sleep(0.1)  # Circuit half-open: each trial taken and released flips availability
+    for _ in range(3):
+        assert monitor.allow_request('ollama')
+        assert not monitor.is_available('ollama')
+        monitor.release('ollama')
+        assert monitor.is_available('ollama')
+    monitor.mark_success('ollama')
+
+    assert events == [False, True]
+
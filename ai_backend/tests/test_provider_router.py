@@ -0,0 +1,49 @@
+import threading
+import time
+
+from provider_router import HedgeBudget, ProviderRouter
+
+
+class AllHealthy:
+    def is_available(self, name):
+        return True
+
+    def allow_request(self, name):
+        return True
+
+    def release(self, name):
+        pass
+
+
+def make_router():
+    router = ProviderRouter(AllHealthy(), hedge_budget=HedgeBudget(ratio=1.0, burst=10), min_hedge_delay=0.05)
+    router.register('cloud', expected_latency=0.05, concurrency=8)
+    router.register('ollama', expected_latency=0.05, concurrency=1)
+    return router
+
+
+def test_slow_call_is_hedged_to_idle_local_model():
+    router = make_router()
+    release = threading.Event()
+
+    def call(name):
+        if name == 'cloud':
+            release.wait(5)
+        return f'answer from {name}'
+
+    assert router.route(['cloud'], call, hedge_names=['ollama']) == ('ollama', 'answer from ollama')
+    release.set()
+
+
+def test_no_hedge_into_busy_single_slot_provider():
+    router = make_router()
+    router._start('ollama')  # An abandoned loser from an earlier request is still generating
+    calls = []
+
+    def call(name):
+        calls.append(name)
+        time.sleep(0.3)
+        return f'answer from {name}'
+
+    assert router.route(['cloud'], call, hedge_names=['ollama']) == ('cloud', 'answer from cloud')
+    assert calls == ['cloud'] and router.hedge_stats()['hedged'] == 0
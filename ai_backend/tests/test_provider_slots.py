@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import hybrid_backend
+from provider_slots import ProviderSlots
+
+
+def test_threads_never_exceed_a_providers_limit():
+    slots = ProviderSlots({'ollama': 1, 'groq': 3})
+    lock, running, peak = threading.Lock(), {'ollama': 0, 'groq': 0}, {'ollama': 0, 'groq': 0}
+
+    def call(name):
+        with slots.hold(name):
+            with lock:
+                running[name] += 1
+                peak[name] = max(peak[name], running[name])
+            time.sleep(0.02)
+            with lock:
+                running[name] -= 1
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(call, ['ollama'] * 6 + ['groq'] * 6))
+
+    assert peak == {'ollama': 1, 'groq': 3}
+    assert slots.stats()['ollama']['waits'] >= 5 and slots.stats()['ollama']['in_use'] == 0
+
+
+def test_coroutines_share_slots_with_threads_and_cancel_cleanly():
+    slots = ProviderSlots({'ollama': 1})
+
+    async def scenario():
+        with slots.hold('ollama'):  # A Flask-side call holds the only slot
+            waiter = asyncio.ensure_future(slots.hold_async('ollama').__aenter__())
+            await asyncio.sleep(0.05)
+            assert not waiter.done()
+            waiter.cancel()
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.05)  # The cancelled wait hands its slot straight back
+        async with slots.hold_async('ollama'):
+            return slots.stats()['ollama']['in_use']
+
+    assert asyncio.run(scenario()) == 1
+    assert slots.stats()['ollama']['in_use'] == 0
+
+
+def test_auto_batch_falling_back_to_ollama_runs_one_call_at_a_time(monkeypatch):
+    lock, state = threading.Lock(), {'running': 0, 'peak': 0}
+
+    def query_ollama(prompt, system_prompt):
+        with lock:
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+        time.sleep(0.02)
+        with lock:
+            state['running'] -= 1
+        return f'answer to {prompt}'
+
+    monkeypatch.setattr(hybrid_backend, 'query_ollama', query_ollama)
+    monkeypatch.setattr(hybrid_backend.router, 'order', lambda names: ['ollama'] if 'ollama' in names else [])
+    monkeypatch.setattr(hybrid_backend.health_monitor, 'allow_request', lambda name: True)
+    monkeypatch.setattr(hybrid_backend, 'current_mode', 'auto')  # Cloud down: every item lands on Ollama
+
+    response = hybrid_backend.app.test_client().post(
+        '/api/query/batch', json={'queries': [f'question {n}' for n in range(6)], 'max_parallel': 8},
+        headers={'X-Cache-Bypass': '1'}
+    )
+    assert response.status_code == 200 and response.get_json()['failed'] == 0
+    assert state['peak'] == 1
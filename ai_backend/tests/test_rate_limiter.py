@@ -0,0 +1,57 @@
+import pytest
+
+from provider_health import is_rate_limit_error
+from rate_limiter import ProviderRateLimiter, RateLimitWait, parse_rate_limit_error, request_tokens
+
+
+def test_request_tokens_reads_either_output_cap():
+    messages = [{'role': 'user', 'content': 'x' * 400}]
+    assert request_tokens({'messages': messages, 'max_completion_tokens': 1200}) == 1300
+    assert request_tokens({'messages': messages, 'max_tokens': 1024}) == 1124
+    assert request_tokens({'messages': messages}) == 100
+
+
+def test_reservation_includes_completion_cap():
+    limiter = ProviderRateLimiter('groq', requests_per_minute=100, tokens_per_minute=8000, max_wait=0.0)
+    limiter.reserve(request_tokens({'messages': [], 'max_completion_tokens': 6000}))
+    with pytest.raises(RateLimitWait):
+        limiter.reserve(request_tokens({'messages': [], 'max_completion_tokens': 6000}))
+
+
+def test_rate_limit_wait_is_recognised_as_rate_limit():
+    limiter = ProviderRateLimiter('groq', requests_per_minute=1, max_wait=0.0)
+    limiter.reserve(0)
+    with pytest.raises(RateLimitWait) as raised:
+        limiter.reserve(0)
+    message = str(raised.value)
+    assert is_rate_limit_error(message)
+    assert parse_rate_limit_error(message)['wait_seconds'] > 0
+
+
+@pytest.mark.parametrize('path, body, key', [
+    ('/api/query', {'query': 'Why is the pump vibrating?'}, 'response'),
+    ('/api/analyze', {'machines': [{'id': 'M-1', 'temperature': 90}]}, 'analysis')
+])
+def test_groq_backend_falls_back_when_client_budget_is_exhausted(monkeypatch, path, body, key):
+    groq_backend = pytest.importorskip('groq_backend')
+    exhausted = ProviderRateLimiter('groq', requests_per_minute=1, max_wait=0.0)
+    exhausted.reserve(0)
+    monkeypatch.setattr(groq_backend, 'rate_limiter', exhausted)
+    monkeypatch.setattr(groq_backend.health_monitor, 'allow_request', lambda name: True)
+
+    response = groq_backend.app.test_client().post(path, json=body)
+
+    assert response.status_code == 200
+    assert response.json['offline_mode'] is True
+    assert response.json[key]
+
+
+def test_hybrid_model_status_reports_every_providers_limiter(monkeypatch):
+    hybrid = pytest.importorskip('hybrid_backend')
+    groq_limiter = ProviderRateLimiter('groq', requests_per_minute=30, tokens_per_minute=8000)
+    monkeypatch.setitem(hybrid.CLOUD_CLIENTS, 'groq', (None, groq_limiter))
+
+    limiters = hybrid.app.test_client().get('/api/model-status').get_json()['rate_limiters']
+
+    assert set(limiters) == {'openrouter', 'groq'}
+    assert limiters['groq'] == groq_limiter.stats()
@@ -0,0 +1,51 @@
+import sqlite3
+
+import hybrid_backend
+from response_cache import ResponseCache
+from response_store import ResponseStore
+
+
+class BrokenStore:
+    """Store whose every operation fails like a locked or vanished SQLite file"""
+
+    def get(self, key):
+        raise sqlite3.OperationalError('database is locked')
+
+    def hottest(self, limit):
+        raise sqlite3.OperationalError('disk I/O error')
+
+    def set(self, key, value, ttl_seconds):
+        raise sqlite3.OperationalError('attempt to write a readonly database')
+
+    def stats(self):
+        raise sqlite3.OperationalError('database is locked')
+
+
+def test_store_errors_fall_back_to_memory():
+    cache = ResponseCache(store=BrokenStore())
+
+    assert cache.get('missing') is None
+    assert cache.warm_up(10) == 0
+    cache.set('key', {'answer': 42})
+    assert cache.get('key') == {'answer': 42}
+    stats = cache.stats()
+    assert stats['store_errors'] == 3 and 'error' in stats['store']
+
+
+def test_store_survives_restart(tmp_path):
+    path = str(tmp_path / 'responses.sqlite3')
+    store = ResponseStore(path)
+    ResponseCache(store=store).set('key', {'answer': 42}, ttl_seconds=60)
+    store.close()
+
+    cache = ResponseCache(store=ResponseStore(path))
+    assert cache.warm_up(10) == 1 and cache.get('key') == {'answer': 42}
+    cache.store.close()
+
+
+def test_unopenable_store_leaves_cache_memory_only(monkeypatch, tmp_path):
+    monkeypatch.setattr(hybrid_backend, 'RESPONSE_STORE_PATH', str(tmp_path / 'missing' / 'responses.sqlite3'))
+    monkeypatch.setattr(hybrid_backend.response_cache, 'store', None)
+
+    assert hybrid_backend.open_response_store() == 0
+    assert hybrid_backend.response_cache.store is None
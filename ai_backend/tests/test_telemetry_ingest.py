@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+import pytest
+
+from lstm_memory_agent import METRICS
+from telemetry_ingest import MSGPACK, NDJSON, body_format, ingest, read_chunks, BodyTooLarge
+from telemetry_store import TelemetryStore
+
+TEMPERATURE = METRICS.index('temperature')
+
+
+def ndjson(*records):
+    return '\n'.join(record if isinstance(record, str) else json.dumps(record) for record in records).encode()
+
+
+def test_bad_line_only_rejects_itself():
+    body = ndjson({'machine_id': 'a', 'timestamp': 10, 'temperature': 60.0}, '{not json',
+                  {'machine_id': 'b', 'timestamp': 11, 'temperature': 61}, {'machine_id': 'c', 'colour': 'red'})
+    store = TelemetryStore(capacity=100)
+
+    result = ingest([body[:7], body[7:]], NDJSON, store)  # Split mid-line across chunks
+
+    assert (result.accepted, result.rejected) == (2, 2)
+    assert [error['record'] for error in result.errors] == [1, 3]
+    assert result.errors[0]['error'].startswith('Invalid JSON') and 'colour' in result.errors[1]['error']
+    assert store.series('temperature', 'b')[1].tolist() == [61.0]
+
+
+def test_bools_are_rejected_and_inf_is_missing():
+    body = ndjson({'machine_id': 'a', 'temperature': True}, {'machine_id': 'b', 'temperature': float('inf')},
+                  {'machine_id': 'c', 'temperature': float('-inf'), 'load': 50}, {'machine_id': 'd', 'temperature': 70})
+
+    result = ingest([body], NDJSON, TelemetryStore(capacity=100), received_at=100.0)
+
+    assert [error['error'] for error in result.errors] == ["temperature must be a number", "No telemetry fields"]
+    assert result.accepted == 2
+    timestamp, row = result.latest['c']
+    assert timestamp == 100.0 and np.isnan(row[TEMPERATURE]) and row[METRICS.index('load')] == 50
+
+
+def test_msgpack_arrays_and_maps():
+    msgpack = pytest.importorskip('msgpack')
+    body = msgpack.packb([{'machine_id': 'a', 'temperature': 60.0}, {'machine_id': 'b', 'temperature': 61.0}])
+    body += msgpack.packb({'machine_id': 'c', 'temperature': 62.0})
+
+    result = ingest([body], MSGPACK, TelemetryStore(capacity=100))
+    assert (result.accepted, result.rejected, sorted(result.latest)) == (3, 0, ['a', 'b', 'c'])
+
+
+def test_truncated_msgpack_body_is_reported():
+    msgpack = pytest.importorskip('msgpack')
+    body = b''.join(msgpack.packb({'machine_id': 'a', 'timestamp': n, 'temperature': 60.0 + n}) for n in range(3))
+
+    result = ingest([body[:-3]], MSGPACK, TelemetryStore(capacity=100))
+
+    assert result.accepted == 2 and result.rejected == 1
+    assert 'truncated' in result.errors[0]['error']
+
+
+def test_body_limit_and_content_types():
+    assert body_format('Application/X-NDJSON') == NDJSON and body_format('application/msgpack') == MSGPACK
+    assert body_format('text/csv') is None
+
+    class Stream:
+        def __init__(self):
+            self.data = b'x' * 100
+
+        def read(self, size):
+            chunk, self.data = self.data[:size], self.data[size:]
+            return chunk
+
+    with pytest.raises(BodyTooLarge):
+        list(read_chunks(Stream(), chunk_bytes=30, max_bytes=50))
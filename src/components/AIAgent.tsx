@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { Card } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
@@ -54,6 +54,8 @@ export const AIAgent = ({ alerts, machines = [] }: AIAgentProps) => {
   const [memoryStatus, setMemoryStatus] = useState<MemoryStatus | null>(null);
   const [isOfflineMode, setIsOfflineMode] = useState(false);
   const [backendConnected, setBackendConnected] = useState(false);
+  // request_ids of our own /api/analyze posts, whose pushed ``analysis`` events we already show from the response
+  const ownRequests = useRef(new Set<string>());
   const { toast } = useToast();
 
   useEffect(() => {
@@ -64,16 +66,41 @@ export const AIAgent = ({ alerts, machines = [] }: AIAgentProps) => {
     
     // Check backend connection
     checkBackendConnection();
+  }, []);
+
+  // Analyses produced for other clients (other dashboards, async jobs) are pushed by the backend
+  useEffect(() => {
+    if (!backendConnected) return;
     
-    // Fetch memory status
     fetchMemoryStatus();
+    const events = new EventSource('http://localhost:5000/api/events?events=analysis');
+    events.addEventListener('analysis', (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      if (data.request_id && ownRequests.current.delete(data.request_id)) return; // Shown from our response
+      showAnalysisFindings(data);
+    });
     
-    // Auto-analyze machines with LSTM when machines data changes
+    return () => events.close();
+  }, [backendConnected]);
+
+  // Auto-analyze machines with LSTM when machines data changes - this post is also how telemetry reaches the backend
+  useEffect(() => {
     if (machines.length > 0 && backendConnected) {
       autoAnalyzeMachines();
     }
   }, [machines, backendConnected]);
 
+  // Tag an /api/analyze body so its pushed event can be told apart from other clients' analyses
+  const newRequestId = () => {
+    const requestId = `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    ownRequests.current.add(requestId);
+    if (ownRequests.current.size > 50) {
+      // Events that never arrived (e.g. cache hits aren't announced) - forget the oldest
+      ownRequests.current.delete(ownRequests.current.values().next().value as string);
+    }
+    return requestId;
+  };
+
   const checkBackendConnection = async () => {
     try {
       const response = await fetch('http://localhost:5000/api/health');
@@ -115,49 +142,55 @@ export const AIAgent = ({ alerts, machines = [] }: AIAgentProps) => {
         },
         body: JSON.stringify({
           machines: machines,
-          query: null
+          query: null,
+          incremental: true,
+          request_id: newRequestId()
         }),
       });
       
       if (response.ok) {
-        const data = await response.json();
-        if (data.success) {
-          // Update memory status
-          if (data.analysis.memory_insights) {
-            setMemoryStatus(data.analysis.memory_insights);
-          }
-          
-          // Create analyses for critical findings
-          const criticalFindings = data.analysis.predictive_analysis.filter(
-            (pred: any) => pred.risk_level === 'critical' || pred.risk_level === 'high'
-          );
-          
-          const newAnalyses = criticalFindings.map((finding: any) => ({
-            id: `lstm-${Date.now()}-${Math.random()}`,
-            alert: {
-              id: finding.machine_id,
-              machine: finding.machine_name,
-              message: `LSTM Prediction: ${finding.maintenance_actions.map((a: any) => a.reason).join(', ')}`,
-              severity: finding.risk_level === 'critical' ? 'critical' : 'warning',
-              timestamp: new Date().toLocaleTimeString(),
-            } as Alert,
-            solution: formatLSTMAnalysis(finding),
-            timestamp: new Date().toLocaleTimeString(),
-            memoryInsights: data.analysis.memory_insights,
-            predictiveAnalysis: [finding],
-            riskLevel: finding.risk_level
-          }));
-          
-          if (newAnalyses.length > 0) {
-            setAnalyses(prev => [...newAnalyses, ...prev.slice(0, 10)]); // Keep last 10
-          }
-        }
+        showAnalysisFindings(await response.json());
       }
     } catch (error) {
       console.error('Auto-analysis failed:', error);
     }
   };
 
+  // Turn the critical LSTM findings of an /api/analyze payload (response or pushed event) into analyses
+  const showAnalysisFindings = (data: any) => {
+    if (!data.success) return;
+    
+    // Update memory status
+    if (data.analysis.memory_insights) {
+      setMemoryStatus(data.analysis.memory_insights);
+    }
+    
+    // Create analyses for critical findings
+    const criticalFindings = (data.analysis.predictive_analysis || []).filter(
+      (pred: any) => pred.risk_level === 'critical' || pred.risk_level === 'high'
+    );
+    
+    const newAnalyses = criticalFindings.map((finding: any) => ({
+      id: `lstm-${Date.now()}-${Math.random()}`,
+      alert: {
+        id: finding.machine_id,
+        machine: finding.machine_name,
+        message: `LSTM Prediction: ${finding.maintenance_actions.map((a: any) => a.reason).join(', ')}`,
+        severity: finding.risk_level === 'critical' ? 'critical' : 'warning',
+        timestamp: new Date().toLocaleTimeString(),
+      } as Alert,
+      solution: formatLSTMAnalysis(finding),
+      timestamp: new Date().toLocaleTimeString(),
+      memoryInsights: data.analysis.memory_insights,
+      predictiveAnalysis: [finding],
+      riskLevel: finding.risk_level
+    }));
+    
+    if (newAnalyses.length > 0) {
+      setAnalyses(prev => [...newAnalyses, ...prev.slice(0, 10)]); // Keep last 10
+    }
+  };
+
   const formatLSTMAnalysis = (finding: any) => {
     let analysis = `🧠 LSTM PREDICTIVE ANALYSIS\n\n`;
     analysis += `Machine: ${finding.machine_name}\n`;
@@ -229,7 +262,8 @@ export const AIAgent = ({ alerts, machines = [] }: AIAgentProps) => {
           },
           body: JSON.stringify({
             machines: machines,
-            query: `Analyze problem: ${alertData.message} on ${alertData.machine}`
+            query: `Analyze problem: ${alertData.message} on ${alertData.machine}`,
+            request_id: newRequestId()
           }),
         });
 
@@ -36,11 +36,29 @@ const AIAgent: React.FC<AIAgentProps> = ({ machines, isFullscreen = false, onTog
   const fullscreenMode = isFullscreen || internalFullscreen;
   const toggleFullscreen = onToggleFullscreen || (() => setInternalFullscreen(!internalFullscreen));
 
-  // Check backend connection and model status
+  // Check backend connection and model status whenever the backend pushes a mode or provider health change
   useEffect(() => {
-    checkBackendConnection();
-    const interval = setInterval(checkBackendConnection, 30000); // Check every 30 seconds
-    return () => clearInterval(interval);
+    let interval: ReturnType<typeof setInterval> | undefined;
+    const events = new EventSource('http://localhost:5000/api/events?events=mode,provider_health');
+    const refresh = () => checkBackendConnection();
+
+    events.onopen = refresh; // Also runs after every reconnect
+    events.addEventListener('mode', refresh);
+    events.addEventListener('provider_health', refresh);
+    events.addEventListener('lagged', refresh);
+    events.onerror = () => {
+      setBackendStatus('disconnected');
+      if (events.readyState === EventSource.CLOSED && !interval) {
+        // Stream refused (e.g. too many open) - fall back to polling
+        checkBackendConnection();
+        interval = setInterval(checkBackendConnection, 30000);
+      }
+    };
+
+    return () => {
+      events.close();
+      if (interval) clearInterval(interval);
+    };
   }, []);
 
   // Handle keyboard shortcuts for fullscreen